@@ -1,11 +1,12 @@
 import tkinter as tk
 from tkinter import ttk, messagebox, filedialog
-import json
 import os
 import datetime
-import pygame
 from tkcalendar import Calendar
-from constants import TASK_FILE_PATH, TITLE_FONT, NORMAL_FONT, PRIMARY_COLOR, SECONDARY_COLOR
+from constants import NORMAL_FONT, PRIMARY_COLOR, SECONDARY_COLOR, \
+    DEFAULT_CHANNEL, PREVIEW_CHANNEL, DEFAULT_MIX_POLICY, MIX_OVERLAY, MIX_POLICY_LABELS, DEFAULT_PRIORITY, DEFAULT_BUSY_POLICY, BUSY_POLICY_LABELS
+from audio_probe import get_duration
+from task_model import Task, new_task_id
 
 class AddTaskWindow:
     def __init__(self, player, task_data=None, selected_item=None, default_time="08:00:00"):
@@ -48,6 +49,8 @@ class AddTaskWindow:
         self.setup_task_name(self.left_panel, task_data)
         ttk.Separator(self.left_panel, orient="horizontal").pack(fill=tk.X, pady=15)
         self.setup_date_selection(self.left_panel, task_data)
+        ttk.Separator(self.left_panel, orient="horizontal").pack(fill=tk.X, pady=15)
+        self.setup_play_options(self.left_panel, task_data)
 
         self.setup_time_setting(self.right_panel, task_data)
         ttk.Separator(self.right_panel, orient="horizontal").pack(fill=tk.X, pady=15)
@@ -213,6 +216,63 @@ class AddTaskWindow:
         if task_data:
             self.file_path_entry.insert(0, task_data[6])
 
+    def setup_play_options(self, parent, task_data=None):
+        """播放通道、混音策略和排队设置：非主通道的任务可以叠加在主通道上播放，
+        主通道任务到期时若已有任务在播放，按优先级和冲突策略处理"""
+        mix_frame = ttk.LabelFrame(parent, text="播放设置", padding="10")
+        mix_frame.pack(fill=tk.X)
+
+        options = {}
+        if task_data:
+            task = self.player.repository.get(str(task_data[0]).replace("▶ ", "").strip())
+            options = task.play_options if task else {}
+
+        channel_frame = ttk.Frame(mix_frame)
+        channel_frame.pack(fill=tk.X, padx=5, pady=5)
+        ttk.Label(channel_frame, text="通道:", font=NORMAL_FONT).pack(side=tk.LEFT)
+        self.channel_var = tk.StringVar(value=options.get("channel", DEFAULT_CHANNEL))
+        ttk.Combobox(channel_frame, textvariable=self.channel_var, width=15,
+                     values=[DEFAULT_CHANNEL, "announce", "chime"]).pack(side=tk.LEFT, padx=5)
+
+        policy_frame = ttk.Frame(mix_frame)
+        policy_frame.pack(fill=tk.X, padx=5, pady=5)
+        ttk.Label(policy_frame, text="混音:", font=NORMAL_FONT).pack(side=tk.LEFT)
+        self.mix_policy_var = tk.StringVar(value=MIX_POLICY_LABELS[options.get("mixPolicy", DEFAULT_MIX_POLICY)])
+        ttk.Combobox(policy_frame, textvariable=self.mix_policy_var, width=15, state="readonly",
+                     values=list(MIX_POLICY_LABELS.values())).pack(side=tk.LEFT, padx=5)
+
+        queue_frame = ttk.Frame(mix_frame)
+        queue_frame.pack(fill=tk.X, padx=5, pady=5)
+        ttk.Label(queue_frame, text="优先级:", font=NORMAL_FONT).pack(side=tk.LEFT)
+        self.priority_var = tk.StringVar(value=str(options.get("priority", DEFAULT_PRIORITY)))
+        ttk.Spinbox(queue_frame, from_=-9, to=9, textvariable=self.priority_var, width=4).pack(side=tk.LEFT, padx=5)
+        ttk.Label(queue_frame, text="冲突:", font=NORMAL_FONT).pack(side=tk.LEFT, padx=(10, 0))
+        self.busy_policy_var = tk.StringVar(value=BUSY_POLICY_LABELS[options.get("busyPolicy", DEFAULT_BUSY_POLICY)])
+        ttk.Combobox(queue_frame, textvariable=self.busy_policy_var, width=12, state="readonly",
+                     values=list(BUSY_POLICY_LABELS.values())).pack(side=tk.LEFT, padx=5)
+
+    def get_play_options(self) -> dict:
+        """返回非默认的播放设置，格式与任务文件中的字段一致"""
+        channel = self.channel_var.get().strip() or DEFAULT_CHANNEL
+        policy = next((key for key, label in MIX_POLICY_LABELS.items() if label == self.mix_policy_var.get()),
+                      DEFAULT_MIX_POLICY)
+        busy_policy = next((key for key, label in BUSY_POLICY_LABELS.items() if label == self.busy_policy_var.get()),
+                           DEFAULT_BUSY_POLICY)
+        try:
+            priority = int(self.priority_var.get())
+        except ValueError:
+            raise ValueError("优先级必须是整数")
+        options = {}
+        if channel != DEFAULT_CHANNEL:
+            options["channel"] = channel
+        if policy != DEFAULT_MIX_POLICY:
+            options["mixPolicy"] = policy
+        if priority != DEFAULT_PRIORITY:
+            options["priority"] = priority
+        if busy_policy != DEFAULT_BUSY_POLICY:
+            options["busyPolicy"] = busy_policy
+        return options
+
     def setup_volume(self, parent, task_data=None):
         volume_frame = ttk.LabelFrame(parent, text="音量控制", padding="10")
         volume_frame.pack(fill=tk.X)
@@ -238,8 +298,8 @@ class AddTaskWindow:
         def update_volume(event=None):
             volume = int(self.volume_scale.get())
             self.volume_label.config(text=f"{volume}%")
-            if self.preview_playing and self.preview_sound:
-                pygame.mixer.music.set_volume(volume / 100)
+            if self.preview_playing:
+                self.player.player.set_channel_volume(PREVIEW_CHANNEL, volume)
 
         self.volume_scale.bind("<Motion>", update_volume)
         self.volume_scale.bind("<ButtonRelease-1>", update_volume)
@@ -354,15 +414,17 @@ class AddTaskWindow:
                 return
 
             try:
-                pygame.mixer.music.load(file_path)
-                pygame.mixer.music.set_volume(int(self.volume_scale.get()) / 100)
-                pygame.mixer.music.play()
+                # 预览在单独的通道中与主通道叠加播放，不打断正在播放的任务，也不影响播放队列
+                success, _ = self.player.player.play(file_path, int(self.volume_scale.get()),
+                                                     channel=PREVIEW_CHANNEL, mix_policy=MIX_OVERLAY)
+                if success is False:  # None 表示音频线程尚未返回，不视为失败
+                    raise Exception("音频加载失败")
                 self.preview_playing = True
                 self.preview_button.configure(text="⏹ 停止")
             except Exception as e:
                 messagebox.showerror("错误", f"预览失败: {str(e)}")
         else:
-            pygame.mixer.music.stop()
+            self.player.player.stop_channel(PREVIEW_CHANNEL)
             self.preview_playing = False
             self.preview_button.configure(text="▶ 预览")
 
@@ -401,46 +463,32 @@ class AddTaskWindow:
         try:
             self.validate_inputs()
             task_data = self.prepare_task_data()
-            
-            # 构造完整的任务数据
-            task = {
-                "id": "0",  # 临时ID,后续会自动分配 
+
+            # 构造完整的任务数据，播放设置与任务文件中的字段一致
+            task = Task.from_dict({
+                "id": new_task_id(),
                 "name": task_data[0],
                 "startTime": task_data[1],
-                "endTime": task_data[2], 
+                "endTime": task_data[2],
                 "volume": task_data[3],
                 "schedule": task_data[4],
                 "audioPath": task_data[5],
-                "status": "waiting"
-            }
+                "status": "waiting",
+                **self.get_play_options()
+            })
 
-            # 获取当前选中项和任务ID映射
+            # 编辑模式，保留原任务ID以替换原任务
             selected_item = self.selected_item if hasattr(self, 'selected_item') else None
-            
-            # 保存任务
-            if selected_item:
-                # 编辑模式
-                self.player.tree.item(selected_item, values=[
-                    task["id"], task["name"], task["startTime"],
-                    task["endTime"], task["volume"], task["schedule"],
-                    task["audioPath"], task["status"]
-                ])
-            else:
-                # 新增模式
-                new_item = self.player.tree.insert("", "end", values=[
-                    task["id"], task["name"], task["startTime"],
-                    task["endTime"], task["volume"], task["schedule"],
-                    task["audioPath"], task["status"]
-                ])
-                self.player.task_id_map[new_item] = task["id"]
-
-            # 保存所有任务并重新加载
-            self.player.save_all_tasks()
-            self.player.load_tasks()  # 重新加载以更新显示
-            
+            if selected_item and selected_item in self.player.task_id_map:
+                task.id = self.player.task_id_map[selected_item]
+
+            # 保存任务，表格由任务仓库的变化通知更新
+            if not self.player.upsert_task(task):
+                raise IOError("写入任务文件失败")
+
             messagebox.showinfo("成功", "任务保存成功！")
             self.on_closing()
-            
+
         except ValueError as e:
             messagebox.showerror("输入错误", str(e))
         except Exception as e:
@@ -448,16 +496,11 @@ class AddTaskWindow:
 
     def prepare_task_data(self):
         file_path = self.file_path_entry.get()
-        try:
-            sound = pygame.mixer.Sound(file_path)
-            duration = sound.get_length()
-            start_time = f"{int(self.hour_var.get()):02d}:{int(self.minute_var.get()):02d}:{int(self.second_var.get()):02d}"
-            end_time = (datetime.datetime.strptime(start_time, "%H:%M:%S") +
-                       datetime.timedelta(seconds=duration)).strftime("%H:%M:%S")
-        except (IOError, pygame.error) as e:
-            start_time = f"{int(self.hour_var.get()):02d}:{int(self.minute_var.get()):02d}:{int(self.second_var.get()):02d}"
-            end_time = (datetime.datetime.strptime(start_time, "%H:%M:%S") +
-                       datetime.timedelta(minutes=5)).strftime("%H:%M:%S")
+        start_time = f"{int(self.hour_var.get()):02d}:{int(self.minute_var.get()):02d}:{int(self.second_var.get()):02d}"
+        # 读取文件头获取时长，无法识别时默认 5 分钟
+        duration = get_duration(file_path) or 5 * 60
+        end_time = (datetime.datetime.strptime(start_time, "%H:%M:%S") +
+                   datetime.timedelta(seconds=duration)).strftime("%H:%M:%S")
 
         if self.date_weekday_var.get() == 0:  # 日期模式
             play_date = self.cal.get_date()
@@ -478,49 +521,6 @@ class AddTaskWindow:
             file_path                            # 文件路径
         ]
 
-    def save_task_data(self, task_data, selected_item=None):
-        """保存任务数据，维护内存中的 task_id_map 并触发排序"""
-        try:
-            # 构造任务数据，ID 暂时设为 0，等待排序后分配
-            new_task = [
-                "0",           # 临时 ID，后续由 save_all_tasks 重新分配
-                task_data[0],  # 任务名称
-                task_data[1],  # 开始时间
-                task_data[2],  # 结束时间
-                task_data[3],  # 音量
-                task_data[4],  # 播放日期/星期
-                task_data[5],  # 文件路径
-                # "创建任务"      # 默认状态
-            ]
-
-            # 更新或插入 Treeview
-            if selected_item:
-                self.player.tree.item(selected_item, values=new_task)
-                # 保留现有 ID，等待重新排序
-            else:
-                new_item = self.player.tree.insert("", "end", values=new_task)
-                self.player.task_id_map[new_item] = "0"  # 临时 ID
-
-            # 调用主程序的保存方法以排序和重新分配 ID
-            self.player.save_all_tasks()
-            self.player.load_tasks()
-
-        except Exception as e:
-            raise Exception(f"保存任务数据失败: {str(e)}")
-
-    def update_task_status_in_tree(self, item, status_text):
-        if item:
-            values = list(self.player.tree.item(item)["values"])
-            tags = list(self.player.tree.item(item)["tags"])
-            if len(values) < len(self.player.columns):
-                values.append("")
-            values[-1] = status_text
-            tags = [tag for tag in tags if tag not in ['playing', 'paused', 'waiting', 'error']]
-            status_tag = 'playing' if status_text in ["已播放", "正在播放"] else 'waiting'
-            tags.append(status_tag)
-            self.player.tree.item(item, values=values, tags=tags)
-            self.player.status_label.config(text=f"当前任务：{values[1]} - {status_text}")
-
     def center_window(self):
         parent = self.window.master
         self.window.update_idletasks()
@@ -532,7 +532,7 @@ class AddTaskWindow:
 
     def on_closing(self):
         if self.preview_playing:
-            pygame.mixer.music.stop()
+            self.player.player.stop_channel(PREVIEW_CHANNEL)
         if self.window.winfo_exists():
             self.window.destroy()
         self.player.add_task_window = None
@@ -0,0 +1,270 @@
+import io
+import logging
+import os
+import time
+import pygame
+from typing import Dict, List, Optional, Tuple
+from constants import DEFAULT_AUDIO_BACKEND, SIMULATION_AUDIO_SECONDS
+from config_manager import get_config_value
+from audio_probe import get_duration
+
+END_EVENT = pygame.USEREVENT + 1  # 音乐播放结束时 pygame 投递的事件
+CHANNEL_END_EVENT = pygame.USEREVENT + 2  # 混音通道中的声音播放结束时投递的事件
+
+
+class AudioBackend:
+    """音频后端基类：主通道流式播放一个文件，混音通道同时播放多个声音
+
+    所有方法都应在同一个线程中调用(PlayerCore 的音频线程)。音量取值 0~1。
+    """
+
+    name = "base"
+
+    def init(self, channels: int):
+        """初始化设备，channels 为混音通道数"""
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+    # ---- 主通道 ----
+
+    def load(self, file_path: str, data: Optional[bytes] = None):
+        """加载音频文件，data 为已预加载到内存的文件内容"""
+        raise NotImplementedError
+
+    def play(self, start: float = 0):
+        raise NotImplementedError
+
+    def pause(self):
+        raise NotImplementedError
+
+    def resume(self):
+        raise NotImplementedError
+
+    def stop(self):
+        """停止并卸载当前文件，不产生播放结束事件"""
+        raise NotImplementedError
+
+    def is_playing(self) -> bool:
+        raise NotImplementedError
+
+    def position(self) -> float:
+        """自 play 以来播放的秒数(不含起始偏移)"""
+        raise NotImplementedError
+
+    def duration(self, file_path: str) -> float:
+        """音频时长(秒)，未知时返回 0"""
+        return get_duration(file_path)
+
+    def set_volume(self, volume: float):
+        raise NotImplementedError
+
+    def poll_ended(self) -> Tuple[bool, bool]:
+        """返回自上次调用以来 (主通道是否播放结束, 是否有混音通道播放结束)"""
+        raise NotImplementedError
+
+    # ---- 混音通道 ----
+
+    def open_channel(self):
+        """取一个空闲的混音通道，通道池耗尽时返回 None"""
+        raise NotImplementedError
+
+    def play_sound(self, channel, file_path: str, data: Optional[bytes], volume: float) -> float:
+        """在混音通道中播放声音(替换该通道中原有的声音)，返回时长"""
+        raise NotImplementedError
+
+    def stop_sound(self, channel):
+        raise NotImplementedError
+
+    def set_sound_volume(self, channel, volume: float):
+        """修改混音通道中正在播放的声音的音量"""
+        raise NotImplementedError
+
+    def sound_playing(self, channel) -> bool:
+        raise NotImplementedError
+
+
+class PygameBackend(AudioBackend):
+    """pygame 后端：主通道使用 pygame.mixer.music，混音通道使用 Sound/Channel，结束事件通过事件队列获取"""
+
+    name = "pygame"
+
+    def init(self, channels: int):
+        pygame.init()
+        pygame.mixer.init()
+        if not pygame.display.get_init():
+            # 无图形环境(如无界面模式运行在服务器上)时使用虚拟视频驱动，保证事件队列可用
+            os.environ["SDL_VIDEODRIVER"] = "dummy"
+            pygame.display.init()
+        pygame.mixer.music.set_endevent(END_EVENT)
+        pygame.mixer.set_num_channels(channels)
+
+    def load(self, file_path: str, data: Optional[bytes] = None):
+        if data is not None:
+            pygame.mixer.music.load(io.BytesIO(data), os.path.splitext(file_path)[1].lstrip("."))
+        else:
+            pygame.mixer.music.load(file_path)
+
+    def play(self, start: float = 0):
+        pygame.mixer.music.play(start=start)
+        # 丢弃切换曲目时旧曲目产生的结束事件
+        pygame.event.clear(END_EVENT)
+
+    def pause(self):
+        pygame.mixer.music.pause()
+
+    def resume(self):
+        pygame.mixer.music.unpause()
+
+    def stop(self):
+        pygame.mixer.music.stop()
+        pygame.mixer.music.unload()
+        pygame.event.clear(END_EVENT)
+
+    def is_playing(self) -> bool:
+        return pygame.mixer.music.get_busy()
+
+    def position(self) -> float:
+        return max(pygame.mixer.music.get_pos(), 0) / 1000
+
+    def set_volume(self, volume: float):
+        pygame.mixer.music.set_volume(volume)
+
+    def poll_ended(self) -> Tuple[bool, bool]:
+        events = {event.type for event in pygame.event.get([END_EVENT, CHANNEL_END_EVENT])}
+        # 暂停或停止同样会产生结束事件，只有音乐确实不再播放时才算播放结束
+        return END_EVENT in events and not pygame.mixer.music.get_busy(), CHANNEL_END_EVENT in events
+
+    def open_channel(self):
+        return pygame.mixer.find_channel()
+
+    def play_sound(self, channel, file_path: str, data: Optional[bytes], volume: float) -> float:
+        sound = pygame.mixer.Sound(io.BytesIO(data) if data is not None else file_path)
+        channel.stop()
+        sound.set_volume(volume)
+        channel.set_endevent(CHANNEL_END_EVENT)
+        channel.play(sound)
+        return sound.get_length()
+
+    def stop_sound(self, channel):
+        channel.stop()
+
+    def set_sound_volume(self, channel, volume: float):
+        channel.set_volume(volume)
+
+    def sound_playing(self, channel) -> bool:
+        return channel.get_busy()
+
+
+class NullBackend(AudioBackend):
+    """空后端：不访问声音设备，按音频时长模拟播放和结束事件，用于无声卡的机器上压测和性能分析
+
+    record=True 时把每次调用按 (单调时钟, 操作, 参数) 记录在 calls 中。
+    """
+
+    name = "null"
+
+    def __init__(self, default_duration: float = SIMULATION_AUDIO_SECONDS, record: bool = False):
+        self.default_duration = default_duration  # 无法读取时长的文件按该秒数播放
+        self.calls: Optional[List[Tuple[float, str, tuple]]] = [] if record else None
+        self._file: Optional[str] = None
+        self._length = 0.0
+        self._started = 0.0
+        self._paused_at: Optional[float] = None
+        self._playing = False
+        self._pool = 0
+        self._sounds: Dict[int, float] = {}  # 混音通道 -> 结束时间
+
+    def init(self, channels: int):
+        self._record("init", channels)
+        self._pool = channels
+
+    def load(self, file_path: str, data: Optional[bytes] = None):
+        self._record("load", file_path)
+        self._file = file_path
+        self._length = self.duration(file_path)
+        self._playing = False
+
+    def play(self, start: float = 0):
+        self._record("play", self._file, start)
+        self._started = time.monotonic()
+        self._length = max(self._length - start, 0)
+        self._paused_at = None
+        self._playing = True
+
+    def pause(self):
+        self._record("pause")
+        if self._playing and self._paused_at is None:
+            self._paused_at = time.monotonic()
+
+    def resume(self):
+        self._record("resume")
+        if self._paused_at is not None:
+            self._started += time.monotonic() - self._paused_at
+            self._paused_at = None
+
+    def stop(self):
+        self._record("stop")
+        self._file = None
+        self._playing = False
+        self._paused_at = None
+
+    def is_playing(self) -> bool:
+        return self._playing and self._paused_at is None and self.position() < self._length
+
+    def position(self) -> float:
+        if not self._playing:
+            return 0
+        return (self._paused_at or time.monotonic()) - self._started
+
+    def duration(self, file_path: str) -> float:
+        return get_duration(file_path) or self.default_duration
+
+    def set_volume(self, volume: float):
+        self._record("set_volume", volume)
+
+    def poll_ended(self) -> Tuple[bool, bool]:
+        now = time.monotonic()
+        ended = self._playing and self._paused_at is None and now - self._started >= self._length
+        if ended:
+            self._playing = False
+        finished = [channel for channel, end in self._sounds.items() if end <= now]
+        for channel in finished:
+            del self._sounds[channel]
+        return ended, bool(finished)
+
+    def open_channel(self):
+        return next((channel for channel in range(self._pool) if channel not in self._sounds), None)
+
+    def play_sound(self, channel, file_path: str, data: Optional[bytes], volume: float) -> float:
+        self._record("play_sound", channel, file_path, volume)
+        length = self.duration(file_path)
+        self._sounds[channel] = time.monotonic() + length
+        return length
+
+    def stop_sound(self, channel):
+        self._record("stop_sound", channel)
+        self._sounds.pop(channel, None)
+
+    def set_sound_volume(self, channel, volume: float):
+        self._record("set_sound_volume", channel, volume)
+
+    def sound_playing(self, channel) -> bool:
+        return channel in self._sounds
+
+    def _record(self, operation: str, *args):
+        if self.calls is not None:
+            self.calls.append((time.monotonic(), operation, args))
+
+
+BACKENDS = {PygameBackend.name: PygameBackend, NullBackend.name: NullBackend}
+
+
+def create_backend(name: Optional[str] = None) -> AudioBackend:
+    """按名称创建音频后端，未指定时读取 config.json 中的 audio_backend"""
+    name = name or get_config_value("audio_backend", DEFAULT_AUDIO_BACKEND)
+    if name not in BACKENDS:
+        logging.warning(f"未知的音频后端 {name}，使用默认后端 {DEFAULT_AUDIO_BACKEND}")
+        name = DEFAULT_AUDIO_BACKEND
+    return BACKENDS[name]()
@@ -2,16 +2,20 @@ import tkinter as tk
 from tkinter import ttk, messagebox, filedialog
 import json
 import os
+import dataclasses
 import threading
 import time
-import datetime
-import pygame
 import logging
-from constants import TASK_FILE_PATH, ICON_PATH, DEFAULT_WINDOW_SIZE, MIN_WINDOW_SIZE, TITLE_FONT, NORMAL_FONT, PRIMARY_COLOR, SECONDARY_COLOR, BACKGROUND_COLOR
+from constants import TASK_FILE_PATH, ICON_PATH, DEFAULT_WINDOW_SIZE, MIN_WINDOW_SIZE, TITLE_FONT, NORMAL_FONT, PRIMARY_COLOR, SECONDARY_COLOR, BACKGROUND_COLOR, STATUS_FLUSH_INTERVAL_MS, PLAYER_EVENT_POLL_MS, PLAYER_IDLE_POLL_MS, \
+    METRICS_EXPORT_INTERVAL_MS, TASK_FILE_POLL_MS, IMPORT_POLL_MS
 from add_task_window import AddTaskWindow
-from utils import safe_play_audio, update_task_in_json, load_tasks, save_all_tasks, set_task_status
 from player_core import PlayerCore
-from task_manager import TaskManager
+from task_engine import TaskEngine
+from task_file_watcher import TaskFileWatcher
+from task_import import TaskImporter
+from task_service import create_task_service
+from task_model import Task, seconds_of_day, new_task_id
+from virtual_treeview import VirtualTreeview
 
 class ToolTip:
     """A simple tooltip class for displaying hover hints."""
@@ -37,14 +41,62 @@ class ToolTip:
             self.tip = None
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
+def _longest_increasing_subsequence(sequence):
+    """返回最长递增子序列在 sequence 中的下标集合"""
+    tails = []  # tails[k] 为长度 k+1 的子序列末尾元素下标
+    previous = [None] * len(sequence)
+    for i, value in enumerate(sequence):
+        lo, hi = 0, len(tails)
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if sequence[tails[mid]] < value:
+                lo = mid + 1
+            else:
+                hi = mid
+        if lo:
+            previous[i] = tails[lo - 1]
+        if lo == len(tails):
+            tails.append(i)
+        else:
+            tails[lo] = i
+    result = set()
+    i = tails[-1] if tails else None
+    while i is not None:
+        result.add(i)
+        i = previous[i]
+    return result
+
 class AudioPlayer:
-    def __init__(self, task_file_path=None):
+    # 表格列 -> 排序时使用的任务字段，序号列按当前显示顺序
+    COLUMN_FIELDS = {"序号": None, "任务名称": "name", "开始时间": "start_time", "结束时间": "end_time",
+                     "音量": "volume", "播放日期/星期": "schedule", "文件路径": "audio_path", "状态": "status"}
+
+    def __init__(self, task_file_path=None, clock=None, player=None):
         self.task_file_path = task_file_path
-        self.player = PlayerCore()
-        self.task_manager = TaskManager()
+        self.player = player or PlayerCore()  # 压测时可注入使用空音频后端的播放核心
         self.lock = threading.Lock()
-        self.task_id_map = {}  # 初始化 task_id_map
-        self.last_date = None  # 用于追踪日期变化
+        self.task_id_map = {}  # 行 -> 任务ID
+        self.item_by_id = {}  # 任务ID -> 行
+        self._row_cache = {}  # 行 -> 最近一次写入的 (values, tags)，用于跳过未变化的行
+        self._tagged_items = set()  # 带 selected 标签的行，取消选择时只需检查这些行
+        # 调度、播放和播放事件由任务引擎负责，界面只是引擎的一个客户端，按任务仓库的状态变化重绘
+        self.engine = TaskEngine(player=self.player, clock=clock)
+        self.clock = self.engine.clock  # 界面与调度器使用同一个时钟，测试和仿真时可注入虚拟时钟
+        self._scheduler_job = None
+        self._importer = None  # 正在进行的流式导入
+        self._import_ids = []  # 已追加到任务仓库的导入任务ID
+        self._import_renamed = {}  # 与现有任务ID重复而分配了新ID的导入任务: 新ID -> 文件中的ID
+        self._import_replaced_ids = set()  # 清空并导入时，导入完成后被替换的原有任务
+        # 任务仓库是内存中唯一的任务数据，表格、调度引擎和任务服务(持久化)都订阅它的变化
+        # storage_backend 为 sqlite 时任务保存在数据库中，JSON 文件仅用于导入导出；
+        # JSON 任务文件的状态变化写入状态日志，整体保存时同时写入默认任务文件
+        self.task_service = create_task_service(task_file_path, mirror_path=TASK_FILE_PATH)
+        self.repository = self.task_service.repository
+        self.file_watcher = None  # JSON 任务文件被其他程序修改后增量重新加载
+        if not self.task_service.storage.row_updates:
+            self.file_watcher = TaskFileWatcher(self.task_service.task_file_path)
+        self.engine.attach_repository(self.repository)
+        self.repository.subscribe(self._on_repository_change)
         self.setup_root_window()
         self.init_variables()
         #pygame.init()
@@ -56,10 +108,6 @@ class AudioPlayer:
         self.start_periodic_checks()
         self.setup_shortcuts()
 
-        # 设置回调
-        self.player.on_progress = self._update_progress_ui
-        self.player.on_complete = self._on_playback_complete
-
     def setup_shortcuts(self):
         """设置快捷键绑定，并确保按钮使用正确的样式"""
         # 播放/暂停 (Ctrl+P)
@@ -116,25 +164,37 @@ class AudioPlayer:
         self.main_frame.grid(row=0, column=0, sticky=(tk.W, tk.E, tk.N, tk.S), padx=10, pady=10)
         self.root.focus_force()  # 启动时强制焦点到主窗口
     def init_variables(self):
-        """初始化变量，优化资源管理"""
-        pygame.init()
-        pygame.mixer.init()
-        self.current_playing_sound = None
-        self.paused = False
-        self.current_playing_duration = 0
-        self.current_playing_position = 0
-        self.playing_thread = None
-        self.stop_thread = False
-        self.current_playing_item = None
+        """初始化变量，优化资源管理(pygame 由播放核心的音频线程初始化)"""
         self.current_time = None
         self.total_time = None
         # 添加任务计数器，避免重复计算
         self.task_count = 0
-        self.manual_stop = False
+
+    # 主通道的播放状态由引擎维护，界面只读取
+    @property
+    def current_playing_item(self):
+        """主通道正在播放(或已暂停)的任务所在的行"""
+        task = self.engine.current_task
+        return self.item_by_id.get(str(task.id)) if task else None
+
+    @property
+    def current_playing_sound(self):
+        task = self.engine.current_task
+        return task.audio_path if task else None
+
+    @property
+    def paused(self):
+        return self.engine.paused
+
+    @property
+    def current_playing_duration(self):
+        return self.player.current_duration
 
     def on_window_close(self):
         """窗口关闭时同时保存到两个文件位置"""
         self.save_all_tasks()  # 这里会同时保存到导入文件和默认文件
+        self.task_service.flush_status()  # 保存失败时仍确保状态变化写入
+        self.engine.export_metrics()
         self.root.destroy()
 
     
@@ -231,8 +291,8 @@ class AudioPlayer:
         column_widths = {"序号": 70, "任务名称": 180, "开始时间": 80, "结束时间": 80, 
                         "音量": 60, "播放日期/星期": 120, "文件路径": 250, "状态": 80}
         
-        self.tree = ttk.Treeview(tree_frame, columns=self.columns, show="headings", 
-                                selectmode="extended", style="Treeview")
+        self.tree = VirtualTreeview(tree_frame, columns=self.columns, show="headings",
+                                    selectmode="extended", style="Treeview")
         for col in self.columns:
             self.tree.heading(col, text=col)
             self.tree.column(col, width=column_widths[col], minwidth=50,
@@ -264,51 +324,29 @@ class AudioPlayer:
         self.tree.bind("<Up>", lambda e: "break")
         self.tree.bind("<Down>", lambda e: "break")
 
-    def update_task_index_display(self, item, is_playing=False):
-        """动态更新任务序号列，简化符号管理"""
-        if not item or item not in self.tree.get_children():
-            return
-        
-        try:
-            values = list(self.tree.item(item)["values"])
-            original_index = str(values[0]).replace("▶ ", "")  # 移除已有符号
-            new_index = f"▶ {original_index}" if is_playing else original_index
-            self.tree.set(item, "序号", new_index)
-        except Exception as e:
-            logging.warning(f"更新任务序号失败: {e}")
-
     def toggle_playback(self, event=None):
         """切换播放/暂停状态"""
         selected = self.tree.selection()
-        all_items = self.tree.get_children()
-        if not selected or len(selected) == len(all_items):  # 全选时禁用播放
+        # 虚拟表格直接返回模型中的行数，无需取出全部行
+        if not selected or len(selected) == len(self.tree):  # 全选时禁用播放
             messagebox.showinfo("提示", "请先选择单个任务进行播放（全选状态下不可播放）")
             return
 
         item = selected[0]
-        values = self.tree.item(item)["values"]
+        task = self._task_of(item)
 
         try:
             if not self.current_playing_sound:  # 无任务播放,开始播放选中任务
                 self.play_task(item)
                 
             elif self.current_playing_item == item:  # 当前任务,切换暂停/恢复
+                # 引擎修改任务状态，按钮和状态栏随仓库变化更新
                 if self.paused:
-                    # 恢复播放
-                    self.player.resume()
-                    self.paused = False 
-                    self.update_task_status(item, "正在播放", 'playing')
-                    self.update_task_index_display(item, is_playing=True)
-                    self.play_buttons_ref["播放/暂停"].config(text="⏸ 暂停")
-                    self.status_label.config(text=f"正在播放: {values[1]}")
+                    self.engine.resume()
+                    self.status_label.config(text=f"正在播放: {task.name}")
                 else:
-                    # 暂停播放
-                    self.player.pause()
-                    self.paused = True
-                    self.update_task_status(item, "已暂停", 'paused')
-                    self.update_task_index_display(item, is_playing=False)  
-                    self.play_buttons_ref["播放/暂停"].config(text="▶ 恢复")
-                    
+                    self.engine.pause()
+
             else:  # 选择了其他任务
                 self.stop_task()  # 停止当前播放
                 self.play_task(item)  # 播放新选中的任务
@@ -316,7 +354,6 @@ class AudioPlayer:
         except Exception as e:
             logging.error(f"切换播放状态失败: {e}")
             self.update_task_status(item, "操作失败", 'error')
-            self.update_task_index_display(item, is_playing=False)
             messagebox.showerror("错误", f"操作失败: {str(e)}")
 
     def setup_playback_controls(self):
@@ -340,6 +377,8 @@ class AudioPlayer:
             btn = ttk.Button(left_buttons_frame, text=f"{icon} {text} ({tooltip.split('(')[-1]}", style="Shortcut.TButton", command=command)
             btn.grid(row=i // 3, column=i % 3, padx=3, pady=3, sticky=(tk.W, tk.E))
             ToolTip(btn, tooltip)
+            if text == "导入任务":
+                self.import_button = btn  # 导入进行中改为取消按钮
         left_buttons_frame.grid_columnconfigure((0, 1, 2), weight=1)
 
         # 中间按钮（播放控制）
@@ -406,6 +445,9 @@ class AudioPlayer:
             result = os.system("w32tm /resync")
             
             if result == 0:
+                # 校时可能使系统时间跳变，立即重新锚定调度时钟并重新定时
+                if self.engine.check_clock():
+                    self._arm_scheduler()
                 self.status_label.config(text="时间同步成功")
                 messagebox.showinfo("提示", "系统时间已成功同步")
             else:
@@ -424,42 +466,35 @@ class AudioPlayer:
             messagebox.showinfo("提示", "请先选择任务")
             return
         
-        current_date = datetime.datetime.now().strftime("%Y-%m-%d")
-        current_weekday = ["一", "二", "三", "四", "五", "六", "日"][datetime.datetime.now().weekday()]
+        today = self.clock.now().date()  # 与调度器使用同一个时钟
         
         # 用于动态更新按钮文本
         all_paused = True
         all_resumed = True
         
-        for item in selected:
-            values = self.tree.item(item)["values"]
-            schedule_str = values[5]  # 播放日期/星期
-            
-            # 检查是否为今天的任务
-            date_match = False
-            if "," in schedule_str:  # 星期模式
-                date_match = current_weekday in [day.strip() for day in schedule_str.split(",")]
-            elif schedule_str == current_date:  # 单次日期模式
-                date_match = True
-            
-            if not date_match:
-                continue
-            
-            current_status = values[-1]
-            if current_status == "Pause today":
-                # 恢复任务
-                if item == self.current_playing_item:
-                    self.stop_task()  # 如果正在播放，先停止
-                self.update_task_status(item, "等待播放", 'waiting')
-                self.status_label.config(text=f"任务 '{values[1]}' 已恢复今天播放")
-                all_paused = False
-            else:
-                # 暂停任务
-                if item == self.current_playing_item:
-                    self.stop_task()
-                self.update_task_status(item, "Pause today", "paused_today")
-                self.status_label.config(text=f"任务 '{values[1]}' 已暂停今天播放")
-                all_resumed = False
+        # 多选时合并为一次状态变化通知
+        with self.repository.batch():
+            for item in selected:
+                task = self._task_of(item)
+
+                # 检查是否为今天的任务
+                if not task or not self._is_scheduled_today(task, today):
+                    continue
+
+                if task.is_paused_today:
+                    # 恢复任务
+                    if item == self.current_playing_item:
+                        self.stop_task()  # 如果正在播放，先停止
+                    self.update_task_status(item, "等待播放", 'waiting')
+                    self.status_label.config(text=f"任务 '{task.name}' 已恢复今天播放")
+                    all_paused = False
+                else:
+                    # 暂停任务
+                    if item == self.current_playing_item:
+                        self.stop_task()
+                    self.update_task_status(item, "Pause today", "paused_today")
+                    self.status_label.config(text=f"任务 '{task.name}' 已暂停今天播放")
+                    all_resumed = False
         
         # 更新按钮文本（仅当所有选定任务状态一致时切换）
         if selected:
@@ -467,8 +502,6 @@ class AudioPlayer:
                 self.play_buttons_ref["暂停今天"].config(text="⏸ 恢复今天 (Ctrl+Q)")
             elif all_resumed:
                 self.play_buttons_ref["暂停今天"].config(text="⏸ 暂停今天 (Ctrl+Q)")
-        
-        self.save_all_tasks()  # 保存状态
 
     def setup_status_bar(self):
         """设置状态栏，优化布局和响应性"""
@@ -495,213 +528,327 @@ class AudioPlayer:
         self.task_file_label.pack(side=tk.RIGHT, padx=5)
         self.time_label = ttk.Label(right_status_frame, style="Custom.TLabel", width=25, anchor="e")
         self.time_label.pack(side=tk.RIGHT, padx=5)
+        self.latency_label = ttk.Label(right_status_frame, style="Custom.TLabel", text=self.engine.metrics.format_summary(), anchor="e")
+        self.latency_label.pack(side=tk.RIGHT, padx=5)
 
     def load_tasks(self):
-        """加载任务，优化批量插入性能并按开始时间排序"""
-        task_file_path = self.task_file_path or TASK_FILE_PATH
-        tasks = load_tasks(task_file_path)
+        """加载任务，按当前时间推算状态后整体放入任务仓库"""
+        now = self.clock.now()
+        # 加载和推算状态合并为一次变化通知，刚从存储读出的任务无需写回
+        with self.repository.batch():
+            self.task_service.load_tasks()
+            tasks = self.task_service.tasks
+            if self.file_watcher:
+                self.file_watcher.mark()
+                if tasks:
+                    # 保持导入文件和默认文件一致，内容未变化时不会写盘
+                    self.task_service.save_tasks()
+            for task in tasks:
+                task.status = self._derive_status(task, now)
+            self.repository.reset(tasks, persist=False)
+
         if not tasks:
             self.status_label.config(text="无任务可加载")
             return
-
-        self.save_all_tasks()
-        
-        now = datetime.datetime.now()
-        current_time = now.time()
-        current_date = now.strftime("%Y-%m-%d")
-        current_weekday = ["一", "二", "三", "四", "五", "六", "日"][now.weekday()]
-        
-        # 暂停 Treeview 更新
-        self.tree.configure(displaycolumns=())
-        self.tree.delete(*self.tree.get_children())
-        self.task_id_map.clear()  # 清空现有映射
-        
-        total_tasks = 0
-        for task in tasks:
-            self._add_task_to_tree(task, current_time, current_date, current_weekday)
-            total_tasks += 1
-        
-        # 恢复显示并刷新
-        self.tree.configure(displaycolumns=self.columns)
-        self.status_label.config(text=f"已加载 {total_tasks} 个任务")
-
-    def _add_task_to_tree(self, task, current_time, current_date, current_weekday):
-        """添加任务到 Treeview，优化状态判断并维护 task_id_map"""
+        self.status_label.config(text=f"已加载 {len(tasks)} 个任务")
+
+    def _task_of(self, item):
+        """表格行对应的任务"""
+        return self.repository.get(self.task_id_map.get(item))
+
+    def upsert_task(self, task):
+        """新增或替换任务(编辑窗口保存时调用)，返回是否保存成功
+
+        新任务和修改了开始时间的任务放到开始时间对应的位置，其他修改保持原位置。
+        """
+        task.status = self._derive_status(task, self.clock.now())
+        old = self.repository.get(task.id)
+        with self.repository.batch():
+            if old and old.start_time == task.start_time:
+                self.repository.update(task)
+            else:
+                if old:
+                    self.repository.remove([task.id])
+                self.repository.add(task, self._start_time_index(task))
+        return self.task_service.saved
+
+    def _start_time_index(self, task):
+        """按开始时间插入任务的位置：第一个开始时间更晚的任务之前"""
+        tasks = self.repository.tasks()
+        return next((i for i, other in enumerate(tasks) if other.start_time > task.start_time), len(tasks))
+
+    def _derive_status(self, task, now):
+        """根据任务数据和当前时间推算加载时显示的状态"""
+        if not os.path.exists(task.audio_path):
+            return "文件丢失"
+        if task.start_seconds is None or task.end_seconds is None:
+            logging.warning(f"时间格式错误: {task.start_time} - {task.end_time}")
+            return "时间格式错误"
+        current_seconds = seconds_of_day(now)
+        if not self._is_scheduled_today(task, now.date()) or current_seconds < task.start_seconds:
+            return "等待播放"
+        if current_seconds <= task.end_seconds:
+            # 保留 Pause today 状态
+            return task.status if task.status in ["正在播放", "Pause today"] else "等待播放"
+        return "已播放"
+
+    @staticmethod
+    def _task_values(task):
+        """任务在表格中的各列，第一列为任务ID(表格中显示为序号)"""
+        return [task.id, task.name, task.start_time, task.end_time, task.volume, task.schedule, task.audio_path,
+                task.status]
+
+    def _on_repository_change(self, change):
+        """任务仓库变化时更新表格：只在末尾追加时直接插入新行，增删、排序或整体替换时比对全部行，只有内容或状态变化时只重绘对应的行"""
         try:
-            if isinstance(task, dict):
-                values = [task.get('id', ''), task.get('name', ''), task.get('startTime', ''), task.get('endTime', ''), task.get('volume', ''), task.get('schedule', ''), task.get('audioPath', ''), task.get('status', 'waiting')]
+            if self._is_append(change):
+                self._append_rows(len(self.repository) - len(change.added))
+            elif change.structural:
+                self._reconcile_rows([(self._task_values(task), self._status_tag(task.status))
+                                      for task in self.repository.tasks()])
             else:
-                values = list(task) + ["waiting"] if len(task) < 8 else list(task)
-
-            if len(values) < 8:
-                logging.warning(f"任务数据不完整: {task}")
-                return
-
-            start_time_str, end_time_str, schedule_str, audio_path = values[2], values[3], values[5], values[6]
+                for task_id in change.updated | change.status:
+                    self._render_row(task_id)
+            if change.status or change.structural:
+                self._update_playback_controls(change)
+            if (change.structural or change.updated) and self._scheduler_job is not None:
+                # 引擎先于表格订阅，调度器已按变化更新，重新为最早到期的任务定时
+                self._arm_scheduler()
+        except Exception as e:
+            logging.error(f"刷新任务列表失败: {e}")
 
-            if not os.path.exists(audio_path):
-                values[-1] = "文件丢失"
-                status_tag = 'error'
+    def _update_playback_controls(self, change):
+        """按引擎的主通道播放状态更新播放按钮和状态栏，引擎修改任务状态后由仓库变化通知调用"""
+        task = self.engine.current_task
+        self.play_buttons_ref["停止"].config(state="normal" if task else "disabled")
+        if task is None:
+            self.play_buttons_ref["播放/暂停"].config(text="▶ 播放/暂停")
+            if self._importer is None:
+                self.progress_bar['value'] = 0
+        else:
+            self.play_buttons_ref["播放/暂停"].config(text="▶ 恢复" if self.engine.paused else "⏸ 暂停")
+        if len(change.status) == 1:
+            changed = self.repository.get(next(iter(change.status)))
+            if changed is task and not self.engine.paused:
+                self.status_label.config(text=f"正在播放: {task.name}")
+            elif changed:
+                self.status_label.config(text=f"任务: {changed.name} - {changed.status}")
+
+    def _is_playing_item(self, item):
+        """行是否为主通道正在播放(未暂停)的任务，序号列显示 ▶"""
+        return item is not None and item == self.current_playing_item and not self.paused
+
+    def _is_append(self, change):
+        """变化是否只是在末尾追加了任务(如导入时按块追加)"""
+        if change.reset or change.reordered or change.removed or change.updated or change.status or not change.added:
+            return False
+        start = len(self.repository) - len(change.added)
+        return start == len(self.tree) and set(self.repository.ids()[start:]) == change.added
+
+    def _append_rows(self, start):
+        """为仓库中从 start 开始的任务在表格末尾插入新行，不比对已有的行"""
+        for index, task in enumerate(self.repository.tasks()[start:], start):
+            values = self._task_values(task)
+            values[0] = index + 1
+            tags = ('oddrow' if index % 2 else 'evenrow', self._status_tag(task.status))
+            item = self.tree.insert("", "end", values=values, tags=tags)
+            self._row_cache[item] = (tuple(str(v) for v in values), tags)
+            self.task_id_map[item] = task.id
+            self.item_by_id[task.id] = item
+
+    def _render_row(self, task_id):
+        """重绘单个任务的行，内容未变化时跳过"""
+        item = self.item_by_id.get(str(task_id))
+        task = self.repository.get(task_id)
+        if not item or not task or not self.tree.exists(item):
+            return
+        index = self.repository.index(task_id)
+        values = self._task_values(task)
+        values[0] = f"▶ {index + 1}" if self._is_playing_item(item) else index + 1
+        tags = ('oddrow' if index % 2 else 'evenrow', self._status_tag(task.status))
+        signature = (tuple(str(v) for v in values), tags)
+        if self._row_cache.get(item) != signature:
+            self.tree.item(item, values=values, tags=tags)
+            self._row_cache[item] = signature
+
+    @staticmethod
+    def _status_tag(status_text):
+        """状态文本对应的样式标签"""
+        if status_text == "正在播放":
+            return 'playing'
+        if status_text == "已暂停":
+            return 'paused'
+        if status_text == "Pause today":
+            return 'paused_today'
+        if status_text in ["文件丢失", "时间格式错误", "播放失败", "操作失败"]:
+            return 'error'
+        return 'waiting'
+
+    def _reconcile_rows(self, rows):
+        """按任务ID对比新数据与现有行，只对变化的行执行插入、移动、更新和删除
+
+        rows 为 (values, status_tag) 列表，values[0] 为任务ID，序号列显示行在列表中的位置。
+        """
+        children = self.tree.get_children()
+        alive = set(children)
+        item_by_id = {}
+        for item, task_id in self.task_id_map.items():
+            if item in alive:
+                item_by_id.setdefault(str(task_id), item)
+
+        # 为每个新行找到可复用的现有行
+        targets = [item_by_id.pop(str(values[0]), None) for values, _ in rows]
+        used = {item for item in targets if item}
+        removed = [item for item in children if item not in used]
+        if removed:
+            self.tree.delete(*removed)
+            for item in removed:
+                self._row_cache.pop(item, None)
+
+        # 保持相对顺序不变的最长子序列无需移动，其余行插到前一行之后
+        position = {item: i for i, item in enumerate(item for item in children if item in used)}
+        stable = _longest_increasing_subsequence([position[item] for item in targets if item])
+        kept_index = 0
+
+        new_map = {}
+        prev = None
+        for index, ((values, status_tag), item) in enumerate(zip(rows, targets)):
+            task_id = str(values[0])
+            values = list(values)
+            values[0] = f"▶ {index + 1}" if self._is_playing_item(item) else index + 1
+            tags = ('oddrow' if index % 2 else 'evenrow', status_tag)
+            signature = (tuple(str(v) for v in values), tags)
+
+            if item is None:
+                item = self.tree.insert("", self.tree.index(prev) + 1 if prev else 0, values=values, tags=tags)
             else:
-                try:
-                    start_time = datetime.datetime.strptime(start_time_str, "%H:%M:%S").time()
-                    end_time = datetime.datetime.strptime(end_time_str, "%H:%M:%S").time()
-                    now = datetime.datetime.now()
-                    current_datetime = datetime.datetime.combine(now.date(), current_time)
-                    start_datetime = datetime.datetime.combine(now.date(), start_time)
-                    end_datetime = datetime.datetime.combine(now.date(), end_time)
-
-                    if "," in schedule_str:
-                        weekdays = [day.strip() for day in schedule_str.split(",")]
-                        scheduled_today = current_weekday in weekdays
-                    else:
-                        scheduled_today = schedule_str == current_date
-
-                    if not scheduled_today:
-                        values[-1] = "等待播放"
-                    elif current_datetime < start_datetime:
-                        values[-1] = "等待播放"
-                    elif start_datetime <= current_datetime <= end_datetime:
-                        if values[-1] not in ["正在播放", "Pause today"]:  # 保留 Pause today 状态
-                            values[-1] = "等待播放"
-                    else:
-                        values[-1] = "已播放"
+                if self._row_cache.get(item) != signature:
+                    self.tree.item(item, values=values, tags=tags)
+                if kept_index not in stable:
+                    self.tree.move(item, "", self.tree.index(prev) + 1 if prev else 0)
+                kept_index += 1
 
-                    status_tag = 'playing' if values[-1] == "正在播放" else 'waiting'
-                    if values[-1] == "已播放":
-                        status_tag = 'waiting'
-                    elif values[-1] == "Pause today":
-                        status_tag = 'paused_today'
+            self._row_cache[item] = signature
+            new_map[item] = task_id
+            prev = item
 
-                except ValueError as e:
-                    logging.warning(f"时间格式错误: {e}")
-                    values[-1] = "时间格式错误"
-                    status_tag = 'error'
-
-            row_index = len(self.tree.get_children())
-            row_tag = 'oddrow' if row_index % 2 else 'evenrow'
-            new_item = self.tree.insert("", "end", values=values, tags=(row_tag, status_tag))
-            self.task_id_map[new_item] = values[0]
-
-        except Exception as e:
-            logging.error(f"添加任务失败: {e}")
-            pass
+        self.task_id_map.clear()
+        self.task_id_map.update(new_map)
+        self.item_by_id = {task_id: item for item, task_id in new_map.items()}
 
     def start_periodic_checks(self):
         """启动定期检查，优化事件调度"""
         self.root.after(0, self.update_time)  # 立即启动时间更新
-        self.root.after(0, self.check_tasks)  # 立即启动任务检查
+        self._arm_scheduler()  # 为最早到期的任务定时
+        self._pump_player_events()  # 处理播放结束事件并刷新进度
+        self.root.after(STATUS_FLUSH_INTERVAL_MS, self.flush_status_changes)
+        self.root.after(METRICS_EXPORT_INTERVAL_MS, self.export_metrics)
+        if self.file_watcher:
+            self.root.after(TASK_FILE_POLL_MS, self.check_task_file)
+
+    def _pump_player_events(self):
+        """在 Tk 主循环中分发音频线程发布的播放事件，播放中才计算进度，空闲时降低频率"""
+        try:
+            self.player.poll_events()
+            if self.engine.poll_metrics():
+                self.latency_label.config(text=self.engine.metrics.format_summary())
+            if self.current_playing_sound and not self.paused and self.root.state() != "iconic":
+                elapsed, progress = self.player.get_progress()
+                self._update_progress_ui(elapsed, progress)
+        except Exception as e:
+            logging.error(f"处理播放事件失败: {e}")
+        finally:
+            interval = PLAYER_EVENT_POLL_MS if self.current_playing_sound else PLAYER_IDLE_POLL_MS
+            self.root.after(interval, self._pump_player_events)
+
+    def flush_status_changes(self):
+        """定时将状态日志中的变化批量写入任务文件"""
+        try:
+            self.task_service.flush_status()
+        except Exception as e:
+            logging.warning(f"合并任务状态失败: {e}")
+        finally:
+            self.root.after(STATUS_FLUSH_INTERVAL_MS, self.flush_status_changes)
+
+    def export_metrics(self):
+        """定时导出触发延迟统计并刷新状态栏"""
+        try:
+            self.engine.export_metrics()
+            self.latency_label.config(text=self.engine.metrics.format_summary())
+        finally:
+            self.root.after(METRICS_EXPORT_INTERVAL_MS, self.export_metrics)
+
+    def check_task_file(self):
+        """定时检查任务文件是否被其他程序修改，只把新增、删除和修改的任务应用到任务仓库和表格
+
+        已有任务保留内存中的状态，正在播放的任务不会被打断；重新加载的内容不写回任务文件。
+        """
+        try:
+            # 导入进行中不检查，导入完成后会整体保存任务文件
+            data = self.file_watcher.check() if self._importer is None else None
+            if data is not None:
+                now = self.clock.now()
+                tasks = [task for task in map(Task.from_data, data) if task]
+                for task in tasks:
+                    current = self.repository.get(task.id)
+                    task.status = current.status if current else self._derive_status(task, now)
+                change = self.repository.sync(tasks, persist=False)
+                if not change.empty:
+                    self.status_label.config(text=f"任务文件已被修改：新增 {len(change.added)} 个，"
+                                                  f"修改 {len(change.updated)} 个，删除 {len(change.removed)} 个任务")
+        except Exception as e:
+            logging.warning(f"检查任务文件失败: {e}")
+        finally:
+            self.root.after(TASK_FILE_POLL_MS, self.check_task_file)
 
     def update_time(self):
-        """更新时间显示，并在新一天重置 'Pause today' 状态"""
+        """更新时间显示；新一天的 'Pause today' 重置由引擎在调度时完成，表格随仓库变化更新"""
         try:
-            now = datetime.datetime.now()
+            # 先检查时钟跳变：读取时间本身也会重新锚定，之后就检测不到跳变了
+            jump = self.engine.check_clock()
+            now = self.clock.now()
             weekday_zh = ["星期一", "星期二", "星期三", "星期四", "星期五", "星期六", "星期日"][now.weekday()]
             time_str = now.strftime("%Y-%m-%d %H:%M:%S")
             self.time_label.config(text=f"{time_str} {weekday_zh}")
             
-            # 检查是否进入新的一天，重置 "Pause today" 状态
-            current_date = now.strftime("%Y-%m-%d")
-            if not hasattr(self, 'last_date') or self.last_date != current_date:
-                self.last_date = current_date
-                for item in self.tree.get_children():
-                    values = self.tree.item(item)['values']
-                    if values[-1] == "Pause today":
-                        self.update_task_status(item, "等待播放", 'waiting')
-                self.save_all_tasks()
+            # NTP 或手动校时导致系统时间跳变时，调度定时器按新的时间重新设置
+            if jump:
+                self._arm_scheduler()
         except Exception as e:
             logging.warning(f"时间更新失败: {e}")
         finally:
             self.root.after(1000, self.update_time)
 
     def check_tasks(self):
-        """定期检查任务，优化调度逻辑"""
+        """调度定时器回调：由引擎处理已到期的任务，然后为下一个到期任务重新定时"""
+        self._scheduler_job = None
         try:
-            now = datetime.datetime.now()
-            current_time = now.time()
-            current_date = now.strftime("%Y-%m-%d")
-            current_weekday = ["一", "二", "三", "四", "五", "六", "日"][now.weekday()]
-
-            for item in self.tree.get_children():
-                values = self.tree.item(item)['values']
-                current_status = values[-1]
-                
-                # 跳过特定状态的任务
-                if current_status in ["已暂停", "Pause today"]:
-                    continue
-
-                start_time_str, schedule_str, audio_path = values[2], values[5], values[6]
-                if not os.path.exists(audio_path):
-                    self.update_task_status(item, "文件丢失", 'error')
-                    continue
-
-                try:
-                    # 解析时间
-                    start_time = datetime.datetime.strptime(start_time_str, "%H:%M:%S").time()
-                    now_time = datetime.datetime.strptime(now.strftime("%H:%M:%S"), "%H:%M:%S").time()
-                    
-                    # 检查是否是今天的任务
-                    is_today = False
-                    if "," in schedule_str:  # 每周重复模式
-                        weekdays = [day.strip() for day in schedule_str.split(",")]
-                        is_today = current_weekday in weekdays
-                    else:  # 单次日期模式
-                        is_today = schedule_str == current_date
-                    
-                    # 检查时间是否匹配
-                    time_matches = (start_time.hour == now_time.hour and 
-                                  start_time.minute == now_time.minute and 
-                                  start_time.second == now_time.second)
-
-                    if is_today and time_matches:
-                        # 如果当前有其他任务在播放，强制切换
-                        if self.current_playing_item and self.current_playing_item != item:
-                            old_item = self.current_playing_item
-                            self.stop_task()  # 停止当前任务
-                            # 更新原任务的状态
-                            self.update_task_status(old_item, "等待播放", 'waiting')
-                            self.update_task_index_display(old_item, is_playing=False)
-                        
-                        # 播放新任务
-                        self.play_task(item, force_switch=True)
-
-                except ValueError as e:
-                    logging.warning(f"任务时间格式无效: {e}")
-                    self.update_task_status(item, "时间格式错误", 'error')
-
+            if self.engine.tick():
+                self.latency_label.config(text=self.engine.metrics.format_summary())
         except Exception as e:
             logging.error(f"任务检查失败: {e}")
         finally:
-            self.root.after(1000, self.check_tasks)
+            self._arm_scheduler()
+
+    def _arm_scheduler(self):
+        """为最早到期的任务设置唯一的定时器"""
+        if self._scheduler_job:
+            self.root.after_cancel(self._scheduler_job)
+        self._scheduler_job = self.root.after(int(self.engine.next_delay() * 1000), self.check_tasks)
 
-    def _is_scheduled_today(self, schedule_str, current_date, current_weekday):
+    def _find_item_by_task_id(self, task_id):
+        item = self.item_by_id.get(str(task_id))
+        return item if item and self.tree.exists(item) else None
+
+    def _is_scheduled_today(self, task, today):
         """辅助方法：检查任务是否计划在今天执行"""
-        if "," in schedule_str:
-            return current_weekday in [day.strip() for day in schedule_str.split(",")]
-        return schedule_str == current_date
+        return task.is_scheduled_on(today)
 
-    def _should_play_task(self, values, current_time, current_weekday, current_date):
-        try:
-            task_time = values[2]
-            task_date = values[5]
-            task_time_obj = datetime.datetime.strptime(task_time, "%H:%M:%S").time()
-            current_time_obj = current_time.time()
-            # 仅比较时分秒，忽略日期
-            time_match = (task_time_obj.hour == current_time_obj.hour and
-                          task_time_obj.minute == current_time_obj.minute and
-                          task_time_obj.second == current_time_obj.second)
-            if not time_match:
-                return False
-            if "," in task_date:
-                weekdays = [day.strip() for day in task_date.split(",")]
-                return current_weekday in weekdays
-            else:
-                return task_date == current_date
-        except ValueError as e:
-            logging.warning(f"Task validation error: {e}")
-            return False
+    def _should_play_task(self, task, now):
+        """辅助方法：检查任务是否应在当前这一秒开始播放"""
+        return task.start_seconds == seconds_of_day(now) and task.is_scheduled_on(now.date())
 
-    def play_task(self, item=None, force_switch=False):
+    def play_task(self, item=None, force_switch=False, start_offset=0):
         """播放任务的统一入口"""
         try:
             if not item:
@@ -710,211 +857,88 @@ class AudioPlayer:
                     messagebox.showinfo("提示", "请先选择要播放的任务")
                     return
                 item = selected[0]
-            
-            values = self.tree.item(item)['values']
-            file_path = values[6]
-            volume = int(values[4])
-            
-            # 检查文件是否存在
-            if not os.path.exists(file_path):
-                self.update_task_status(item, "文件丢失", 'error')
-                messagebox.showerror("错误", f"音频文件未找到: {file_path}")
+
+            task = self._task_of(item)
+            if not task:
                 return
 
-            # 播放音频
-            success, duration = self.player.play(file_path, volume, force_switch=force_switch)
-            if not success:
-                raise Exception("音频加载失败")
-
-            # 更新状态
-            self.manual_stop = False
-            self.current_playing_sound = file_path
-            self.current_playing_item = item
-            self.current_playing_duration = duration
-            self.paused = False
-            
-            # 更新UI
-            self.update_task_status(item, "正在播放", 'playing')
-            self.update_task_index_display(item, is_playing=True)
-            self.play_buttons_ref["停止"].config(state="normal")
-            self.play_buttons_ref["播放/暂停"].config(text="⏸ 暂停")
-            self.status_label.config(text=f"正在播放: {values[1]}")
-            
+            # 由引擎播放并修改任务状态(文件丢失、播放失败或正在播放)，表格和按钮随仓库变化更新
+            # 音频线程未及时返回时 success 为 None，最终结果由引擎处理 late_result 事件更新
+            success, _ = self.engine.play_task(task, force_switch=force_switch, start=start_offset)
+            if success is False:
+                if task.status == "文件丢失":
+                    messagebox.showerror("错误", f"音频文件未找到: {task.audio_path}")
+                else:
+                    messagebox.showerror("错误", "播放失败: 音频加载失败")
+
         except Exception as e:
             logging.error(f"播放任务失败: {e}")
             if item:
                 self.update_task_status(item, "播放失败", 'error')
-                self.update_task_index_display(item, is_playing=False)
             messagebox.showerror("错误", f"播放失败: {str(e)}")
 
     def stop_task(self, event=None):
-        """停止当前播放任务"""
+        """停止当前播放任务并清空播放队列，任务状态由引擎修改"""
         if not self.current_playing_sound:
             return
 
         try:
-            # 设置手动停止标志
-            self.manual_stop = True
-            # 停止播放和清空队列
-            self.player.stop()
-            
-            # 更新任务状态
-            if self.current_playing_item and self.current_playing_item in self.tree.get_children():
-                values = self.tree.item(self.current_playing_item)["values"]
-                now = datetime.datetime.now()
-                try:
-                    start_time = datetime.datetime.strptime(values[2], "%H:%M:%S").time()
-                    end_time = datetime.datetime.strptime(values[3], "%H:%M:%S").time()
-                    current_time = now.time()
-                    status_text = "等待播放" if current_time < end_time else "已播放"
-                except ValueError:
-                    status_text = "等待播放"
-                
-                self.update_task_status(self.current_playing_item, status_text, 'waiting')
-                self.update_task_index_display(self.current_playing_item, is_playing=False)
-            
-            # 重置状态
-            self.current_playing_sound = None
-            self.current_playing_item = None
-            self.current_playing_duration = 0
-            self.manual_stop = False
-            self.paused = False
-            
-            # 更新UI
-            self.play_buttons_ref["停止"].config(state="disabled")
-            self.play_buttons_ref["播放/暂停"].config(text="▶ 播放/暂停")
+            self.engine.stop_main()
             self.status_label.config(text="就绪")
             self.progress_bar['value'] = 0
-
         except Exception as e:
             logging.error(f"停止任务失败: {e}")
             self.status_label.config(text="停止任务出错")
 
     def pause_task(self):
         if self.current_playing_sound and not self.paused:
-            pygame.mixer.music.pause()
-            self.paused = True
-            self.current_playing_position = pygame.mixer.music.get_pos()
-            self.update_task_status(self.current_playing_item, "已暂停", 'paused')
-            self.play_buttons_ref["播放/暂停"].config(text="▶ 继续")
-
-    def update_play_progress(self, lock):
-        """更新播放进度，优化线程退出和UI刷新"""
-        try:
-            while not self.stop_thread and self.current_playing_sound and not self.manual_stop:
-                with lock:
-                    if pygame.mixer.music.get_busy() and not self.paused:
-                        # 检查当前播放的任务项是否还存在
-                        if not self.current_playing_item or self.current_playing_item not in self.tree.get_children():
-                            self.root.after(0, self._on_playback_complete)
-                            break
-                        
-                        current_position = pygame.mixer.music.get_pos() / 1000  # 转换为秒
-                        progress = min((current_position / self.current_playing_duration) * 100, 100)
-                        self.root.after(0, self._update_progress_ui, current_position, progress)
-                    elif not pygame.mixer.music.get_busy() and not self.paused:
-                        # 播放自然结束
-                        self.root.after(0, self._on_playback_complete)
-                        break
-                time.sleep(0.5)  # 降低刷新频率到 0.5 秒
-        except Exception as e:
-            logging.error(f"播放进度更新失败: {e}")
-            self.root.after(0, self.stop_task)
+            self.engine.pause()
 
     def _update_progress_ui(self, elapsed, progress):
         """更新播放进度UI"""
         try:
-            if not self.current_playing_item or self.current_playing_item not in self.tree.get_children():
+            if not self.current_playing_item or not self.tree.exists(self.current_playing_item):
                 return
 
             elapsed_str = time.strftime('%M:%S', time.gmtime(elapsed))
             total_str = time.strftime('%M:%S', time.gmtime(self.current_playing_duration))
 
-            try:
-                values = self.tree.item(self.current_playing_item)["values"]
-                self.status_label.config(text=f"正在播放: {values[1]} ({elapsed_str}/{total_str})")
+            task = self._task_of(self.current_playing_item)
+            if not task:
+                return
+            if self._importer is None:
+                # 导入进行中进度条和状态栏显示导入进度
+                self.status_label.config(text=f"正在播放: {task.name} ({elapsed_str}/{total_str})")
                 self.progress_bar['value'] = progress
-            except tk.TclError:
-                # 如果任务项已被删除或修改，停止播放
-                self.root.after(0, self._on_playback_complete)
         except Exception as e:
             # 仅在调试级别记录这个警告，避免刷屏
             logging.debug(f"UI更新失败: {e}")
 
-    def _on_playback_complete(self):
-        """处理播放自然结束"""
-        try:
-            self.progress_bar['value'] = 0
-            if self.current_playing_item and self.current_playing_item in self.tree.get_children():
-                try:
-                    values = self.tree.item(self.current_playing_item)["values"]
-                    self.update_task_status(self.current_playing_item, "已播放", 'waiting')
-                    self.update_task_index_display(self.current_playing_item, is_playing=False)
-                except tk.TclError:
-                    logging.info("正在播放的任务项已被移除")
-            
-            # 无论是否成功更新状态，都清理播放状态
-            self.current_playing_sound = None
-            self.current_playing_item = None
-            self.paused = False
-            if hasattr(self, 'play_buttons_ref'):
-                self.play_buttons_ref["停止"].config(state="disabled")
-                self.play_buttons_ref["播放/暂停"].config(text="▶ 播放/暂停")
-            if hasattr(self, 'status_label'):
-                self.status_label.config(text="就绪")
-            self.play_buttons_ref["播放/暂停"].config(text="▶ 播放/暂停")
-        except Exception as e:
-            logging.error(f"播放完成处理失败: {e}")
-            # 确保状态被重置
-            self.current_playing_sound = None
-            self.current_playing_item = None
-            self.paused = False
-            if hasattr(self, 'status_label'):
-                self.status_label.config(text="就绪")
-
-
     def update_task_status(self, item, status_text, status_tag):
-        """更新任务状态和样式"""
-        if not item or item not in self.tree.get_children():
+        """更新任务状态和样式，表格行由任务仓库的变化通知重绘，状态由持久化订阅者保存"""
+        task = self._task_of(item)
+        if not task or not self.tree.exists(item):
             return
-            
+
         try:
-            values = list(self.tree.item(item)["values"])
-            tags = list(self.tree.item(item)["tags"])
-            
-            # 更新状态文本
-            if len(values) < len(self.columns):
-                values.extend([""] * (len(self.columns) - len(values)))
-            values[-1] = status_text
-            
-            # 更新样式标签
-            status_tags = ['playing', 'paused', 'waiting', 'error', 'paused_today', 'completed']
-            tags = [tag for tag in tags if tag not in status_tags] + [status_tag]
-            
             # 应用样式
             if status_tag in self.status_colors:
                 style_dict = self.status_colors[status_tag]
-                self.tree.tag_configure(status_tag, 
+                self.tree.tag_configure(status_tag,
                                       foreground=style_dict['fg'],
                                       background=style_dict['bg'])
-            
-            self.tree.item(item, values=values, tags=tags)
-            
-            # 更新任务数据
-            task_id = self.task_id_map.get(item)
-            if task_id:
-                set_task_status(task_id, status_text)
-            
+
+            self.repository.set_status(task.id, status_text)
+
             # 更新状态栏
-            task_name = values[1]
             if status_text == "已暂停":
-                elapsed = pygame.mixer.music.get_pos() / 1000 if self.current_playing_item == item else 0
+                elapsed = self.player.get_progress()[0] if self.current_playing_item == item else 0
                 elapsed_str = time.strftime('%M:%S', time.gmtime(elapsed))
                 total_str = time.strftime('%M:%S', time.gmtime(self.current_playing_duration))
-                self.status_label.config(text=f"任务: {task_name} ({elapsed_str}/{total_str}) - {status_text}")
+                self.status_label.config(text=f"任务: {task.name} ({elapsed_str}/{total_str}) - {status_text}")
             else:
-                self.status_label.config(text=f"任务: {task_name} - {status_text}")
-                
+                self.status_label.config(text=f"任务: {task.name} - {status_text}")
+
         except Exception as e:
             logging.error(f"更新任务状态失败: {e}")
             self.status_label.config(text=f"状态更新出错: {str(e)}")
@@ -922,13 +946,12 @@ class AudioPlayer:
     def add_task(self):
         """添加新任务，优化窗口管理和默认值"""
         try:
-            default_end_time = datetime.datetime.now().strftime("%H:%M:%S")
+            default_end_time = self.clock.now().strftime("%H:%M:%S")
             selected_items = self.tree.selection()
             if selected_items:
-                selected_item = selected_items[0]
-                values = self.tree.item(selected_item)['values']
-                if len(values) > 3:
-                    default_end_time = values[3]
+                task = self._task_of(selected_items[0])
+                if task:
+                    default_end_time = task.end_time
             
             # 检查窗口状态并创建新窗口
             if not hasattr(self, 'add_task_window') or self.add_task_window is None or self.add_task_window.window.winfo_exists() == 0:
@@ -956,7 +979,7 @@ class AudioPlayer:
                 return
             
             item = selected[0]
-            task_data = self.tree.item(item)['values']
+            task_data = self._task_values(self._task_of(item))
             
             # 检查窗口状态并创建新窗口
             if not hasattr(self, 'add_task_window') or self.add_task_window is None or self.add_task_window.window.winfo_exists() == 0:
@@ -996,12 +1019,12 @@ class AudioPlayer:
         
         try:
             # 如果删除的任务正在播放，先停止
-            for item in selected:
-                if item == self.current_playing_item:
-                    self.stop_task()
-                self.tree.delete(item)
-            
-            self.save_all_tasks()
+            if self.current_playing_item in selected:
+                self.stop_task()
+            self.repository.remove(self.task_id_map.get(item) for item in selected)
+            if not self.task_service.saved:
+                self.status_label.config(text="保存任务失败")
+                return
             self.status_label.config(text=f"已删除 {count} 个任务")
             messagebox.showinfo("成功", f"已删除 {count} 个任务")
             
@@ -1028,28 +1051,15 @@ class AudioPlayer:
         
         try:
             copied_count = 0
-            for item in selected:
-                values = list(self.tree.item(item)["values"])
-                # 生成新任务名称和ID
-                new_name = f"{values[1]} - 副本"
-                new_id = len(self.tree.get_children()) + 1
-                # 移除播放符号并更新ID
-                original_index = str(values[0]).replace("▶ ", "").strip()
-                values[0] = new_id
-                values[1] = new_name
-                # 重置状态为等待
-                if len(values) > 7:
-                    values[7] = "waiting"
-                else:
-                    values.append("waiting")
-                
-                # 插入新任务
-                row_index = len(self.tree.get_children())
-                row_tag = 'oddrow' if row_index % 2 else 'evenrow'
-                self.tree.insert("", "end", values=values, tags=(row_tag, 'waiting'))
-                copied_count += 1
-            
-            self.save_all_tasks()
+            with self.repository.batch():
+                for item in selected:
+                    task = self._task_of(item)
+                    if not task:
+                        continue
+                    # 副本使用新ID并排在原任务之后，播放设置随任务一起复制，状态重置为等待
+                    copy = dataclasses.replace(task, id=new_task_id(), name=f"{task.name} - 副本", status="waiting")
+                    self.repository.add(copy, self.repository.index(task.id) + 1)
+                    copied_count += 1
             self.status_label.config(text=f"已复制 {copied_count} 个任务")
             messagebox.showinfo("成功", f"成功复制 {copied_count} 个任务")
             
@@ -1087,102 +1097,140 @@ class AudioPlayer:
     #        messagebox.showerror("错误", f"移动任务失败: {str(e)}")
 
     def update_task_order(self):
-        """更新任务顺序并保存"""
+        """按当前显示顺序重新编号并保存"""
         try:
-            tasks = []
-            for idx, item in enumerate(self.tree.get_children(), 1):
-                values = list(self.tree.item(item)["values"])
-                original_index = str(values[0]).replace("▶ ", "").strip()
-                if original_index != str(idx):  # 只在序号变化时更新
-                    values[0] = idx
-                    self.tree.set(item, "序号", idx if not self.current_playing_item == item else f"▶ {idx}")
-                tasks.append({
-                    "id": values[0],
-                    "name": values[1],
-                    "startTime": values[2],
-                    "endTime": values[3],
-                    "volume": values[4],
-                    "schedule": values[5],
-                    "audioPath": values[6],
-                    "status": values[7] if len(values) > 7 else "waiting"
-                })
-            
-            # 直接保存，不排序，保持用户手动调整的顺序
-            if save_all_tasks(tasks):  # 调用外部工具函数
+            if self.save_all_tasks():
                 self.status_label.config(text="任务顺序已更新")
             else:
                 self.status_label.config(text="更新任务顺序失败")
-                
+
         except Exception as e:
             logging.error(f"更新任务顺序失败: {e}")
             self.status_label.config(text="更新顺序出错")
 
     def import_tasks(self):
-        """从文件导入任务，优化数据验证和用户交互"""
+        """从文件流式导入任务：后台线程解析和验证，界面线程按块追加到任务列表并显示进度，导入中再次执行时取消导入"""
+        if self._importer:
+            self.cancel_import()
+            return
         file_path = filedialog.askopenfilename(title="导入任务", filetypes=[("JSON文件", "*.json"), ("所有文件", "*.*")])
         if not file_path:
             return
-        
+
         try:
-            self.status_label.config(text="正在导入任务...")
-            with open(file_path, "r", encoding="utf-8") as f:
-                tasks = json.load(f)
-            
-            if not isinstance(tasks, list):
-                raise ValueError("文件格式错误：期望JSON数组")
-            
-            # 验证任务数据
-            valid_tasks = []
-            for task in tasks:
-                if not isinstance(task, (list, dict)) or len(task) < 7:
-                    logging.warning(f"跳过无效任务: {task}")
-                    continue
-                if isinstance(task, dict):
-                    required_keys = ["id", "name", "startTime", "endTime", "volume", "schedule", "audioPath"]
-                    if not all(key in task for key in required_keys):
-                        logging.warning(f"跳过缺少必要字段的任务: {task}")
-                        continue
-                valid_tasks.append(task)
-            
-            if not valid_tasks:
-                raise ValueError("文件中没有有效的任务数据")
-            
             # 询问用户是否清空现有任务
-            if self.tree.get_children():
+            replace = True
+            if len(self.repository):
                 action = messagebox.askyesnocancel("确认", "是否清空现有任务？\n是：清空并导入\n否：追加导入\n取消：中止")
                 if action is None:  # 用户取消
                     self.status_label.config(text="导入已取消")
                     return
-                elif action:  # 清空
-                    self.tree.delete(*self.tree.get_children())
-            
-            # 加载任务
-            now = datetime.datetime.now()
-            current_time = now.time()
-            current_date = now.strftime("%Y-%m-%d")
-            current_weekday = ["一", "二", "三", "四", "五", "六", "日"][now.weekday()]
-            
-            for task in valid_tasks:
-                self._add_task_to_tree(task, current_time, current_date, current_weekday)
-            
-            self.save_all_tasks()
-            total_tasks = len(valid_tasks)
-            self.task_file_path = file_path
-            from config_manager import save_task_file_path
-            save_task_file_path(file_path)
-            self.status_label.config(text=f"已导入 {total_tasks} 个任务")
-            self.task_file_label.config(text=f"当前任务文件: {self.task_file_path or TASK_FILE_PATH}")
-            messagebox.showinfo("成功", f"成功导入 {total_tasks} 个任务")
-            
-        except json.JSONDecodeError as e:
-            logging.error(f"JSON解析失败: {e}")
-            self.status_label.config(text="导入失败")
-            messagebox.showerror("错误", f"文件格式错误: {str(e)}")
+                replace = action
+
+            # 导入完成前原有任务保持不变并继续调度，导入的任务按块追加到末尾(不保存)，完成后整体排序保存
+            self._import_ids = []
+            self._import_renamed = {}
+            self._import_replaced_ids = set(self.repository.ids()) if replace else set()
+            now = self.clock.now()
+            self._importer = TaskImporter(file_path, lambda data: self._prepare_imported_task(data, now)).start()
+            self.import_button.config(text="⏹ 取消导入 (Ctrl+I)")
+            self.progress_bar['value'] = 0
+            self.status_label.config(text="正在导入任务...")
+            self.root.after(IMPORT_POLL_MS, self._poll_import)
+
         except Exception as e:
             logging.error(f"导入任务失败: {e}")
             self.status_label.config(text="导入失败")
             messagebox.showerror("错误", f"导入失败: {str(e)}")
 
+    def _prepare_imported_task(self, data, now):
+        """在导入线程中把任务数据转换为任务并推算状态，数据不完整时返回 None"""
+        task = Task.from_data(data)
+        if task:
+            task.status = self._derive_status(task, now)
+        return task
+
+    def _poll_import(self):
+        """把导入线程解析好的一块任务追加到任务仓库并刷新进度，全部完成后结束导入"""
+        importer = self._importer
+        if importer is None:
+            return
+        try:
+            chunk = importer.take()
+            if chunk:
+                file_ids = [task.id for task in chunk]
+                added = self.repository.extend(chunk, persist=False)
+                self._import_ids.extend(added)
+                self._import_renamed.update((new, old) for new, old in zip(added, file_ids) if new != old)
+            self.progress_bar['value'] = importer.progress
+            self.status_label.config(text=f"正在导入任务... 已导入 {len(self._import_ids)} 个 ({importer.progress:.0f}%)")
+
+            if not importer.finished:
+                self.root.after(IMPORT_POLL_MS, self._poll_import)
+            elif importer.error:
+                self._rollback_import()
+                self._end_import("导入失败")
+                if isinstance(importer.error, json.JSONDecodeError):
+                    messagebox.showerror("错误", f"文件格式错误: {str(importer.error)}")
+                else:
+                    messagebox.showerror("错误", f"导入失败: {str(importer.error)}")
+            else:
+                self._finish_import(importer)
+
+        except Exception as e:
+            logging.error(f"导入任务失败: {e}")
+            importer.cancel()
+            self._rollback_import()
+            self._end_import("导入失败")
+            messagebox.showerror("错误", f"导入失败: {str(e)}")
+
+    def _finish_import(self, importer):
+        """导入完成：按开始时间排序导入的任务并整体保存，清空并导入时移除原有任务"""
+        imported_ids = set(self._import_ids)
+        tasks = self.repository.tasks()
+        kept = [task for task in tasks if task.id not in imported_ids and task.id not in self._import_replaced_ids]
+        imported = [task for task in tasks if task.id in imported_ids]
+        if self._import_replaced_ids:
+            # 原有任务被替换后，因与其ID重复而分配了新ID的导入任务恢复文件中的ID
+            imported = [dataclasses.replace(task, id=self._import_renamed.get(task.id, task.id)) for task in imported]
+        self.save_all_tasks(kept + sorted(imported, key=lambda task: task.start_time))
+
+        total_tasks = len(imported)
+        self.task_file_path = importer.path
+        if self.file_watcher:
+            self.task_service.set_task_file(importer.path)
+            self.file_watcher.watch(importer.path)
+        from config_manager import save_task_file_path
+        save_task_file_path(importer.path)
+        self._end_import(f"已导入 {total_tasks} 个任务")
+        self.task_file_label.config(text=f"当前任务文件: {self.task_file_path or TASK_FILE_PATH}")
+        skipped = f"，跳过 {importer.skipped} 个无效任务" if importer.skipped else ""
+        messagebox.showinfo("成功", f"成功导入 {total_tasks} 个任务{skipped}")
+
+    def cancel_import(self):
+        """取消正在进行的导入，移除已追加的导入任务"""
+        importer = self._importer
+        if importer is None:
+            return
+        importer.cancel()
+        self._rollback_import()
+        self._end_import("导入已取消")
+
+    def _rollback_import(self):
+        """移除已追加的导入任务并整体保存(导入期间的状态合并可能已写入部分导入任务)，内容未变化时不会写盘"""
+        imported_ids = set(self._import_ids)
+        if imported_ids:
+            self.save_all_tasks([task for task in self.repository.tasks() if task.id not in imported_ids])
+
+    def _end_import(self, message):
+        self._importer = None
+        self._import_ids = []
+        self._import_renamed = {}
+        self._import_replaced_ids = set()
+        self.import_button.config(text="📥 导入任务 (Ctrl+I)")
+        self.progress_bar['value'] = 0
+        self.status_label.config(text=message)
+
     def export_tasks(self):
         """导出任务到文件，优化数据格式和用户反馈"""
         file_path = filedialog.asksaveasfilename(title="导出任务", defaultextension=".json", 
@@ -1191,21 +1239,8 @@ class AudioPlayer:
             return
         
         try:
-            tasks = []
-            for item in self.tree.get_children():
-                values = self.tree.item(item)["values"]
-                task_data = {
-                    "id": str(values[0]).replace("▶ ", "").strip(),  # 移除播放符号
-                    "name": values[1],
-                    "startTime": values[2],
-                    "endTime": values[3],
-                    "volume": values[4],
-                    "schedule": values[5],
-                    "audioPath": values[6],
-                    "status": values[7] if len(values) > 7 else "waiting"
-                }
-                tasks.append(task_data)
-            
+            tasks = self.repository.to_dicts()
+
             if not tasks:
                 messagebox.showinfo("提示", "没有任务可导出")
                 self.status_label.config(text="无可导出任务")
@@ -1223,73 +1258,30 @@ class AudioPlayer:
             self.status_label.config(text="导出失败")
             messagebox.showerror("错误", f"导出失败: {str(e)}")
 
-    def save_all_tasks(self):
-        """保存所有任务并确保两个位置都得到更新"""
+    def save_all_tasks(self, tasks=None):
+        """整体替换任务仓库并保存全部任务，由持久化订阅者同时保存到导入文件和默认文件
+
+        tasks 为 None 时按当前顺序保存仓库中的任务。任务ID保持不变。
+        """
         try:
-            tasks = []
-            
-            # 收集所有任务数据
-            for item in self.tree.get_children():
-                values = list(self.tree.item(item)["values"])
-                original_index = str(values[0]).replace("▶ ", "").strip()
-                task_data = {
-                    "id": original_index,
-                    "name": values[1],
-                    "startTime": values[2],
-                    "endTime": values[3],
-                    "volume": values[4],
-                    "schedule": values[5],
-                    "audioPath": values[6],
-                    "status": values[7] if len(values) > 7 else "waiting"
-                }
-                tasks.append(task_data)
-            
-            # 按开始时间排序
-            tasks.sort(key=lambda x: x["startTime"])
-            
-            # 重新分配ID
-            for i, task in enumerate(tasks, 1):
-                task["id"] = str(i)
-            
-            # 保存到两个位置
-            success = save_all_tasks(tasks, self.task_file_path)
-            
-            if success:
-                self._refresh_tree_with_tasks(tasks)
+            self.repository.reset(self.repository.tasks() if tasks is None else tasks)
+            if self.task_service.saved:
                 return True
             else:
                 self.status_label.config(text="保存任务失败")
                 return False
-                
+
         except Exception as e:
             logging.error(f"保存任务失败: {e}")
             self.status_label.config(text=f"保存任务出错: {str(e)}")
             return False
 
     def _refresh_tree_with_tasks(self, tasks):
-        """刷新树形表格显示"""
+        """用任务字典列表刷新任务仓库和表格显示(不保存)，只更新有变化的行"""
         try:
-            self.tree.configure(displaycolumns=())
-            self.tree.delete(*self.tree.get_children())
-            self.task_id_map.clear()
-            
-            for task in tasks:
-                values = [
-                    task["id"],
-                    task["name"],
-                    task["startTime"],
-                    task["endTime"],
-                    task["volume"],
-                    task["schedule"],
-                    task["audioPath"],
-                    task.get("status", "waiting")
-                ]
-                item = self.tree.insert("", "end", values=values)
-                self.task_id_map[item] = task["id"]
-            
-            self.tree.configure(displaycolumns=self.columns)
+            self.repository.reset([Task.from_dict(task) for task in tasks], persist=False)
             self.status_label.config(text=f"已更新 {len(tasks)} 个任务")
-            
+
         except Exception as e:
             logging.error(f"刷新显示失败: {e}")
             raise
@@ -1298,7 +1290,6 @@ class AudioPlayer:
         """选择任务时更新状态栏，优化性能，并动态调整暂停/恢复按钮"""
         try:
             selected = self.tree.selection()
-            all_items = self.tree.get_children()
             if not selected:
                 self.status_label.config(text="就绪")
                 self.play_buttons_ref["播放/暂停"].config(state="normal")
@@ -1308,15 +1299,19 @@ class AudioPlayer:
             # 检查选定任务的状态以更新按钮文本
             all_paused = True
             all_resumed = True
+            tagged = set()
             for item in selected:
-                values = self.tree.item(item)["values"]
+                task = self._task_of(item)
+                if not task:
+                    continue
                 tags = list(self.tree.item(item)["tags"])
                 if "selected" not in tags:
                     tags.append("selected")
-                self.tree.item(item, tags=tags)
-                self.status_label.config(text=f"已选择任务：{values[1]}")
-                
-                if values[-1] == "Pause today":
+                    self.tree.item(item, tags=tags)
+                tagged.add(item)
+                self.status_label.config(text=f"已选择任务：{task.name}")
+
+                if task.is_paused_today:
                     all_resumed = False
                 else:
                     all_paused = False
@@ -1328,50 +1323,51 @@ class AudioPlayer:
                 self.play_buttons_ref["暂停今天"].config(text="⏸ 暂停今天 (Ctrl+Q)")
             
             # 检查是否全选
-            if len(selected) == len(all_items):
+            if len(selected) == len(self.tree):
                 self.play_buttons_ref["播放/暂停"].config(state="disabled")
             else:
                 self.play_buttons_ref["播放/暂停"].config(state="normal")
             
-            # 移除未选中任务的 selected 标签
-            for item in all_items:
-                if item not in selected:
-                    tags = list(self.tree.item(item)["tags"])
-                    if "selected" in tags:
-                        tags.remove("selected")
-                        self.tree.item(item, tags=tags)
+            # 移除不再选中的行的 selected 标签，只检查上次标记过的行，不遍历全部行
+            for item in self._tagged_items - tagged:
+                if not self.tree.exists(item):
+                    continue
+                tags = list(self.tree.item(item)["tags"])
+                if "selected" in tags:
+                    tags.remove("selected")
+                    self.tree.item(item, tags=tags)
+            self._tagged_items = tagged
                         
         except Exception as e:
             logging.error(f"选择任务失败: {e}")
             self.status_label.config(text="选择出错")
 
     def sort_by_column(self, column):
-        """按列排序任务，优化序号更新和状态保持"""
+        """按列排序任务，排序结果即为任务的显示顺序并保存"""
         try:
-            items = [(self.tree.set(item, column), item) for item in self.tree.get_children()]
+            field = self.COLUMN_FIELDS[column]
+            if field:
+                # 与表格中显示的文本比较
+                key = lambda task: str(getattr(task, field))
+            else:
+                key = lambda task: self.repository.index(task.id)
+            tasks = self.repository.tasks()
             reverse = getattr(self, '_sort_reverse', False)
             if hasattr(self, '_sort_column') and self._sort_column == column:
-                items.sort(reverse=not reverse)
+                tasks.sort(key=key, reverse=not reverse)
                 self._sort_reverse = not reverse
             else:
-                items.sort()
+                tasks.sort(key=key)
                 self._sort_reverse = False
             self._sort_column = column
-            
-            # 更新 Treeview
-            for index, (_, item) in enumerate(items):
-                self.tree.move(item, '', index)
-                if column != "序号":
-                    is_playing = item == self.current_playing_item and self.current_playing_sound
-                    self.tree.set(item, "序号", f"▶ {index + 1}" if is_playing else str(index + 1))
-            
+
             # 更新标题显示排序方向
             for col in self.columns:
                 self.tree.heading(col, text=f"{col} {'↓' if self._sort_reverse else '↑'}" if col == column else col)
-            
-            self.save_all_tasks()
-            self.status_label.config(text=f"已按 {column} 排序")
-            
+
+            self.repository.reorder(task.id for task in tasks)
+            self.status_label.config(text=f"已按 {column} 排序" if self.task_service.saved else "保存任务失败")
+
         except Exception as e:
             logging.error(f"排序失败: {e}")
             self.status_label.config(text="排序出错")
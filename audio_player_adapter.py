@@ -1,14 +1,15 @@
-import pygame
 import threading
 import time
 import logging
 from typing import Optional, Callable
+from audio_backend import AudioBackend, create_backend
+from constants import MIX_CHANNEL_POOL
 
 class AudioPlayer:
     """音频播放适配器,统一管理音频播放状态"""
-    def __init__(self):
-        pygame.init()
-        pygame.mixer.init()
+    def __init__(self, backend: Optional[AudioBackend] = None):
+        self.backend = backend or create_backend()
+        self.backend.init(MIX_CHANNEL_POOL)
         
         self._current_file: Optional[str] = None
         self._is_playing = False
@@ -21,9 +22,9 @@ class AudioPlayer:
     def play(self, file_path: str, volume: int = 100) -> bool:
         try:
             self.stop() # 播放前先停止
-            pygame.mixer.music.load(file_path)
-            pygame.mixer.music.set_volume(volume / 100)
-            pygame.mixer.music.play()
+            self.backend.load(file_path)
+            self.backend.set_volume(volume / 100)
+            self.backend.play()
             
             self._current_file = file_path
             self._is_playing = True
@@ -37,31 +38,30 @@ class AudioPlayer:
             
     def pause(self):
         if self._is_playing and not self._is_paused:
-            pygame.mixer.music.pause()
+            self.backend.pause()
             self._is_paused = True
             
     def resume(self):
         if self._is_playing and self._is_paused:
-            pygame.mixer.music.unpause()
+            self.backend.resume()
             self._is_paused = False
             
     def stop(self):
         if self._is_playing:
-            pygame.mixer.music.stop()
+            self.backend.stop()
             self._is_playing = False
             self._is_paused = False
             self._current_file = None
-            pygame.mixer.music.unload()
             
     def set_volume(self, volume: int):
         self._volume = volume
         if self._is_playing:
-            pygame.mixer.music.set_volume(volume / 100)
+            self.backend.set_volume(volume / 100)
             
     def get_position(self) -> float:
         """获取当前播放位置(秒)"""
         if self._is_playing:
-            return pygame.mixer.music.get_pos() / 1000
+            return self.backend.position()
         return 0
         
     def is_playing(self) -> bool:
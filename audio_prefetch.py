@@ -0,0 +1,163 @@
+import logging
+import os
+import threading
+from collections import OrderedDict
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+from constants import PREFETCH_MEMORY_BUDGET
+from audio_probe import get_duration
+
+
+class AudioPrefetcher:
+    """音频预加载：后台线程把即将到期任务的音频文件读入内存，按内存预算做 LRU 淘汰
+
+    播放时优先从内存加载，避免在触发时刻才从慢速磁盘或网络共享读取文件。
+    """
+
+    def __init__(self, memory_budget: int = PREFETCH_MEMORY_BUDGET):
+        self.memory_budget = memory_budget
+        self.hits = 0
+        self.misses = 0
+        self._cache: "OrderedDict[str, Tuple[int, int, bytes]]" = OrderedDict()  # 路径 -> (大小, 修改时间, 内容)
+        self._cache_bytes = 0
+        self._wanted: List[str] = []  # 按到期时间排序的待预加载文件
+        # 过大或无法读取而放弃的文件 -> 放弃时的 (大小, 修改时间)，文件不存在时为 None；文件未变化时不再重新加载
+        self._skipped: Dict[str, Optional[Tuple[int, int]]] = {}
+        self._deferred: Set[str] = set()  # 内存预算不足而推迟的文件，待预加载列表变化后再尝试
+        self._recheck = False  # 待预加载列表变化后，后台线程检查放弃的文件是否已被修改
+        self._condition = threading.Condition()
+        self._thread: Optional[threading.Thread] = None
+        self._stopped = False
+
+    @property
+    def cached_bytes(self) -> int:
+        return self._cache_bytes
+
+    def request(self, paths: Iterable[str]):
+        """设置需要预加载的文件(按到期时间排序)，由后台线程异步读取"""
+        wanted = list(dict.fromkeys(os.path.abspath(p) for p in paths if p))
+        with self._condition:
+            if wanted == self._wanted:
+                return
+            self._wanted = wanted
+            self._deferred.clear()
+            self._recheck = bool(self._skipped)
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="audio-prefetch", daemon=True)
+                self._thread.start()
+            self._condition.notify()
+
+    def get(self, path: str) -> Optional[bytes]:
+        """返回已预加载的文件内容，文件在预加载后被修改时视为未命中"""
+        key = os.path.abspath(path)
+        with self._condition:
+            entry = self._cache.get(key)
+        if entry:
+            try:
+                stat = os.stat(key)
+                if (stat.st_size, stat.st_mtime_ns) == entry[:2]:
+                    with self._condition:
+                        if key in self._cache:
+                            self._cache.move_to_end(key)
+                    self.hits += 1
+                    return entry[2]
+            except OSError:
+                pass
+            self._evict(key)
+        self.misses += 1
+        return None
+
+    def clear(self):
+        with self._condition:
+            self._cache.clear()
+            self._cache_bytes = 0
+
+    def stop(self):
+        with self._condition:
+            self._stopped = True
+            self._condition.notify()
+
+    def _run(self):
+        while True:
+            with self._condition:
+                while not (self._stopped or self._recheck) and self._next_missing() is None:
+                    self._condition.wait()
+                if self._stopped:
+                    return
+                recheck, self._recheck = self._recheck, False
+            if recheck:
+                self._recheck_skipped()
+            with self._condition:
+                path = self._next_missing()
+            if path is not None:
+                self._load(path)
+
+    def _next_missing(self) -> Optional[str]:
+        for path in self._wanted:
+            if path not in self._cache and path not in self._skipped and path not in self._deferred:
+                return path
+        return None
+
+    def _load(self, path: str):
+        stat = None
+        try:
+            stat = os.stat(path)
+            if stat.st_size > self.memory_budget:
+                logging.debug(f"音频文件超过预加载内存预算，不预加载 {path} ({stat.st_size} 字节)")
+                self._skip(path, stat)
+                return
+            if not self._make_room(path, stat.st_size):
+                with self._condition:
+                    self._deferred.add(path)
+                return
+            with open(path, "rb") as f:
+                data = f.read()
+            # 顺便缓存时长，触发时无需再读取文件头
+            get_duration(path)
+        except OSError as e:
+            logging.warning(f"预加载音频失败 {path}: {e}")
+            self._skip(path, stat)
+            return
+
+        with self._condition:
+            if path in self._wanted:
+                self._cache[path] = (stat.st_size, stat.st_mtime_ns, data)
+                self._cache_bytes += len(data)
+        logging.debug(f"已预加载音频 {path} ({len(data)} 字节)")
+
+    def _make_room(self, path: str, size: int) -> bool:
+        """先按 LRU 淘汰不再需要的文件，再淘汰比该文件更晚到期的文件；空间仍不足时放弃本次预加载"""
+        with self._condition:
+            rank = {p: i for i, p in enumerate(self._wanted)}
+            own_rank = rank.get(path, len(rank))
+            unwanted = [key for key in self._cache if key not in rank]
+            later = sorted((key for key in self._cache if rank.get(key, -1) > own_rank), key=rank.get, reverse=True)
+            for key in unwanted + later:
+                if self._cache_bytes + size <= self.memory_budget:
+                    break
+                self._cache_bytes -= len(self._cache.pop(key)[2])
+            return self._cache_bytes + size <= self.memory_budget
+
+    def _skip(self, path: str, stat: Optional[os.stat_result]):
+        """记录放弃预加载的文件，文件的大小和修改时间不变时不再重新加载"""
+        with self._condition:
+            self._skipped[path] = (stat.st_size, stat.st_mtime_ns) if stat else None
+
+    def _recheck_skipped(self):
+        """与 DurationCache 相同按大小和修改时间判断：仍需要的文件已被修改(或重新出现)时重新尝试预加载"""
+        with self._condition:
+            skipped = [(path, self._skipped[path]) for path in self._wanted if path in self._skipped]
+        for path, signature in skipped:
+            try:
+                stat = os.stat(path)
+                current = (stat.st_size, stat.st_mtime_ns)
+            except OSError:
+                current = None
+            if current != signature:
+                with self._condition:
+                    self._skipped.pop(path, None)
+
+    def _evict(self, key: str):
+        with self._condition:
+            entry = self._cache.pop(key, None)
+            if entry:
+                self._cache_bytes -= len(entry[2])
@@ -0,0 +1,280 @@
+import atexit
+import json
+import logging
+import os
+import struct
+import threading
+from typing import Dict, Optional, Tuple
+from config import PathConfig
+from constants import DURATION_CACHE_SAVE_DELAY
+from file_utils import atomic_write_bytes
+
+# 只读取文件头/帧头获取音频时长，不解码音频数据
+
+DURATION_CACHE_PATH = os.path.join(PathConfig.BASE_DIR, "duration_cache.json")
+
+# MPEG 比特率表(kbps)，按 (版本是否为 MPEG1, 层) 索引
+_MP3_BITRATES = {
+    (True, 1): (0, 32, 64, 96, 128, 160, 192, 224, 256, 288, 320, 352, 384, 416, 448),
+    (True, 2): (0, 32, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320, 384),
+    (True, 3): (0, 32, 40, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320),
+    (False, 1): (0, 32, 48, 56, 64, 80, 96, 112, 128, 144, 160, 176, 192, 224, 256),
+    (False, 2): (0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160),
+    (False, 3): (0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160),
+}
+_MP3_SAMPLE_RATES = {3: (44100, 48000, 32000), 2: (22050, 24000, 16000), 0: (11025, 12000, 8000)}
+_MP3_CBR_CHECK_FRAMES = 32  # 前若干帧比特率一致时按 CBR 估算，否则逐帧扫描
+
+
+def _parse_mp3_header(header: bytes) -> Optional[dict]:
+    if len(header) < 4 or header[0] != 0xFF or (header[1] & 0xE0) != 0xE0:
+        return None
+    version = (header[1] >> 3) & 0x03
+    layer = 4 - ((header[1] >> 1) & 0x03)
+    bitrate_index = header[2] >> 4
+    rate_index = (header[2] >> 2) & 0x03
+    if version == 1 or layer == 4 or bitrate_index in (0, 15) or rate_index == 3:
+        return None
+
+    mpeg1 = version == 3
+    bitrate = _MP3_BITRATES[(mpeg1, layer)][bitrate_index] * 1000
+    sample_rate = _MP3_SAMPLE_RATES[version][rate_index]
+    padding = (header[2] >> 1) & 0x01
+    if layer == 1:
+        frame_size = (12 * bitrate // sample_rate + padding) * 4
+        samples = 384
+    else:
+        samples = 1152 if (layer == 2 or mpeg1) else 576
+        frame_size = samples // 8 * bitrate // sample_rate + padding
+    return {
+        "mpeg1": mpeg1, "layer": layer, "bitrate": bitrate, "sample_rate": sample_rate,
+        "frame_size": frame_size, "samples": samples, "mono": (header[3] >> 6) == 3,
+    }
+
+
+def _probe_mp3(f, file_size: int) -> Optional[float]:
+    # 跳过 ID3v2 标签
+    head = f.read(10)
+    audio_start = 0
+    if head[:3] == b"ID3" and len(head) == 10:
+        tag_size = (head[6] << 21) | (head[7] << 14) | (head[8] << 7) | head[9]
+        audio_start = 10 + tag_size + (10 if head[5] & 0x10 else 0)
+
+    # 查找第一个有效帧头
+    f.seek(audio_start)
+    buffer = f.read(64 * 1024)
+    frame = None
+    for i in range(len(buffer) - 4):
+        if buffer[i] == 0xFF:
+            frame = _parse_mp3_header(buffer[i:i + 4])
+            if frame:
+                audio_start += i
+                buffer = buffer[i:]
+                break
+    if not frame:
+        return None
+
+    # Xing/Info 头(VBR 总帧数)
+    side_info = (17 if frame["mono"] else 32) if frame["mpeg1"] else (9 if frame["mono"] else 17)
+    xing = buffer[4 + side_info:4 + side_info + 12]
+    if xing[:4] in (b"Xing", b"Info") and len(xing) == 12:
+        flags = struct.unpack(">I", xing[4:8])[0]
+        if flags & 0x01:
+            frames = struct.unpack(">I", xing[8:12])[0]
+            return frames * frame["samples"] / frame["sample_rate"]
+
+    # VBRI 头(固定在帧头后 32 字节)
+    vbri = buffer[36:54]
+    if vbri[:4] == b"VBRI" and len(vbri) == 18:
+        frames = struct.unpack(">I", vbri[14:18])[0]
+        return frames * frame["samples"] / frame["sample_rate"]
+
+    audio_end = file_size
+    f.seek(max(file_size - 128, 0))
+    if f.read(3) == b"TAG":
+        audio_end -= 128
+
+    # 无 VBR 头：前若干帧比特率一致按 CBR 估算，否则逐帧读取帧头累计
+    frames, samples, position, constant = 0, 0, audio_start, True
+    while position + 4 <= audio_end:
+        f.seek(position)
+        current = _parse_mp3_header(f.read(4))
+        if not current or current["frame_size"] <= 0:
+            break
+        constant = constant and current["bitrate"] == frame["bitrate"]
+        frames += 1
+        samples += current["samples"]
+        position += current["frame_size"]
+        if frames == _MP3_CBR_CHECK_FRAMES and constant:
+            return (audio_end - audio_start) * 8 / frame["bitrate"]
+    return samples / frame["sample_rate"] if frames else None
+
+
+def _probe_wav(f, file_size: int) -> Optional[float]:
+    header = f.read(12)
+    if header[:4] != b"RIFF" or header[8:12] != b"WAVE":
+        return None
+    byte_rate = 0
+    while True:
+        chunk = f.read(8)
+        if len(chunk) < 8:
+            return None
+        chunk_id, chunk_size = chunk[:4], struct.unpack("<I", chunk[4:])[0]
+        if chunk_id == b"fmt ":
+            fmt = f.read(chunk_size)
+            byte_rate = struct.unpack("<I", fmt[8:12])[0]
+            if chunk_size % 2:
+                f.seek(1, os.SEEK_CUR)
+        elif chunk_id == b"data":
+            if not byte_rate:
+                return None
+            # 录音中断的文件 data 大小可能不准确，以实际文件大小为上限
+            data_size = min(chunk_size, file_size - f.tell())
+            return data_size / byte_rate
+        else:
+            f.seek(chunk_size + chunk_size % 2, os.SEEK_CUR)
+
+
+def _probe_ogg(f, file_size: int) -> Optional[float]:
+    first_page = f.read(4096)
+    if first_page[:4] != b"OggS":
+        return None
+    pre_skip = 0
+    vorbis = first_page.find(b"\x01vorbis")
+    opus = first_page.find(b"OpusHead")
+    if vorbis >= 0:
+        sample_rate = struct.unpack("<I", first_page[vorbis + 12:vorbis + 16])[0]
+    elif opus >= 0:
+        sample_rate = 48000  # Opus 的粒度位置固定以 48kHz 计
+        pre_skip = struct.unpack("<H", first_page[opus + 10:opus + 12])[0]
+    else:
+        return None
+
+    # 最后一页的粒度位置即总采样数
+    f.seek(max(file_size - 65536, 0))
+    tail = f.read()
+    last_page = tail.rfind(b"OggS")
+    if last_page < 0 or last_page + 14 > len(tail) or not sample_rate:
+        return None
+    granule = struct.unpack("<q", tail[last_page + 6:last_page + 14])[0]
+    return max(granule - pre_skip, 0) / sample_rate
+
+
+def _probe_flac(f, file_size: int) -> Optional[float]:
+    header = f.read(4 + 4 + 34)
+    if header[:4] != b"fLaC" or (header[4] & 0x7F) != 0:
+        return None
+    info = header[8:]
+    sample_rate = (info[10] << 12) | (info[11] << 4) | (info[12] >> 4)
+    total_samples = ((info[13] & 0x0F) << 32) | struct.unpack(">I", info[14:18])[0]
+    return total_samples / sample_rate if sample_rate and total_samples else None
+
+
+_PROBES = {".mp3": _probe_mp3, ".wav": _probe_wav, ".ogg": _probe_ogg, ".opus": _probe_ogg, ".flac": _probe_flac}
+
+
+def probe_duration(file_path: str) -> Optional[float]:
+    """读取文件头获取音频时长(秒)，无法识别时返回 None"""
+    file_size = os.path.getsize(file_path)
+    extension = os.path.splitext(file_path)[1].lower()
+    # 先按扩展名尝试，失败后按内容逐个尝试(扩展名可能与实际格式不符)
+    probes = [_PROBES[extension]] if extension in _PROBES else []
+    probes += [probe for probe in (_probe_wav, _probe_ogg, _probe_flac, _probe_mp3) if probe not in probes]
+    with open(file_path, "rb") as f:
+        for probe in probes:
+            f.seek(0)
+            try:
+                duration = probe(f, file_size)
+            except (struct.error, IndexError, ZeroDivisionError):
+                duration = None
+            if duration and duration > 0:
+                return duration
+    return None
+
+
+class DurationCache:
+    """按 路径+大小+修改时间 缓存音频时长，并持久化到磁盘
+
+    新条目只标记为脏数据，save_delay 秒后合并为一次写入，进程退出时再保存一次。
+    """
+
+    def __init__(self, cache_path: str = DURATION_CACHE_PATH, save_delay: float = DURATION_CACHE_SAVE_DELAY):
+        self.cache_path = cache_path
+        self.save_delay = save_delay
+        self._entries: Dict[str, Tuple[int, int, float]] = {}
+        self._loaded = False
+        self._dirty = False
+        self._timer: Optional[threading.Timer] = None
+        self._lock = threading.Lock()
+        self._save_lock = threading.Lock()  # 保证按顺序写入，较早的快照不会覆盖较新的
+
+    def _load(self):
+        self._loaded = True
+        if not os.path.exists(self.cache_path):
+            return
+        try:
+            with open(self.cache_path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            self._entries = {path: tuple(entry) for path, entry in data.items() if len(entry) == 3}
+        except (IOError, json.JSONDecodeError, AttributeError, TypeError) as e:
+            logging.warning(f"读取时长缓存失败: {e}")
+
+    def flush(self):
+        """立即保存尚未写入的新条目"""
+        with self._save_lock:
+            with self._lock:
+                if self._timer is not None:
+                    self._timer.cancel()
+                    self._timer = None
+                if not self._dirty:
+                    return
+                self._dirty = False
+                data = json.dumps(self._entries, ensure_ascii=False).encode("utf-8")
+            try:
+                atomic_write_bytes(self.cache_path, data)
+            except OSError as e:
+                logging.warning(f"保存时长缓存失败: {e}")
+
+    def _schedule_save(self):
+        """标记有新条目，尚未安排保存时在 save_delay 秒后保存(调用时已持有锁)"""
+        self._dirty = True
+        if self._timer is None:
+            self._timer = threading.Timer(self.save_delay, self.flush)
+            self._timer.daemon = True
+            self._timer.start()
+
+    def get_duration(self, file_path: str) -> float:
+        """返回音频时长(秒)，无法获取时返回 0"""
+        try:
+            stat = os.stat(file_path)
+        except OSError:
+            return 0
+        key = os.path.normcase(os.path.abspath(file_path))
+        with self._lock:
+            if not self._loaded:
+                self._load()
+            entry = self._entries.get(key)
+            if entry and entry[0] == stat.st_size and entry[1] == stat.st_mtime_ns:
+                return entry[2]
+
+        try:
+            duration = probe_duration(file_path) or 0
+        except OSError as e:
+            logging.warning(f"读取音频时长失败 {file_path}: {e}")
+            return 0
+        if not duration:
+            logging.warning(f"无法识别音频时长: {file_path}")
+
+        with self._lock:
+            self._entries[key] = (stat.st_size, stat.st_mtime_ns, duration)
+            self._schedule_save()
+        return duration
+
+
+_duration_cache = DurationCache()
+atexit.register(_duration_cache.flush)
+
+
+def get_duration(file_path: str) -> float:
+    """获取音频时长(秒)，结果按文件大小和修改时间缓存，无法获取时返回 0"""
+    return _duration_cache.get_duration(file_path)
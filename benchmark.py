@@ -0,0 +1,490 @@
+import argparse
+import builtins
+import datetime
+import json
+import logging
+import os
+import platform
+import random
+import statistics
+import sys
+import tempfile
+import time
+from collections import Counter
+from typing import Callable, Dict, List, Optional
+from unittest import mock
+from constants import SIMULATION_AUDIO_SECONDS, BENCHMARK_SIZES, BENCHMARK_RESULTS_PATH, BENCHMARK_REGRESSION_THRESHOLD, \
+    PERSISTENCE_BENCHMARK_SIZES, STATUS_FLUSH_THRESHOLD
+import config_manager
+from file_utils import serialize_tasks, atomic_write_bytes
+from simulation import Simulation, generate_tasks
+from task_engine import TaskEngine
+from task_import import TaskImporter
+from task_model import Task, new_task_id
+from task_service import create_task_service
+from utils import load_tasks, save_all_tasks_to_file, update_task_in_json
+
+
+def summarize(samples: List[float]) -> dict:
+    """耗时样本(秒)的统计"""
+    if not samples:
+        return {"runs": 0}
+    ordered = sorted(samples)
+    return {
+        "runs": len(samples),
+        "min": ordered[0],
+        "median": statistics.median(ordered),
+        "mean": statistics.fmean(ordered),
+        "p95": ordered[min(int(len(ordered) * 0.95), len(ordered) - 1)],
+        "max": ordered[-1],
+    }
+
+
+def measure(func: Callable[[], object], repeat: int, setup: Optional[Callable[[], None]] = None) -> dict:
+    """重复执行 func 并统计耗时，setup 在每次计时之前执行且不计入耗时"""
+    samples = []
+    for _ in range(repeat):
+        if setup:
+            setup()
+        started = time.perf_counter()
+        func()
+        samples.append(time.perf_counter() - started)
+    return summarize(samples)
+
+
+def write_task_file(path: str, tasks: List[Task]) -> List[dict]:
+    """把合成任务写成任务文件，返回写入的任务字典"""
+    data = [task.to_dict() for task in tasks]
+    atomic_write_bytes(path, serialize_tasks(data))
+    return data
+
+
+def stream_import(path: str) -> List[dict]:
+    """与界面导入相同：后台线程流式解析和验证任务文件，按块取出"""
+    importer = TaskImporter(path).start()
+    tasks = [task.to_dict() for chunk in importer.chunks() for task in chunk]
+    if importer.error:
+        raise importer.error
+    return tasks
+
+
+def bench_tick(tasks: List[Task], durations: Dict[str, float], start: datetime.datetime,
+               seconds: float, repeat: int) -> Dict[str, dict]:
+    """在虚拟时间中运行调度，分别统计有任务到期和无任务到期时一次 tick 的真实耗时
+
+    与界面的 check_tasks 相同，每次 tick 之后计算下一次定时的延迟。
+    """
+    simulation = Simulation(tasks, start, lambda path: durations.get(path, SIMULATION_AUDIO_SECONDS))
+    clock, player, engine = simulation.clock, simulation.player, simulation.engine
+    due = []
+    until = clock.time() + seconds
+    while True:
+        candidates = [ts for ts in (engine.scheduler.next_fire_time(), player.next_event_time()) if ts is not None]
+        target = min(candidates + [until])
+        clock.advance_to(target)
+        player.update()
+        player.poll_events()
+        started = time.perf_counter()
+        fired = engine.tick()
+        engine.next_delay()
+        if fired:
+            due.append(time.perf_counter() - started)
+        if target >= until:
+            break
+
+    # 无任务到期的 tick 在仿真中很少出现，在仿真结束的虚拟时间重复测量
+    def idle_tick():
+        engine.tick()
+        engine.next_delay()
+    return {
+        "check_tasks_due": dict(summarize(due), fires=len(simulation.fire_log)),
+        "check_tasks_idle": measure(idle_tick, max(repeat, 100)),
+    }
+
+
+def bench_headless(tasks: List[Task], directory: str, repeat: int) -> Dict[str, dict]:
+    """任务文件的读写、排序和导入，以及调度器同步，不创建界面"""
+    path = os.path.join(directory, "tasks.json")
+    imported_path = os.path.join(directory, "imported.json")
+    data = write_task_file(path, tasks)
+    results = {}
+
+    results["load_tasks"] = measure(lambda: load_tasks(path), repeat)
+    results["sync_scheduler"] = measure(lambda: TaskEngine().sync_tasks(Task.from_dict(task) for task in data), repeat)
+    engine = TaskEngine()
+    engine.sync_tasks(tasks)
+    results["sync_scheduler_unchanged"] = measure(lambda: engine.sync_tasks(tasks), repeat)
+
+    # 每次只修改一个任务的状态，与界面中单个状态变化后整体保存相同
+    def change_status():
+        data[0]["status"] = "已播放" if data[0].get("status") != "已播放" else "等待播放"
+    results["save_all_tasks"] = measure(lambda: save_all_tasks_to_file(data, path), repeat, change_status)
+    results["save_all_tasks_unchanged"] = measure(lambda: save_all_tasks_to_file(data, path), repeat)
+
+    # 与界面导入任务相同：按开始时间排序，任务ID不变
+    results["sort_tasks"] = measure(lambda: sorted(data, key=lambda task: task["startTime"]), repeat)
+
+    def import_tasks():
+        valid_tasks = stream_import(path)
+        save_all_tasks_to_file(valid_tasks, imported_path, serialize_tasks(valid_tasks))
+    results["import_tasks"] = measure(import_tasks, repeat, lambda: os.path.exists(imported_path) and os.remove(imported_path))
+    return results
+
+
+def bench_ui(directory: str, repeat: int) -> Dict[str, dict]:
+    """在真实的 Tk 界面中测量界面方法(需要图形环境，使用空音频后端，不弹出对话框)
+
+    默认任务文件和配置文件替换为临时目录中的文件，不会修改用户的任务。
+    """
+    import tkinter as tk
+    from audio_backend import NullBackend
+    from player_core import PlayerCore
+
+    path = os.path.join(directory, "tasks.json")
+    default_path = os.path.join(directory, "default_task.json")
+    with mock.patch("utils.TASK_FILE_PATH", default_path), mock.patch("audio_player.TASK_FILE_PATH", default_path), \
+            mock.patch("config_manager.save_task_file_path"), \
+            mock.patch("audio_player.filedialog.askopenfilename", return_value=path), \
+            mock.patch("audio_player.messagebox.askyesnocancel", return_value=True), \
+            mock.patch("audio_player.messagebox.showinfo"), mock.patch("audio_player.messagebox.showerror"):
+        from audio_player import AudioPlayer
+        try:
+            started = time.perf_counter()
+            app = AudioPlayer(path, player=PlayerCore(NullBackend()))
+            startup = time.perf_counter() - started
+        except tk.TclError as e:
+            logging.warning(f"无法创建界面，跳过界面测量: {e}")
+            return {}
+        try:
+            app.root.withdraw()
+            with open(path, "r", encoding="utf-8") as f:
+                tasks = json.load(f)
+            results = {"startup": summarize([startup])}
+            results["ui_load_tasks"] = measure(app.load_tasks, repeat)
+            results["ui_save_all_tasks"] = measure(app.save_all_tasks, repeat)
+            results["ui_refresh_tree_with_tasks"] = measure(lambda: app._refresh_tree_with_tasks(tasks), repeat)
+            results["ui_sort_by_column"] = measure(lambda: app.sort_by_column("开始时间"), repeat)
+
+            def ui_import_tasks():
+                # 导入在后台线程和定时回调中进行，处理界面事件直到导入结束
+                app.import_tasks()
+                while app._importer is not None:
+                    app.root.update()
+            results["ui_import_tasks"] = measure(ui_import_tasks, repeat)
+            results["ui_check_tasks"] = measure(app.check_tasks, max(repeat, 100))
+            return results
+        finally:
+            app.player.shutdown()
+            app.root.destroy()
+
+
+class _CountingFile:
+    """包装文件对象，统计写入的字节数"""
+
+    def __init__(self, file, counter: "IOCounter"):
+        self._file = file
+        self._counter = counter
+
+    def write(self, data):
+        if isinstance(data, str):
+            data_size = len(data.encode(getattr(self._file, "encoding", None) or "utf-8"))
+        else:
+            data_size = len(data)
+        self._counter.writes += 1
+        self._counter.bytes_written += data_size
+        return self._file.write(data)
+
+    def __getattr__(self, name):
+        return getattr(self._file, name)
+
+    def __iter__(self):
+        return iter(self._file)
+
+    def __enter__(self):
+        self._file.__enter__()
+        return self
+
+    def __exit__(self, *exc_info):
+        return self._file.__exit__(*exc_info)
+
+
+class IOCounter:
+    """在 with 块内统计本进程打开文件、写入字节和 fsync 的次数
+
+    通过替换 open / os.open / os.fdopen / os.fsync 实现，只统计经过 Python 文件接口的读写，
+    SQLite 等扩展模块内部的写入不在统计范围内。
+    """
+
+    def __init__(self):
+        self.opens = 0
+        self.writes = 0
+        self.bytes_written = 0
+        self.fsyncs = 0
+        self._patches = []
+
+    def __enter__(self):
+        real_open, real_os_open, real_fdopen, real_fsync = builtins.open, os.open, os.fdopen, os.fsync
+
+        def counting_open(*args, **kwargs):
+            self.opens += 1
+            return _CountingFile(real_open(*args, **kwargs), self)
+
+        def counting_os_open(*args, **kwargs):
+            self.opens += 1
+            return real_os_open(*args, **kwargs)
+
+        def counting_fdopen(*args, **kwargs):
+            # 文件描述符已在 os.open 中计数
+            return _CountingFile(real_fdopen(*args, **kwargs), self)
+
+        def counting_fsync(fd):
+            self.fsyncs += 1
+            return real_fsync(fd)
+
+        self._patches = [mock.patch("builtins.open", counting_open), mock.patch("os.open", counting_os_open),
+                         mock.patch("os.fdopen", counting_fdopen), mock.patch("os.fsync", counting_fsync)]
+        for patch in self._patches:
+            patch.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        for patch in reversed(self._patches):
+            patch.stop()
+        return False
+
+
+def _record_sizes(tasks: List[dict]) -> Counter:
+    return Counter(json.dumps(task, ensure_ascii=False, sort_keys=True) for task in tasks)
+
+
+def changed_bytes(before: Counter, after: Counter) -> int:
+    """用户操作在逻辑上改变的数据量：新增或修改后的任务记录字节数，与删除的任务记录字节数取较大者"""
+    added = sum(len(record.encode("utf-8")) * count for record, count in (after - before).items())
+    removed = sum(len(record.encode("utf-8")) * count for record, count in (before - after).items())
+    return max(added, removed)
+
+
+def bench_persistence(tasks: List[Task], directory: str, repeat: int, seed: int = 0) -> Dict[str, dict]:
+    """按界面中用户操作实际调用的保存函数，统计每次操作的写入字节、fsync、打开文件次数和耗时
+
+    写放大 = 实际写入字节 / 操作在逻辑上改变的任务记录字节。默认任务文件和配置文件替换为临时目录中的文件。
+    """
+    rng = random.Random(seed)
+    default_path = os.path.join(directory, "task.json")
+    imported_path = os.path.join(directory, "imported.json")
+    import_source = os.path.join(directory, "import_source.json")
+    config_path = os.path.join(directory, "config.json")
+    state = {"tasks": write_task_file(imported_path, tasks)}
+    atomic_write_bytes(default_path, serialize_tasks(state["tasks"]))
+    atomic_write_bytes(import_source, serialize_tasks(state["tasks"]))
+    # 与界面相同的任务服务：整体保存写入导入文件和默认文件，状态变化写入状态日志
+    with mock.patch("config_manager.CONFIG_FILE", config_path):
+        service = create_task_service(imported_path, mirror_path=default_path)
+    results = {}
+
+    def save_like_ui(new_tasks: List[dict]):
+        # 与界面的 JSON 持久化相同：按显示顺序整体替换任务仓库，任务ID不变
+        service.replace_tasks([Task.from_dict(task) for task in new_tasks])
+        state["tasks"] = new_tasks
+
+    def change_status(task: dict, status: str):
+        # 界面只追加状态日志，内存中的任务数据同步修改，用于计算逻辑变化量
+        service.update_status(task["id"], status)
+        task["status"] = status
+
+    def edit():
+        task = rng.choice(state["tasks"])
+        task["name"] = f"{task['name']}*"
+        save_like_ui(state["tasks"])
+
+    def copy():
+        index = rng.randrange(len(state["tasks"]))
+        task = dict(state["tasks"][index], id=new_task_id(), name="副本", status="waiting")
+        save_like_ui(state["tasks"][:index + 1] + [task] + state["tasks"][index + 1:])
+
+    def delete():
+        new_tasks = list(state["tasks"])
+        new_tasks.pop(rng.randrange(len(new_tasks)))
+        save_like_ui(new_tasks)
+
+    def sort():
+        # sort_by_column 按列排序后保存新的显示顺序
+        save_like_ui(sorted(state["tasks"], key=lambda task: task["name"]))
+
+    def prepare_rollover():
+        # 准备的状态不经过任务仓库的通知，不计入写入
+        for task in rng.sample(state["tasks"], max(len(state["tasks"]) // 100, 1)):
+            task["status"] = "Pause today"
+            service.get_task(task["id"]).status = "Pause today"
+
+    def day_rollover():
+        # 调度引擎在仓库批量修改中恢复状态，合并为一次通知，状态日志只追加写入并同步一次
+        paused = [task for task in state["tasks"] if task["status"] == "Pause today"]
+        with service.repository.batch():
+            for task in paused:
+                service.update_status(task["id"], "等待播放")
+                task["status"] = "等待播放"
+
+    def import_tasks():
+        valid_tasks = stream_import(import_source)
+        save_like_ui(sorted(valid_tasks, key=lambda task: task["startTime"]))
+        config_manager.save_task_file_path(import_source)
+
+    def update_one():
+        task = dict(rng.choice(state["tasks"]), volume=rng.randint(0, 100))
+        update_task_in_json(task)
+        state["tasks"] = [task if other["id"] == task["id"] else other for other in state["tasks"]]
+
+    # 合并阈值按不同的任务ID计数，每次状态变化选择不同的任务
+    status_order = rng.sample(range(len(state["tasks"])), len(state["tasks"]))
+    status_count = [0]
+
+    def status_change():
+        index = status_order[status_count[0] % len(status_order)]
+        status_count[0] += 1
+        change_status(state["tasks"][index], rng.choice(["正在播放", "已播放", "等待播放"]))
+
+    # (名称, 操作, 每次操作前的准备, 次数, 全部操作后的收尾)，收尾的写入计入摊销
+    operations = [
+        # 状态变化批量合并，重复到至少触发一次合并，最后合并剩余的变化，结果为摊销到每次变化的平均值
+        ("status_change", status_change, None, max(repeat, STATUS_FLUSH_THRESHOLD), service.flush_status),
+        ("edit", edit, None, repeat, None),
+        ("copy", copy, None, repeat, None),
+        ("delete", delete, None, repeat, None),
+        ("sort", sort, None, repeat, None),
+        # 跨天恢复同样只追加日志，收尾时合并回任务文件的整文件写入也计入
+        ("day_rollover", day_rollover, prepare_rollover, repeat, service.flush_status),
+        ("import", import_tasks, None, repeat, None),
+        ("update_task_in_json", update_one, None, repeat, None),
+    ]
+    with mock.patch("utils.TASK_FILE_PATH", default_path), mock.patch("config_manager.CONFIG_FILE", config_path):
+        for name, operation, setup, runs, finish in operations:
+            samples, totals = [], Counter()
+            for _ in range(runs):
+                if setup:
+                    setup()
+                before = _record_sizes(state["tasks"])
+                with IOCounter() as counter:
+                    started = time.perf_counter()
+                    operation()
+                    samples.append(time.perf_counter() - started)
+                totals.update(opens=counter.opens, writes=counter.writes, bytes_written=counter.bytes_written,
+                              fsyncs=counter.fsyncs, logical_bytes=changed_bytes(before, _record_sizes(state["tasks"])))
+            if finish:
+                with IOCounter() as counter:
+                    started = time.perf_counter()
+                    finish()
+                    samples[-1] += time.perf_counter() - started
+                totals.update(opens=counter.opens, writes=counter.writes, bytes_written=counter.bytes_written,
+                              fsyncs=counter.fsyncs)
+            stats = summarize(samples)
+            stats.update({key: totals[key] / runs for key in ("opens", "writes", "bytes_written", "fsyncs", "logical_bytes")})
+            stats["write_amplification"] = totals["bytes_written"] / totals["logical_bytes"] if totals["logical_bytes"] else None
+            results[name] = stats
+    return results
+
+
+def run_persistence(sizes: List[int], repeat: int, seed: int) -> dict:
+    start = datetime.datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
+    results = {}
+    for size in sizes:
+        tasks, _ = generate_tasks(size, seed, start)
+        print(f"测量 {size} 个任务的持久化...", file=sys.stderr)
+        with tempfile.TemporaryDirectory() as directory:
+            results[str(size)] = bench_persistence(tasks, directory, repeat, seed)
+    return {"meta": _meta(mode="persistence", repeat=repeat, seed=seed), "results": results}
+
+
+def _meta(**extra) -> dict:
+    return {
+        "created": datetime.datetime.now().isoformat(timespec="seconds"),
+        "python": sys.version.split()[0],
+        "platform": platform.platform(),
+        **extra,
+    }
+
+
+def run_benchmarks(sizes: List[int], repeat: int, simulate_seconds: float, seed: int, ui: bool) -> dict:
+    start = datetime.datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
+    results = {}
+    for size in sizes:
+        tasks, durations = generate_tasks(size, seed, start, days=max(int(simulate_seconds // 86400) + 1, 1))
+        print(f"测量 {size} 个任务...", file=sys.stderr)
+        with tempfile.TemporaryDirectory() as directory:
+            size_results = bench_tick(tasks, durations, start, simulate_seconds, repeat)
+            size_results.update(bench_headless(tasks, directory, repeat))
+            if ui:
+                size_results.update(bench_ui(directory, repeat))
+        results[str(size)] = size_results
+    return {"meta": _meta(mode="timing", repeat=repeat, simulated_seconds=simulate_seconds, seed=seed), "results": results}
+
+
+def compare(results: dict, baseline: dict, threshold: float) -> List[str]:
+    """与基准结果比较耗时中位数(持久化模式另比较写入字节数)，返回超过阈值比例的项目"""
+    regressions = []
+    for size, operations in results["results"].items():
+        for name, stats in operations.items():
+            old_stats = baseline.get("results", {}).get(size, {}).get(name, {})
+            old, new = old_stats.get("median"), stats.get("median")
+            if old and new is not None and new > old * (1 + threshold):
+                regressions.append(f"{size} 个任务 {name}: 中位数 {old * 1000:.3f}ms -> {new * 1000:.3f}ms "
+                                   f"(+{(new / old - 1) * 100:.0f}%)")
+            old, new = old_stats.get("bytes_written"), stats.get("bytes_written")
+            if old and new is not None and new > old * (1 + threshold):
+                regressions.append(f"{size} 个任务 {name}: 写入 {old:.0f} -> {new:.0f} 字节 (+{(new / old - 1) * 100:.0f}%)")
+    return regressions
+
+
+def format_results(results: dict) -> str:
+    lines = []
+    for size, operations in results["results"].items():
+        for name, stats in operations.items():
+            if "write_amplification" in stats:
+                amplification = "-" if stats["write_amplification"] is None else f"{stats['write_amplification']:.1f}x"
+                lines.append(f"{size:>7} {name:<20} 写入 {stats['bytes_written']:12.0f} 字节  逻辑变化 {stats['logical_bytes']:10.0f} 字节  "
+                             f"写放大 {amplification:>8}  "
+                             f"fsync {stats['fsyncs']:5.1f}  打开 {stats['opens']:5.1f}  "
+                             f"中位数 {stats['median'] * 1000:10.3f}ms  ({stats['runs']} 次)")
+            elif stats.get("runs"):
+                lines.append(f"{size:>7} {name:<28} 中位数 {stats['median'] * 1000:10.3f}ms  "
+                             f"p95 {stats['p95'] * 1000:10.3f}ms  最大 {stats['max'] * 1000:10.3f}ms  ({stats['runs']} 次)")
+    return "\n".join(lines)
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="调度和任务文件性能测量：按不同任务数量测量各热点操作的耗时，结果写入 JSON 文件")
+    parser.add_argument("--sizes", type=int, nargs="+", help="合成任务的数量，默认按模式选择")
+    parser.add_argument("--persistence", action="store_true", help="持久化模式：统计每种用户操作的写入字节、fsync、打开文件次数和写放大")
+    parser.add_argument("--repeat", type=int, default=5, help="每项操作的重复次数")
+    parser.add_argument("--simulate-hours", type=float, default=24, help="测量 tick 耗时时在虚拟时间中运行的小时数")
+    parser.add_argument("--seed", type=int, default=0, help="合成任务的随机种子")
+    parser.add_argument("--ui", action="store_true", help="同时测量界面方法(需要图形环境)")
+    parser.add_argument("--output", default=BENCHMARK_RESULTS_PATH, help="结果文件")
+    parser.add_argument("--baseline", help="基准结果文件，中位数变慢超过阈值时以非零状态退出")
+    parser.add_argument("--threshold", type=float, default=BENCHMARK_REGRESSION_THRESHOLD, help="判定变慢的比例")
+    return parser.parse_args()
+
+
+def main() -> int:
+    args = parse_args()
+    if args.persistence:
+        results = run_persistence(args.sizes or list(PERSISTENCE_BENCHMARK_SIZES), args.repeat, args.seed)
+    else:
+        results = run_benchmarks(args.sizes or list(BENCHMARK_SIZES), args.repeat, args.simulate_hours * 3600,
+                                 args.seed, args.ui)
+    atomic_write_bytes(args.output, json.dumps(results, ensure_ascii=False, indent=2).encode("utf-8"))
+    print(format_results(results))
+    print(f"结果已写入 {args.output}")
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            regressions = compare(results, json.load(f), args.threshold)
+        for line in regressions:
+            print(f"变慢: {line}")
+        if regressions:
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.WARNING, format='%(asctime)s - %(levelname)s - %(message)s')
+    sys.exit(main())
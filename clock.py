@@ -0,0 +1,98 @@
+import datetime
+import logging
+import time
+from collections import deque
+from typing import Deque, Optional, Tuple
+from constants import CLOCK_JUMP_THRESHOLD
+
+
+class Clock:
+    """时钟基类：调度器、引擎和界面都通过时钟读取时间，仿真时可替换为虚拟时钟"""
+
+    def __init__(self, log_size: int = 100):
+        self.jumps: Deque[Tuple[float, float]] = deque(maxlen=log_size)  # (跳变后的时间戳, 跳变秒数)
+
+    def time(self) -> float:
+        """当前时间戳"""
+        raise NotImplementedError
+
+    def monotonic(self) -> float:
+        """单调递增的秒数，用于计算时长和等待时间"""
+        raise NotImplementedError
+
+    def check(self) -> float:
+        """检查时间是否跳变，跳变时返回跳变秒数(向前为正)，否则返回 0"""
+        return 0
+
+    def now(self) -> datetime.datetime:
+        return datetime.datetime.fromtimestamp(self.time())
+
+
+class SystemClock(Clock):
+    """系统时钟：用单调时钟推算墙上时间，不受 NTP 或手动校时的影响
+
+    以 (墙上时间, 单调时钟) 为锚点，当前时间 = 锚定的墙上时间 + 锚定后经过的单调时间。
+    每次读取时与系统时间比对，相差超过阈值视为时间跳变：记录跳变大小并以新的系统时间重新锚定。
+    """
+
+    def __init__(self, jump_threshold: float = CLOCK_JUMP_THRESHOLD, log_size: int = 100):
+        super().__init__(log_size)
+        self.jump_threshold = jump_threshold
+        self._wall = time.time()
+        self._mono = time.monotonic()
+
+    def check(self) -> float:
+        wall, mono = time.time(), time.monotonic()
+        jump = wall - (self._wall + mono - self._mono)
+        if abs(jump) <= self.jump_threshold:
+            return 0
+        logging.warning(f"检测到系统时间跳变 {jump:+.1f} 秒，调度时钟已重新锚定")
+        self.jumps.append((wall, jump))
+        self._wall, self._mono = wall, mono
+        return jump
+
+    def time(self) -> float:
+        self.check()
+        return self._wall + time.monotonic() - self._mono
+
+    def monotonic(self) -> float:
+        return time.monotonic()
+
+
+class SimulatedClock(Clock):
+    """虚拟时钟：时间只在调用 advance/advance_to 时前进，jump 模拟系统时间跳变"""
+
+    def __init__(self, start: Optional[datetime.datetime] = None, log_size: int = 100):
+        super().__init__(log_size)
+        self._time = (start or datetime.datetime.now()).timestamp()
+        self._elapsed = 0.0
+        self._pending_jump = 0.0
+
+    def time(self) -> float:
+        self.check()
+        return self._time
+
+    def monotonic(self) -> float:
+        return self._elapsed
+
+    def check(self) -> float:
+        jump, self._pending_jump = self._pending_jump, 0.0
+        if jump:
+            logging.warning(f"检测到系统时间跳变 {jump:+.1f} 秒，调度时钟已重新锚定")
+            self.jumps.append((self._time, jump))
+        return jump
+
+    def advance(self, seconds: float):
+        """虚拟时间前进指定秒数"""
+        if seconds > 0:
+            self._time += seconds
+            self._elapsed += seconds
+
+    def advance_to(self, timestamp: float):
+        """虚拟时间前进到指定时间戳，早于当前时间时不变"""
+        self.advance(timestamp - self._time)
+
+    def jump(self, seconds: float):
+        """系统时间跳变：墙上时间改变而单调时间不变，下次读取时间时报告跳变"""
+        self._time += seconds
+        self._pending_jump += seconds
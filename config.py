@@ -18,6 +18,7 @@ class PathConfig:
     BASE_DIR = os.path.dirname(os.path.abspath(__file__))
     ICON_PATH = os.path.join(BASE_DIR, "icon.ico")
     TASK_FILE_PATH = os.path.join(BASE_DIR, "task.json")
+    SQLITE_DB_PATH = os.path.join(BASE_DIR, "task.db")
 
 @dataclass
 class TaskConfig:
@@ -22,11 +22,35 @@ def get_task_file_path():
     return DEFAULT_TASK_FILE
 
 
+def get_config_value(key, default=None):
+    """
+    从 config.json 文件中读取单个配置项，缺失或文件无效时返回默认值。
+    """
+    try:
+        with open(CONFIG_FILE, "r", encoding="utf-8") as f:
+            config = json.load(f)
+            if isinstance(config, dict) and key in config:
+                return config[key]
+    except (FileNotFoundError, json.JSONDecodeError, TypeError):
+        pass
+
+    return default
+
+
 def save_task_file_path(task_file_path):
     """
-    将任务文件路径保存到 config.json 文件中。
+    将任务文件路径保存到 config.json 文件中，保留其他配置项。
     """
-    config = {"task_file_path": task_file_path}
+    config = {}
+    try:
+        with open(CONFIG_FILE, "r", encoding="utf-8") as f:
+            loaded = json.load(f)
+            if isinstance(loaded, dict):
+                config = loaded
+    except (FileNotFoundError, json.JSONDecodeError, TypeError):
+        pass
+
+    config["task_file_path"] = task_file_path
     with open(CONFIG_FILE, "w", encoding="utf-8") as f:
         json.dump(config, f, indent=4, ensure_ascii=False)
 
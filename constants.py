@@ -19,4 +19,77 @@ SECONDARY_COLOR = "#B2DFDB"  # Light Teal
 BACKGROUND_COLOR = "#ECEFF1" # Light Gray
 
 # 其他常量
-WEEKDAYS = ["一", "二", "三", "四", "五", "六", "日"]
\ No newline at end of file
+WEEKDAYS = ["一", "二", "三", "四", "五", "六", "日"]
+
+# 调度设置
+SCHEDULER_MAX_SLEEP_MS = 60000  # 调度定时器最长休眠时间，防止系统时间调整后长时间不唤醒
+FIRE_ON_TIME_TOLERANCE = 1  # 迟到不超过该秒数视为准时触发
+CATCH_UP_POLICY = "fire"  # 迟到补救策略: fire(限时补播) / skip(跳过) / seek(补播并向前定位)
+CATCH_UP_MAX_LATENESS = 60  # 允许补播的最大迟到秒数
+CLOCK_JUMP_THRESHOLD = 2  # 系统时间与单调时钟推算值相差超过该秒数视为时间跳变
+
+# 状态持久化设置
+STATUS_FLUSH_THRESHOLD = 50  # 未合并的状态变化达到该数量时立即写入任务文件
+STATUS_FLUSH_INTERVAL_MS = 30000  # 定时合并状态变化的间隔
+DURATION_CACHE_SAVE_DELAY = 5  # 音频时长缓存有新条目后延迟保存的秒数，期间的新条目合并为一次写入
+
+# 任务文件监视设置
+TASK_FILE_POLL_MS = 2000  # 检查任务文件是否被其他程序修改的间隔
+
+# 导入设置
+IMPORT_READ_SIZE = 256 * 1024  # 流式导入每次读取的字节数
+IMPORT_CHUNK_SIZE = 1000  # 每块任务数，界面线程每次只应用一块到任务仓库
+IMPORT_QUEUE_CHUNKS = 4  # 已解析未应用的任务块上限，界面应用较慢时后台线程等待，内存占用不随文件大小增长
+IMPORT_POLL_MS = 20  # 界面线程检查并应用已解析任务块的间隔
+
+# 任务列表显示设置
+VIRTUAL_BUFFER_ROWS = 20  # 任务列表在可见区域之外额外创建的行数
+
+# 音频预加载设置
+PREFETCH_LOOKAHEAD_SECONDS = 300  # 预加载未来该秒数内到期任务的音频
+PREFETCH_MEMORY_BUDGET = 256 * 1024 * 1024  # 预加载缓存占用的最大内存(字节)
+
+# 播放事件设置
+PLAYER_EVENT_POLL_MS = 250  # 播放中处理结束事件和刷新进度的间隔
+PLAYER_IDLE_POLL_MS = 1000  # 空闲时处理播放事件的间隔
+PLAYER_BUSY_POLL_MS = 5  # 开始播放后等待后端确认出声的检查间隔
+PLAYER_COMMAND_TIMEOUT = 30  # 关闭播放核心时等待音频线程退出的最长秒数
+PLAYER_REPLY_TIMEOUT = 0.25  # 播放命令等待音频线程返回结果的最长秒数，超时后结果以事件通知
+DEFAULT_AUDIO_BACKEND = "pygame"  # 音频后端: pygame / null(不访问声音设备，用于压测)
+
+# 多通道混音设置
+DEFAULT_CHANNEL = "main"  # 主通道使用 pygame.mixer.music 流式播放，其他通道使用 Sound/Channel
+MIX_PREEMPT = "preempt"  # 停止主通道后播放
+MIX_OVERLAY = "overlay"  # 与主通道直接叠加
+MIX_DUCK = "duck"  # 播放期间压低主通道音量
+MIX_POLICIES = (MIX_PREEMPT, MIX_OVERLAY, MIX_DUCK)
+DEFAULT_MIX_POLICY = MIX_PREEMPT
+MIX_CHANNEL_POOL = 8  # 音频后端混音通道池大小
+PREVIEW_CHANNEL = "preview"  # 编辑任务时试听音频使用的通道，与主通道叠加播放，不影响正在播放的任务
+MIX_DUCK_RATIO = 0.3  # 压低时主通道音量的比例
+MIX_POLICY_LABELS = {MIX_PREEMPT: "抢占主通道", MIX_OVERLAY: "叠加播放", MIX_DUCK: "压低主通道"}
+
+# 播放队列设置
+BUSY_PREEMPT = "preempt"  # 优先级不低于当前任务时停止当前任务立即播放，否则排队
+BUSY_QUEUE = "queue"  # 加入播放队列，当前任务结束后按优先级依次播放
+BUSY_DROP = "drop"  # 放弃本次播放
+BUSY_MERGE = "merge"  # 相同音频正在播放或已在队列中时合并为一次，否则排队
+BUSY_POLICIES = (BUSY_PREEMPT, BUSY_QUEUE, BUSY_DROP, BUSY_MERGE)
+DEFAULT_BUSY_POLICY = BUSY_PREEMPT
+DEFAULT_PRIORITY = 0  # 数值越大优先级越高
+QUEUE_MAX_WAIT = 300  # 排队条目的最长等待秒数，出队时等待更久的条目被丢弃，不再延迟播放
+BUSY_POLICY_LABELS = {BUSY_PREEMPT: "抢占播放", BUSY_QUEUE: "排队播放", BUSY_DROP: "放弃播放", BUSY_MERGE: "合并相同音频"}
+
+# 仿真设置
+SIMULATION_AUDIO_SECONDS = 180  # 仿真中无法得知时长的音频按该秒数播放
+
+# 触发延迟统计设置
+METRICS_FILE_PATH = os.path.join(BASE_DIR, "metrics.json")  # 触发延迟直方图的导出文件
+METRICS_EXPORT_INTERVAL_MS = 60000  # 导出触发延迟统计的间隔
+FIRE_BUSY_TIMEOUT = 2  # 播放调用返回后超过该秒数仍未出声，不再等待出声时间
+
+# 性能测量设置
+BENCHMARK_SIZES = (100, 1000, 10000, 100000)  # 合成任务文件的任务数量
+PERSISTENCE_BENCHMARK_SIZES = (1000, 10000, 100000)  # 持久化模式的任务数量
+BENCHMARK_RESULTS_PATH = os.path.join(BASE_DIR, "benchmark_results.json")
+BENCHMARK_REGRESSION_THRESHOLD = 0.2  # 中位数比基准慢超过该比例视为性能退化
@@ -0,0 +1,131 @@
+import hashlib
+import json
+import os
+import stat
+import tempfile
+import threading
+from typing import Dict, Optional, Tuple
+
+# 每个文件最近一次由本进程写入或读取的内容摘要和文件状态: 路径 -> (摘要, 大小, 修改时间)
+_saved_state: Dict[str, Tuple[str, int, int]] = {}
+_state_lock = threading.Lock()
+
+# 进程的 umask 只能通过设置来读取，在导入时(其他线程启动前)读取一次
+_umask = os.umask(0)
+os.umask(_umask)
+
+
+def serialize_tasks(tasks) -> bytes:
+    """将任务列表序列化为写入文件的字节，所有保存路径共用同一份结果"""
+    return json.dumps(tasks, ensure_ascii=False, indent=4).encode("utf-8")
+
+
+def content_digest(data: bytes) -> str:
+    return hashlib.blake2b(data, digest_size=16).hexdigest()
+
+
+def _state_key(path: str) -> str:
+    return os.path.normcase(os.path.abspath(path))
+
+
+def _file_mode(path: str) -> int:
+    """目标文件已存在时返回其权限，否则返回 0666 去掉当前 umask 后的权限"""
+    try:
+        return stat.S_IMODE(os.stat(path).st_mode)
+    except OSError:
+        return 0o666 & ~_umask
+
+
+def atomic_write_bytes(path: str, data: bytes):
+    """先写临时文件并 fsync，再原子替换目标文件，写入中途崩溃不会损坏原文件"""
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+
+    fd, temp_path = tempfile.mkstemp(dir=directory, prefix=f".{os.path.basename(path)}.", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        # mkstemp 创建的临时文件权限为 0600，替换后会沿用到目标文件，改为原文件的权限(新文件按 umask)
+        os.chmod(temp_path, _file_mode(path))
+        os.replace(temp_path, path)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+
+    # 同步目录项，保证重命名本身落盘(Windows 不支持打开目录，跳过)
+    if hasattr(os, "O_DIRECTORY"):
+        try:
+            dir_fd = os.open(directory, os.O_RDONLY | os.O_DIRECTORY)
+            try:
+                os.fsync(dir_fd)
+            finally:
+                os.close(dir_fd)
+        except OSError:
+            pass
+
+    _remember(path, data, os.stat(path))
+
+
+def _remember(path: str, data: bytes, result: os.stat_result):
+    with _state_lock:
+        _saved_state[_state_key(path)] = (content_digest(data), result.st_size, result.st_mtime_ns)
+
+
+def read_file_bytes(path: str) -> bytes:
+    """读取文件内容并记录其摘要和文件状态，之后保存相同内容时跳过写入(如启动时加载后立即保存)"""
+    with open(path, "rb") as f:
+        before = os.fstat(f.fileno())
+        data = f.read()
+        after = os.fstat(f.fileno())
+    # 读取期间文件被修改时不记录，下次保存照常写入
+    if (before.st_size, before.st_mtime_ns) == (after.st_size, after.st_mtime_ns) and len(data) == after.st_size:
+        _remember(path, data, after)
+    return data
+
+
+def is_own_write(path: str) -> bool:
+    """判断文件当前的大小和修改时间是否与本进程最近一次写入后一致，即之后没有被外部修改"""
+    with _state_lock:
+        state = _saved_state.get(_state_key(path))
+    if not state:
+        return False
+    try:
+        result = os.stat(path)
+    except OSError:
+        return False
+    return (result.st_size, result.st_mtime_ns) == state[1:]
+
+
+def saved_digest(path: str) -> Optional[str]:
+    """本进程最近一次写入该文件的内容摘要"""
+    with _state_lock:
+        state = _saved_state.get(_state_key(path))
+    return state[0] if state else None
+
+
+def is_unchanged(path: str, data: bytes) -> bool:
+    """判断文件内容是否与要写入的内容一致
+
+    本进程写入或读取后未被外部修改时只比较摘要；没有记录(如从未读取过的默认任务文件)或已被外部修改时，
+    大小相同才读回磁盘上的内容比较，读取比重写并 fsync 便宜。
+    """
+    if is_own_write(path):
+        return saved_digest(path) == content_digest(data)
+    try:
+        if os.path.getsize(path) != len(data):
+            return False
+        return read_file_bytes(path) == data
+    except OSError:
+        return False
+
+
+def write_if_changed(path: str, data: bytes) -> bool:
+    """内容有变化时原子写入，返回是否实际写入"""
+    if is_unchanged(path, data):
+        return False
+    atomic_write_bytes(path, data)
+    return True
+
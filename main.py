@@ -1,18 +1,32 @@
-from audio_player import AudioPlayer
 from admin_utils import is_admin
+import argparse
 import sys
 import logging
 from config_manager import get_task_file_path
 
+def parse_args():
+    parser = argparse.ArgumentParser(description="任务播放器")
+    parser.add_argument("--headless", action="store_true", help="无界面模式：只运行任务调度和播放，不创建窗口")
+    parser.add_argument("--task-file", help="任务文件路径，默认读取 config.json 中的配置")
+    parser.add_argument("--status-interval", type=float, default=60, help="无界面模式下输出状态日志的间隔(秒)，0 表示关闭")
+    parser.add_argument("--audio-backend", choices=["pygame", "null"], help="无界面模式的音频后端，null 不访问声音设备，默认读取 config.json 中的配置")
+    return parser.parse_args()
+
 def main():
+    args = parse_args()
     try:
-        task_file_path = get_task_file_path()
-        player = AudioPlayer(task_file_path)
-        player.run()
+        task_file_path = args.task_file or get_task_file_path()
+        if args.headless:
+            from task_engine import run_headless
+            run_headless(task_file_path, args.status_interval, args.audio_backend)
+        else:
+            from audio_player import AudioPlayer
+            player = AudioPlayer(task_file_path)
+            player.run()
     except Exception as e:
         logging.error(f"程序运行错误: {e}")
         raise
 
 if __name__ == "__main__":
-    logging.basicConfig(level=logging.INFO)
-    main()
\ No newline at end of file
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    main()
@@ -0,0 +1,123 @@
+import bisect
+import json
+import logging
+import threading
+from collections import deque
+from dataclasses import dataclass, asdict
+from typing import Deque, Dict, List, Optional
+from constants import METRICS_FILE_PATH
+from file_utils import write_if_changed
+
+# 直方图桶上限(秒)：0.5 毫秒起按 2 倍递增到约 65 秒，更大的值计入最后一个桶
+LATENCY_BUCKETS = [0.0005 * 2 ** i for i in range(18)]
+
+
+@dataclass
+class FireTiming:
+    """一次定时触发的各阶段时间戳(调度时钟的时间戳)"""
+    task_id: str
+    scheduled: float  # 计划触发时间
+    ticked: float  # 调度器处理到期任务的时间
+    returned: float  # 播放调用返回的时间
+    busy: Optional[float] = None  # 音频实际开始播放的时间，后端无法得知时为 None
+
+    def stages(self) -> Dict[str, float]:
+        """各阶段延迟(秒)：tick 调度迟到，dispatch 播放调用耗时，audio_start 调用返回到出声，total 计划到出声"""
+        stages = {"tick": self.ticked - self.scheduled, "dispatch": self.returned - self.ticked}
+        if self.busy is not None:
+            # 音频线程在返回结果之前就已开始播放时记为 0
+            stages["audio_start"] = max(self.busy - self.returned, 0)
+        stages["total"] = max(self.busy if self.busy is not None else self.returned, self.returned) - self.scheduled
+        return {name: max(value, 0) for name, value in stages.items()}
+
+
+class LatencyHistogram:
+    """按指数桶统计延迟分布，百分位取所在桶的上限(不超过最大值)"""
+
+    def __init__(self, bounds: List[float] = LATENCY_BUCKETS):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def add(self, value: float):
+        self.counts[bisect.bisect_left(self.bounds, value)] += 1
+        self.count += 1
+        self.total += value
+        self.max = max(self.max, value)
+
+    def percentile(self, p: float) -> float:
+        if not self.count:
+            return 0
+        rank = p / 100 * self.count
+        seen = 0
+        for i, count in enumerate(self.counts):
+            seen += count
+            if seen >= rank and count:
+                return min(self.bounds[i] if i < len(self.bounds) else self.max, self.max)
+        return self.max
+
+    def snapshot(self) -> dict:
+        return {
+            "count": self.count,
+            "mean": self.total / self.count if self.count else 0,
+            "p50": self.percentile(50),
+            "p95": self.percentile(95),
+            "p99": self.percentile(99),
+            "max": self.max,
+            "buckets": {f"{bound * 1000:g}ms": count for bound, count in zip(self.bounds, self.counts) if count},
+            "overflow": self.counts[-1],
+        }
+
+
+class FireMetrics:
+    """触发延迟统计：每个阶段一个直方图，另按 RFC 3550 的方法平滑计算总延迟的抖动"""
+
+    STAGES = ("tick", "dispatch", "audio_start", "total")
+
+    def __init__(self, path: str = METRICS_FILE_PATH, recent_size: int = 100):
+        self.path = path
+        self.histograms = {stage: LatencyHistogram() for stage in self.STAGES}
+        self.jitter = 0.0
+        self.recent: Deque[FireTiming] = deque(maxlen=recent_size)
+        self._last_total: Optional[float] = None
+        self._lock = threading.Lock()
+
+    def record(self, timing: FireTiming):
+        stages = timing.stages()
+        with self._lock:
+            for stage, value in stages.items():
+                self.histograms[stage].add(value)
+            if self._last_total is not None:
+                self.jitter += (abs(stages["total"] - self._last_total) - self.jitter) / 16
+            self._last_total = stages["total"]
+            self.recent.append(timing)
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                "stages": {stage: histogram.snapshot() for stage, histogram in self.histograms.items()},
+                "jitter": self.jitter,
+                "recent": [asdict(timing) for timing in self.recent],
+            }
+
+    def export(self, path: Optional[str] = None) -> bool:
+        """把统计写入指标文件，内容未变化时不写盘"""
+        try:
+            data = json.dumps(self.snapshot(), ensure_ascii=False, indent=2).encode("utf-8")
+            write_if_changed(path or self.path, data)
+            return True
+        except Exception as e:
+            logging.error(f"导出触发延迟指标失败: {e}")
+            return False
+
+    def format_summary(self) -> str:
+        """状态栏显示的总延迟摘要"""
+        with self._lock:
+            total = self.histograms["total"]
+            if not total.count:
+                return "触发延迟: 暂无数据"
+            return (f"触发延迟 p50 {total.percentile(50) * 1000:.0f}ms / p95 {total.percentile(95) * 1000:.0f}ms / "
+                    f"p99 {total.percentile(99) * 1000:.0f}ms / 最大 {total.max * 1000:.0f}ms, "
+                    f"抖动 {self.jitter * 1000:.0f}ms")
@@ -0,0 +1,157 @@
+import heapq
+import itertools
+import time
+from collections import Counter, deque
+from dataclasses import dataclass, field
+from typing import Callable, Deque, Dict, List, Optional, Tuple
+from constants import BUSY_PREEMPT, BUSY_DROP, BUSY_MERGE, QUEUE_MAX_WAIT
+
+
+@dataclass
+class QueueEntry:
+    """播放队列中的一项，按优先级从高到低、同优先级按加入顺序播放"""
+    file_path: str
+    volume: int
+    priority: int
+    tag: Optional[str]  # 调用方用于识别条目的标记，如任务ID
+    enqueued_at: float  # 加入队列时的单调时钟时间
+    removed: bool = field(default=False, repr=False)  # 已出队、被替换或过期，堆和加入顺序队列中的位置在到达队首时清理
+
+
+class PlayQueue:
+    """主通道播放队列：按 (优先级, 加入顺序) 排序的最小堆，并统计深度、等待时间和各策略的处理次数
+
+    同一标记(任务)在队列中只保留最新的一项；出队时等待超过 max_wait 秒的条目被丢弃，由 take_expired 取出。
+    替换和过期都只标记条目(惰性删除)：堆按优先级出队时跳过已删除的条目，另一个按加入顺序排列的队列只检查队首的过期条目，
+    入队和出队均摊 O(log n)，不再扫描整个队列。
+    """
+
+    def __init__(self, monotonic: Callable[[], float] = time.monotonic, max_wait: Optional[float] = QUEUE_MAX_WAIT):
+        self._monotonic = monotonic
+        self.max_wait = max_wait
+        self._heap: List[Tuple[int, int, QueueEntry]] = []  # (-优先级, 序号, 条目)，含已删除的条目
+        self._order: Deque[QueueEntry] = deque()  # 按加入顺序(即等待时间从长到短)，含已删除的条目
+        self._by_tag: Dict[str, QueueEntry] = {}  # 标记 -> 队列中的条目
+        self._paths: Counter = Counter()  # 文件路径 -> 队列中的条目数
+        self._size = 0  # 队列中未删除的条目数
+        self._counter = itertools.count()
+        self._expired: List[QueueEntry] = []  # 出队时因等待过久被丢弃、尚未取出的条目
+        self.stats = {"enqueued": 0, "dequeued": 0, "peak": 0, "preempted": 0, "merged": 0, "dropped": 0,
+                      "replaced": 0, "expired": 0, "wait_total": 0.0, "wait_max": 0.0}
+
+    def __len__(self) -> int:
+        return self._size
+
+    def decide(self, file_path: str, priority: int, policy: str, current_file: str, current_priority: int) -> str:
+        """主通道正在播放 current_file 时按策略决定新曲目的处理结果: played / queued / merged / dropped
+
+        preempt 仅在优先级不低于当前曲目时抢占，否则与 queue 一样排队；
+        merge 在相同文件正在播放或已在队列中时合并，否则排队。
+        """
+        if policy == BUSY_DROP:
+            outcome = "dropped"
+        elif policy == BUSY_MERGE and (current_file == file_path or self.contains(file_path)):
+            outcome = "merged"
+        elif policy == BUSY_PREEMPT and priority >= current_priority:
+            outcome = "preempted"
+        else:
+            return "queued"
+        self.stats[outcome] += 1
+        return "played" if outcome == "preempted" else outcome
+
+    def push(self, file_path: str, volume: int, priority: int, tag: Optional[str] = None) -> QueueEntry:
+        """加入队列，相同标记的条目已在队列中时替换它"""
+        if tag is not None and tag in self._by_tag:
+            self._remove(self._by_tag[tag])
+            self.stats["replaced"] += 1
+        entry = QueueEntry(file_path, volume, priority, tag, self._monotonic())
+        heapq.heappush(self._heap, (-priority, next(self._counter), entry))
+        self._order.append(entry)
+        if tag is not None:
+            self._by_tag[tag] = entry
+        self._paths[file_path] += 1
+        self._size += 1
+        self.stats["enqueued"] += 1
+        self.stats["peak"] = max(self.stats["peak"], self._size)
+        self._compact()
+        return entry
+
+    def pop(self) -> Optional[QueueEntry]:
+        """丢弃所有等待过久的条目，再取出优先级最高的条目并记录其等待时间，没有时返回 None
+
+        低优先级的条目可能一直排在堆顶之后，所以按加入顺序检查过期，而不只是堆顶。
+        """
+        now = self._monotonic()
+        self._expire(now)
+        while self._heap and self._heap[0][2].removed:
+            heapq.heappop(self._heap)
+        if not self._heap:
+            return None
+        _, _, entry = heapq.heappop(self._heap)
+        self._remove(entry)
+        wait = now - entry.enqueued_at
+        self.stats["dequeued"] += 1
+        self.stats["wait_total"] += wait
+        self.stats["wait_max"] = max(self.stats["wait_max"], wait)
+        return entry
+
+    def take_expired(self) -> List[QueueEntry]:
+        """取出出队时因等待过久被丢弃的条目"""
+        expired, self._expired = self._expired, []
+        return expired
+
+    def contains(self, file_path: str) -> bool:
+        return self._paths[file_path] > 0
+
+    def clear(self):
+        for entry in self._order:
+            entry.removed = True
+        self._heap.clear()
+        self._order.clear()
+        self._by_tag.clear()
+        self._paths.clear()
+        self._size = 0
+
+    def snapshot(self) -> dict:
+        """当前深度、各项计数，以及出队条目的平均/最长等待秒数和仍在队列中最久的等待秒数"""
+        stats = dict(self.stats)
+        now = self._monotonic()
+        self._skip_removed()
+        stats["depth"] = self._size
+        stats["wait_avg"] = stats["wait_total"] / stats["dequeued"] if stats["dequeued"] else 0
+        stats["oldest_wait"] = now - self._order[0].enqueued_at if self._order else 0
+        return stats
+
+    def _remove(self, entry: QueueEntry):
+        """标记条目已删除，它在堆和加入顺序队列中的位置之后再清理"""
+        entry.removed = True
+        self._size -= 1
+        self._paths[entry.file_path] -= 1
+        if not self._paths[entry.file_path]:
+            del self._paths[entry.file_path]
+        if entry.tag is not None and self._by_tag.get(entry.tag) is entry:
+            del self._by_tag[entry.tag]
+
+    def _skip_removed(self):
+        while self._order and self._order[0].removed:
+            self._order.popleft()
+
+    def _expire(self, now: float):
+        """丢弃加入顺序队列队首等待超过 max_wait 秒的条目"""
+        if self.max_wait is None:
+            return
+        self._skip_removed()
+        while self._order and now - self._order[0].enqueued_at > self.max_wait:
+            entry = self._order.popleft()
+            self._remove(entry)
+            self._expired.append(entry)
+            self.stats["expired"] += 1
+            self._skip_removed()
+
+    def _compact(self):
+        """已删除的条目多于队列中的条目时重建堆和加入顺序队列，避免反复替换的条目占用内存"""
+        if len(self._heap) <= 2 * self._size + 16:
+            return
+        self._heap = [item for item in self._heap if not item[2].removed]
+        heapq.heapify(self._heap)
+        self._order = deque(entry for entry in self._order if not entry.removed)
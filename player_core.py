@@ -1,122 +1,475 @@
-import pygame
+import concurrent.futures
+import queue
 import threading
 import time
 import logging
-from typing import Optional, Callable
-import datetime
+from concurrent.futures import Future
+from dataclasses import dataclass, replace
+from typing import Any, Dict, Optional, Callable, Tuple
+from constants import PLAYER_EVENT_POLL_MS, PLAYER_BUSY_POLL_MS, PLAYER_COMMAND_TIMEOUT, PLAYER_REPLY_TIMEOUT, DEFAULT_CHANNEL, DEFAULT_MIX_POLICY, \
+    MIX_PREEMPT, MIX_DUCK, MIX_CHANNEL_POOL, MIX_DUCK_RATIO, DEFAULT_PRIORITY, DEFAULT_BUSY_POLICY
+from audio_backend import AudioBackend, create_backend
+from audio_prefetch import AudioPrefetcher
+from play_queue import PlayQueue, QueueEntry
+
+
+@dataclass
+class ChannelSlot:
+    """一个逻辑通道当前占用的后端混音通道"""
+    channel: Any
+    file_path: str
+    mix_policy: str
+    duration: float
+    started_at: float
+
+
+@dataclass(frozen=True)
+class PlayerState:
+    """播放状态快照，由音频线程整体替换，其他线程只读"""
+    current_sound: Optional[str] = None
+    paused: bool = False
+    duration: float = 0
+    start_offset: float = 0  # 从文件中间开始播放时的起始位置(秒)
+    played: float = 0  # 最近一次暂停前累计播放的秒数
+    resumed_at: float = 0  # 最近一次开始或恢复播放的单调时钟时间
+    busy_at: Optional[float] = None  # 后端首次报告正在播放的单调时钟时间，用于统计触发延迟
+    volume: int = 100
+    priority: int = DEFAULT_PRIORITY  # 主通道当前曲目的优先级
+    tag: Optional[str] = None  # 主通道当前曲目的标记
+    queued: int = 0
+    channels: Tuple[Tuple[str, str], ...] = ()  # 非主通道上正在播放的 (通道, 文件)
+    ducked: bool = False  # 主通道音量是否被压低
+
+    @property
+    def position(self) -> float:
+        if not self.current_sound:
+            return 0
+        if self.paused:
+            return self.start_offset + self.played
+        return self.start_offset + self.played + time.monotonic() - self.resumed_at
+
 
 class PlayerCore:
-    def __init__(self):
-        self.current_sound: Optional[str] = None
-        self.paused: bool = False
-        self.current_duration: float = 0
-        self.play_thread: Optional[threading.Thread] = None
-        self.stop_flag: bool = False
-        self.on_progress: Optional[Callable] = None
+    """播放核心：所有音频后端操作都由一个音频线程按命令队列顺序执行
+
+    其他线程只发送命令、读取状态快照；播放结束等事件放入线程安全的事件队列，
+    由界面主循环或调度循环调用 poll_events 在自己的线程中分发回调。
+
+    主通道(DEFAULT_CHANNEL)由后端流式播放；其他逻辑通道各占用后端通道池中的一个混音通道，
+    可与主通道同时播放。同一逻辑通道中新的声音总是替换旧的声音。
+    后端默认按 config.json 中的 audio_backend 创建，无声卡的机器上可使用 null 后端。
+
+    主通道的播放队列是按 (优先级, 加入顺序) 排序的堆，当前曲目自然结束后播放优先级最高的一项。
+
+    暂停、恢复、停止、音量等命令只发送不等待；播放命令最多等待 PLAYER_REPLY_TIMEOUT 秒，
+    超时不视为失败，命令仍会执行，结果以 late_result 事件通过 on_late_result 通知。
+    """
+
+    def __init__(self, backend: Optional[AudioBackend] = None):
+        self.backend = backend or create_backend()
         self.on_complete: Optional[Callable] = None
-        self._lock = threading.Lock()
-        self.play_queue = []  # 播放队列
-        self.queue_lock = threading.Lock()  # 队列锁
-        
-        pygame.init()
-        pygame.mixer.init()
-
-    def add_to_queue(self, file_path: str, volume: int = 100) -> bool:
-        """添加任务到播放队列"""
-        with self.queue_lock:
-            if file_path not in self.play_queue:
-                self.play_queue.append((file_path, volume))
-                return True
-            return False
+        self.on_channel_complete: Optional[Callable[[str, str], None]] = None  # (通道, 文件)
+        self.on_queue_start: Optional[Callable[[QueueEntry, bool], None]] = None  # (队列条目, 是否播放成功)
+        self.on_queue_expired: Optional[Callable[[QueueEntry], None]] = None  # 等待过久被丢弃的队列条目
+        # 超时后才完成的播放命令: (命令, 通道, 标识, 结果, 时长)，submit 的标识为 tag，其他为文件路径
+        self.on_late_result: Optional[Callable[[str, str, Optional[str], str, float], None]] = None
+        self.prefetcher = AudioPrefetcher()
+        self._state = PlayerState()
+        self._commands: "queue.Queue[Tuple[str, tuple, Future]]" = queue.Queue()
+        self._events: "queue.Queue[Tuple[str, str, Any]]" = queue.Queue()  # (事件, 通道, 文件或队列条目)
+        self._play_queue = PlayQueue()  # 播放队列，仅由音频线程访问
+        self._slots: Dict[str, ChannelSlot] = {}  # 逻辑通道 -> 占用的混音通道，仅由音频线程访问
+        self._channel_stats = {"pool": MIX_CHANNEL_POOL, "in_use": 0, "peak": 0, "plays": 0, "rejected": 0}
+        self._thread = threading.Thread(target=self._run, name="audio-actor", daemon=True)
+        self._started = Future()
+        self._thread.start()
+        self._started.result()  # 初始化失败时在调用线程抛出异常
+
+    # ---- 状态 ----
+
+    @property
+    def state(self) -> PlayerState:
+        return self._state
+
+    @property
+    def current_sound(self) -> Optional[str]:
+        return self._state.current_sound
+
+    @property
+    def paused(self) -> bool:
+        return self._state.paused
+
+    @property
+    def current_duration(self) -> float:
+        return self._state.duration
+
+    @property
+    def start_offset(self) -> float:
+        return self._state.start_offset
+
+    def get_progress(self) -> Tuple[float, float]:
+        """按需计算当前播放位置(秒)和进度百分比，不播放时返回 (0, 0)"""
+        state = self._state
+        if not state.current_sound:
+            return 0, 0
+        position = state.position
+        progress = min(position / state.duration * 100, 100) if state.duration else 0
+        return position, progress
+
+    def channel_stats(self) -> dict:
+        """通道池使用情况：池大小、当前占用、峰值、播放次数和因通道耗尽被拒绝的次数"""
+        return dict(self._channel_stats)
+
+    def queue_stats(self) -> dict:
+        """播放队列指标：当前深度、峰值、各策略计数，以及出队条目的平均/最长等待秒数和队首最久的等待秒数"""
+        return self._call("queue_stats", default={})
+
+    def get_remaining(self) -> Optional[float]:
+        """当前曲目剩余秒数，时长未知或未在播放时返回 None"""
+        return self._remaining(self._state)
+
+    # ---- 命令 ----
+
+    def play(self, file_path: str, volume: int = 100, force_switch: bool = False, start: float = 0,
+             channel: str = DEFAULT_CHANNEL, mix_policy: str = DEFAULT_MIX_POLICY) -> tuple[bool, float]:
+        """播放音频文件，支持强制切换播放和从指定位置(秒)开始播放
+
+        channel 不是主通道时，mix_policy 决定如何对待主通道：preempt 停止主通道，
+        overlay 直接叠加，duck 在该声音播放期间压低主通道音量。
+        音频线程未及时返回时结果为 (None, 0)，最终结果以 late_result 事件通知。
+        """
+        if channel != DEFAULT_CHANNEL:
+            return self._call("play_channel", file_path, volume, channel, mix_policy, default=(None, 0))
+        return self._call("play", file_path, volume, force_switch, start, default=(None, 0))
+
+    def submit(self, file_path: str, volume: int = 100, priority: int = DEFAULT_PRIORITY,
+               policy: str = DEFAULT_BUSY_POLICY, tag: Optional[str] = None, start: float = 0) -> tuple[str, float]:
+        """在主通道播放到期的任务，主通道正在播放时按 policy 处理
+
+        返回 (结果, 时长)，结果为 played / queued / merged / dropped / failed。
+        preempt 仅在优先级不低于当前曲目时抢占，否则与 queue 一样加入队列；
+        merge 在相同文件正在播放或已在队列中时不再重复播放。排队的条目从头播放，忽略 start。
+        音频线程未及时返回时结果为 pending，最终结果以 late_result 事件通知。
+        """
+        return self._call("submit", file_path, volume, priority, policy, tag, start, default=("pending", 0))
+
+    def stop_channel(self, channel: str):
+        """停止指定逻辑通道"""
+        self._send("stop_channel", channel)
+
+    def pause(self):
+        """暂停播放"""
+        self._send("pause")
+
+    def resume(self):
+        """恢复播放"""
+        self._send("resume")
+
+    def stop(self):
+        """停止播放并清空队列"""
+        self._send("stop")
+
+    def set_volume(self, volume: int):
+        self._send("set_volume", volume)
+
+    def set_channel_volume(self, channel: str, volume: int):
+        """修改非主通道中正在播放的声音的音量"""
+        self._send("set_channel_volume", channel, volume)
+
+    def add_to_queue(self, file_path: str, volume: int = 100, priority: int = DEFAULT_PRIORITY,
+                     tag: Optional[str] = None) -> bool:
+        """添加任务到播放队列，当前曲目结束后按优先级自动播放；同一文件已在队列中时返回 False"""
+        return self._call("enqueue", file_path, volume, priority, tag, True, default=True)
 
     def clear_queue(self):
         """清空播放队列"""
-        with self.queue_lock:
-            self.play_queue.clear()
+        self._send("clear_queue")
+
+    def shutdown(self):
+        """停止预加载线程和音频线程"""
+        self.prefetcher.stop()
+        if self._thread.is_alive():
+            self._send("quit")
+            self._thread.join(timeout=PLAYER_COMMAND_TIMEOUT)
+
+    def poll_events(self) -> bool:
+        """在调用线程中分发音频线程发布的事件，返回是否有曲目自然播放结束"""
+        finished = False
+        while True:
+            try:
+                kind, channel, payload = self._events.get_nowait()
+            except queue.Empty:
+                return finished
+            if kind == "complete":
+                finished = True
+                if self.on_complete:
+                    self.on_complete()
+            elif kind == "channel_complete" and self.on_channel_complete:
+                self.on_channel_complete(channel, payload)
+            elif kind in ("queue_start", "queue_failed") and self.on_queue_start:
+                self.on_queue_start(payload, kind == "queue_start")
+            elif kind == "queue_expired" and self.on_queue_expired:
+                self.on_queue_expired(payload)
+            elif kind == "late_result" and self.on_late_result:
+                self.on_late_result(*payload)
+
+    def _send(self, name: str, *args):
+        """发送不需要结果的命令，不等待音频线程执行"""
+        self._commands.put((name, args, None))
+
+    def _call(self, name: str, *args, default=None):
+        """发送命令并等待结果，超过 PLAYER_REPLY_TIMEOUT 秒返回 default，命令仍会执行"""
+        if threading.current_thread() is self._thread:
+            raise RuntimeError("不能在音频线程中同步调用播放命令")
+        if not self._thread.is_alive():
+            # 音频线程已停止(shutdown 之后)，命令不会再执行
+            return default
+        future = Future()
+        self._commands.put((name, args, future))
+        try:
+            return future.result(timeout=PLAYER_REPLY_TIMEOUT)
+        except concurrent.futures.TimeoutError:
+            logging.warning(f"播放命令 {name} 未在 {PLAYER_REPLY_TIMEOUT} 秒内完成，结果稍后以事件通知")
+            future.add_done_callback(lambda done: self._publish_late_result(name, args, done))
+            return default
+
+    def _publish_late_result(self, name: str, args: tuple, future: Future):
+        """超时后才完成的播放命令，把结果放入事件队列"""
+        if name not in ("play", "play_channel", "submit"):
+            return
+        if future.exception():
+            outcome, duration = "failed", 0
+        elif name == "submit":
+            outcome, duration = future.result()
+        else:
+            success, duration = future.result()
+            outcome = "played" if success else "failed"
+        channel = args[2] if name == "play_channel" else DEFAULT_CHANNEL
+        key = args[4] if name == "submit" else args[0]
+        self._events.put(("late_result", channel, (name, channel, key, outcome, duration)))
+
+    # ---- 音频线程 ----
 
-    def play(self, file_path: str, volume: int = 100, force_switch: bool = False) -> tuple[bool, float]:
-        """播放音频文件，支持强制切换播放"""
+    def _run(self):
         try:
-            with self._lock:
-                # 如果需要强制切换，先停止当前播放
-                if force_switch and pygame.mixer.music.get_busy():
-                    pygame.mixer.music.stop()
-                    pygame.mixer.music.unload()
-                
-                pygame.mixer.music.load(file_path)
-                pygame.mixer.music.set_volume(volume / 100)
-                sound = pygame.mixer.Sound(file_path)
-                duration = sound.get_length()
-                
-                pygame.mixer.music.play()
-                self.current_sound = file_path
-                self.current_duration = duration
-                self.paused = False
-                self.stop_flag = False
-                
-                # 启动进度更新线程
-                if self.play_thread and self.play_thread.is_alive():
-                    self.stop_flag = True
-                    self.play_thread.join(timeout=1.0)
-                self.play_thread = threading.Thread(target=self._update_progress, daemon=True)
-                self.play_thread.start()
-                
-                return True, duration
+            self.backend.init(MIX_CHANNEL_POOL)
+        except Exception as e:
+            logging.error(f"音频初始化失败: {e}")
+            self._started.set_exception(e)
+            return
+        self._started.set_result(True)
+
+        while True:
+            try:
+                name, args, future = self._commands.get(timeout=self._wait_timeout())
+            except queue.Empty:
+                name = None
+            if name == "quit":
+                for channel in list(self._slots):
+                    self._do_stop_channel(channel)
+                self._do_stop()
+                self.backend.close()
+                if future:
+                    future.set_result(None)
+                return
+            if name:
+                try:
+                    result = getattr(self, f"_do_{name}")(*args)
+                    if future:
+                        future.set_result(result)
+                except Exception as e:
+                    logging.error(f"执行播放命令 {name} 失败: {e}")
+                    if future:
+                        future.set_exception(e)
+            self._check_finished()
+
+    def _wait_timeout(self) -> Optional[float]:
+        """空闲或暂停时无限等待命令；播放中按剩余时长醒来检查结束事件"""
+        state = self._state
+        poll_interval = PLAYER_EVENT_POLL_MS / 1000
+        timeouts = [max(slot.duration - (time.monotonic() - slot.started_at), poll_interval)
+                    for slot in self._slots.values()]
+        if state.current_sound and not state.paused:
+            if state.busy_at is None:
+                # 尚未确认开始出声时短间隔检查，保证触发延迟统计的精度
+                timeouts.append(PLAYER_BUSY_POLL_MS / 1000)
+            remaining = self._remaining(state)
+            timeouts.append(poll_interval if remaining is None else max(remaining, poll_interval))
+        return min(timeouts) if timeouts else None
+
+    @staticmethod
+    def _remaining(state: PlayerState) -> Optional[float]:
+        if not state.current_sound or state.paused or not state.duration:
+            return None
+        return max(state.duration - state.position, 0)
+
+    def _check_finished(self):
+        state = self._state
+        if state.current_sound and not state.paused and state.busy_at is None and self.backend.is_playing():
+            self._state = replace(state, busy_at=time.monotonic())
+        main_ended, sound_ended = self.backend.poll_ended()
+        if self._slots:
+            # 通道结束事件不区分通道，逐个检查；按时长兜底，防止事件丢失后通道一直被占用
+            now = time.monotonic()
+            for name, slot in list(self._slots.items()):
+                if not self.backend.sound_playing(slot.channel) and (sound_ended or now - slot.started_at >= slot.duration):
+                    self._release_slot(name)
+                    self._events.put(("channel_complete", name, slot.file_path))
+        state = self._state
+        if not main_ended or not state.current_sound or state.paused:
+            return
+        self._state = replace(PlayerState(), volume=state.volume, queued=len(self._play_queue),
+                              channels=state.channels, ducked=state.ducked)
+        self._events.put(("complete", DEFAULT_CHANNEL, state.current_sound))
+        self._play_next()
+
+    def _play_next(self):
+        """按优先级播放队列中的下一项，无法播放和等待过久的条目跳过"""
+        while self._play_queue:
+            entry = self._play_queue.pop()
+            for expired in self._play_queue.take_expired():
+                logging.warning(f"队列中的 {expired.file_path} 等待超过 {self._play_queue.max_wait} 秒，已丢弃")
+                self._events.put(("queue_expired", DEFAULT_CHANNEL, expired))
+            if entry is None:
+                break
+            wait = time.monotonic() - entry.enqueued_at
+            success, _ = self._do_play(entry.file_path, entry.volume, False, 0, entry.priority, entry.tag)
+            self._events.put(("queue_start" if success else "queue_failed", DEFAULT_CHANNEL, entry))
+            if success:
+                logging.info(f"队列中的 {entry.file_path} 开始播放，等待 {wait:.1f} 秒")
+                return
+        self._state = replace(self._state, queued=len(self._play_queue))
+
+    def _do_play(self, file_path, volume, force_switch, start, priority=DEFAULT_PRIORITY, tag=None):
+        try:
+            # 如果需要强制切换，先停止当前播放
+            if force_switch and self.backend.is_playing():
+                self.backend.stop()
+
+            # 已预加载的文件直接从内存加载
+            self.backend.load(file_path, self.prefetcher.get(file_path))
+            self.backend.set_volume(self._main_volume(volume))
+            duration = self.backend.duration(file_path)
+            # 时长未知时(0)不限制起始位置
+            start = start if start > 0 and (not duration or start < duration) else 0
+
+            self.backend.play(start)
+            now = time.monotonic()
+            self._state = PlayerState(current_sound=file_path, duration=duration, start_offset=start,
+                                      resumed_at=now, busy_at=now if self.backend.is_playing() else None,
+                                      volume=volume, priority=priority, tag=tag,
+                                      queued=len(self._play_queue),
+                                      channels=self._state.channels, ducked=self._state.ducked)
+            return True, duration
         except Exception as e:
             logging.error(f"播放失败: {e}")
             return False, 0
 
-    def pause(self):
-        """暂停播放"""
-        with self._lock:
-            if self.current_sound and not self.paused and pygame.mixer.music.get_busy():
-                pygame.mixer.music.pause()
-                self.paused = True
+    def _do_pause(self):
+        state = self._state
+        if state.current_sound and not state.paused and self.backend.is_playing():
+            self.backend.pause()
+            self._state = replace(state, paused=True, played=state.played + time.monotonic() - state.resumed_at)
 
-    def resume(self):
-        """恢复播放"""
-        with self._lock:
-            if self.current_sound and self.paused:
-                pygame.mixer.music.unpause()
-                self.paused = False
+    def _do_resume(self):
+        state = self._state
+        if state.current_sound and state.paused:
+            self.backend.resume()
+            self._state = replace(state, paused=False, resumed_at=time.monotonic())
 
-    def stop(self):
-        """停止播放"""
-        with self._lock:
-            if self.current_sound:
-                self.stop_flag = True
-                pygame.mixer.music.stop()
-                pygame.mixer.music.unload()
-                if self.play_thread and self.play_thread.is_alive():
-                    self.play_thread.join(timeout=1.0)
-                self.current_sound = None
-                self.paused = False
-                self.current_duration = 0
-                self.clear_queue()
-
-    def _update_progress(self):
-        """更新播放进度"""
+    def _do_stop(self):
+        self._play_queue.clear()
+        if self._state.current_sound:
+            self.backend.stop()
+        self._state = PlayerState(volume=self._state.volume, channels=self._state.channels, ducked=self._state.ducked)
+
+    def _do_set_volume(self, volume):
+        if self._state.current_sound:
+            self.backend.set_volume(self._main_volume(volume))
+        self._state = replace(self._state, volume=volume)
+
+    def _do_play_channel(self, file_path, volume, channel, mix_policy):
         try:
-            while not self.stop_flag and self.current_sound:
-                with self._lock:
-                    if pygame.mixer.music.get_busy() and not self.paused:
-                        current_pos = pygame.mixer.music.get_pos() / 1000
-                        progress = min(current_pos / self.current_duration * 100, 100)
-                        
-                        if self.on_progress:
-                            self.on_progress(current_pos, progress)
-                            
-                    elif not pygame.mixer.music.get_busy() and not self.paused:
-                        if self.on_complete:
-                            self.on_complete()
-                        # 检查队列中是否有下一个任务
-                        with self.queue_lock:
-                            if self.play_queue:
-                                next_file, next_volume = self.play_queue.pop(0)
-                                # 开始播放下一个任务
-                                self.play(next_file, next_volume)
-                        break
-                        
-                time.sleep(0.1)  # 降低CPU使用率
+            slot = self._slots.get(channel)
+            if slot:
+                # 同一逻辑通道中的新声音替换旧声音
+                mixer_channel = slot.channel
+            else:
+                mixer_channel = self.backend.open_channel()
+                if mixer_channel is None:
+                    self._channel_stats["rejected"] += 1
+                    logging.warning(f"混音通道已用尽({MIX_CHANNEL_POOL})，无法在通道 {channel} 播放 {file_path}")
+                    return False, 0
+
+            duration = self.backend.play_sound(mixer_channel, file_path, self.prefetcher.get(file_path), volume / 100)
+            if mix_policy == MIX_PREEMPT and self._state.current_sound:
+                self._do_stop()
+            self._slots[channel] = ChannelSlot(mixer_channel, file_path, mix_policy, duration, time.monotonic())
+
+            stats = self._channel_stats
+            stats["plays"] += 1
+            stats["in_use"] = len(self._slots)
+            stats["peak"] = max(stats["peak"], stats["in_use"])
+            self._update_mix()
+            return True, duration
         except Exception as e:
-            logging.error(f"进度更新失败: {e}")
+            logging.error(f"通道 {channel} 播放失败: {e}")
+            return False, 0
+
+    def _do_set_channel_volume(self, channel, volume):
+        slot = self._slots.get(channel)
+        if slot:
+            self.backend.set_sound_volume(slot.channel, volume / 100)
+
+    def _do_stop_channel(self, channel):
+        slot = self._slots.get(channel)
+        if slot:
+            self.backend.stop_sound(slot.channel)
+            self._release_slot(channel)
+
+    def _release_slot(self, channel):
+        del self._slots[channel]
+        self._channel_stats["in_use"] = len(self._slots)
+        self._update_mix()
+
+    def _update_mix(self):
+        """按当前占用的通道更新状态快照，并在需要时压低或恢复主通道音量"""
+        ducked = any(slot.mix_policy == MIX_DUCK for slot in self._slots.values())
+        state = self._state
+        channels = tuple((name, slot.file_path) for name, slot in self._slots.items())
+        if ducked != state.ducked and state.current_sound:
+            self.backend.set_volume(state.volume / 100 * (MIX_DUCK_RATIO if ducked else 1))
+        self._state = replace(state, channels=channels, ducked=ducked)
+
+    def _main_volume(self, volume) -> float:
+        return volume / 100 * (MIX_DUCK_RATIO if self._state.ducked else 1)
+
+    def _do_submit(self, file_path, volume, priority, policy, tag, start):
+        state = self._state
+        if not state.current_sound:
+            success, duration = self._do_play(file_path, volume, True, start, priority, tag)
+            return ("played" if success else "failed"), duration
+        outcome = self._play_queue.decide(file_path, priority, policy, state.current_sound, state.priority)
+        if outcome == "played":
+            success, duration = self._do_play(file_path, volume, True, start, priority, tag)
+            return ("played" if success else "failed"), duration
+        if outcome == "queued":
+            self._do_enqueue(file_path, volume, priority, tag, False)
+        else:
+            logging.info(f"主通道正在播放 {state.current_sound}，{file_path} 按策略 {policy} 处理为 {outcome}")
+        return outcome, 0
+
+    def _do_enqueue(self, file_path, volume, priority, tag, merge) -> bool:
+        if merge and self._play_queue.contains(file_path):
+            self._play_queue.stats["merged"] += 1
+            return False
+        self._play_queue.push(file_path, volume, priority, tag)
+        self._state = replace(self._state, queued=len(self._play_queue))
+        return True
+
+    def _do_queue_stats(self) -> dict:
+        return self._play_queue.snapshot()
+
+    def _do_clear_queue(self):
+        self._play_queue.clear()
+        self._state = replace(self._state, queued=0)
@@ -0,0 +1,181 @@
+import datetime
+import heapq
+import itertools
+import logging
+from collections import deque
+from dataclasses import dataclass
+from typing import Deque, Dict, Iterable, List, Optional, Tuple
+from constants import FIRE_ON_TIME_TOLERANCE, CATCH_UP_POLICY, CATCH_UP_MAX_LATENESS
+from clock import Clock, SystemClock
+from task_model import Task
+
+CATCH_UP_FIRE = "fire"  # 迟到不超过上限时补播
+CATCH_UP_SKIP = "skip"  # 超出准时容差即跳过
+CATCH_UP_SEEK = "seek"  # 补播并按迟到时长向前定位
+CATCH_UP_POLICIES = (CATCH_UP_FIRE, CATCH_UP_SKIP, CATCH_UP_SEEK)
+
+
+@dataclass
+class FireRecord:
+    """一次到期任务的处理记录"""
+    task_id: str
+    scheduled: float  # 计划触发时间戳
+    fired_at: float  # 实际处理时间戳
+    lateness: float  # 迟到秒数
+    action: str  # fired / late / seek / missed
+    offset: float = 0  # seek 策略下的播放起始偏移(秒)
+
+    @property
+    def should_fire(self) -> bool:
+        return self.action != "missed"
+
+
+class TaskScheduler:
+    """任务调度器：将任务编译为按下次触发时间排序的最小堆，只需为最早到期的任务定时
+
+    时间从注入的时钟读取，默认为 SystemClock：系统时间向前跳变后，跳过区间内的任务按补救策略处理；
+    向后跳变时已触发任务的下次触发时间不变，不会重复触发。
+    """
+
+    def __init__(self, catch_up_policy: str = CATCH_UP_POLICY, max_lateness: float = CATCH_UP_MAX_LATENESS,
+                 tolerance: float = FIRE_ON_TIME_TOLERANCE, log_size: int = 1000,
+                 clock: Optional[Clock] = None):
+        if catch_up_policy not in CATCH_UP_POLICIES:
+            logging.warning(f"未知的补救策略 {catch_up_policy}，使用默认策略 {CATCH_UP_FIRE}")
+            catch_up_policy = CATCH_UP_FIRE
+        self.catch_up_policy = catch_up_policy
+        self.max_lateness = max_lateness
+        self.tolerance = tolerance
+        self.clock = clock or SystemClock()
+        self.fire_log: Deque[FireRecord] = deque(maxlen=log_size)  # 迟到与错过的触发记录
+        self._heap: List[Tuple[float, int, str]] = []  # (触发时间戳, 序号, 任务键)
+        self._entries: Dict[str, Tuple[Task, float, int]] = {}  # 任务键 -> (任务, 触发时间戳, 序号)
+        self._counter = itertools.count()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, key) -> bool:
+        return str(key) in self._entries
+
+    def set_task(self, task: Task, now: Optional[datetime.datetime] = None) -> Optional[float]:
+        """新增或更新任务，调度相关字段未变化时不重建条目"""
+        key = str(task.id)
+        entry = self._entries.get(key)
+        if entry and entry[0].schedule_key == task.schedule_key:
+            self._entries[key] = (task, entry[1], entry[2])
+            return entry[1]
+
+        if task.start_seconds is None:
+            logging.warning(f"任务 {key} 时间格式无效，无法调度: {task.start_time}")
+            fire_ts = None
+        else:
+            fire_ts = task.next_fire_after((now or self.clock.now()).replace(microsecond=0))
+
+        if fire_ts is None:
+            self._entries.pop(key, None)
+            return None
+        self._push(key, task, fire_ts)
+        return fire_ts
+
+    def remove_task(self, key):
+        """移除任务，堆中的旧条目在出堆时惰性丢弃"""
+        self._entries.pop(str(key), None)
+
+    def clear(self):
+        self._heap.clear()
+        self._entries.clear()
+
+    def get_task(self, key) -> Optional[Task]:
+        entry = self._entries.get(str(key))
+        return entry[0] if entry else None
+
+    def sync(self, tasks: Iterable[Task], now: Optional[datetime.datetime] = None):
+        """按任务键与现有条目比对，只重建新增、修改和删除的任务"""
+        tasks = {str(task.id): task for task in tasks}
+        for key in [k for k in self._entries if k not in tasks]:
+            self.remove_task(key)
+        for task in tasks.values():
+            self.set_task(task, now)
+        # 失效条目过多时压缩堆，避免长期编辑后堆无限增长
+        if len(self._heap) > 2 * len(self._entries) + 64:
+            self._heap = [(ts, seq, key) for ts, seq, key in self._heap if self._is_valid(key, seq)]
+            heapq.heapify(self._heap)
+
+    def next_fire_time(self) -> Optional[float]:
+        """返回最早到期任务的时间戳，没有待触发任务时返回 None"""
+        while self._heap:
+            ts, seq, key = self._heap[0]
+            if self._is_valid(key, seq):
+                return ts
+            heapq.heappop(self._heap)
+        return None
+
+    def seconds_until_next(self) -> Optional[float]:
+        """按调度时钟计算距离最早到期任务的秒数，没有待触发任务时返回 None"""
+        next_ts = self.next_fire_time()
+        return None if next_ts is None else next_ts - self.clock.time()
+
+    def upcoming(self, until_ts: float) -> List[Tuple[float, Task]]:
+        """按触发时间顺序返回在 until_ts 之前到期的任务，只遍历堆中满足条件的部分"""
+        result = []
+        frontier = [(self._heap[0][0], 0)] if self._heap else []
+        while frontier:
+            ts, index = heapq.heappop(frontier)
+            if ts > until_ts:
+                break
+            _, seq, key = self._heap[index]
+            if self._is_valid(key, seq):
+                result.append((ts, self._entries[key][0]))
+            for child in (2 * index + 1, 2 * index + 2):
+                if child < len(self._heap):
+                    heapq.heappush(frontier, (self._heap[child][0], child))
+        return result
+
+    def pop_due(self, now: Optional[datetime.datetime] = None) -> List[FireRecord]:
+        """弹出自上次检查以来到期的所有任务，按补救策略决定触发或记为错过"""
+        now_ts = now.timestamp() if now else self.clock.time()
+        due = []
+        while self._heap and self._heap[0][0] <= now_ts:
+            ts, seq, key = heapq.heappop(self._heap)
+            if not self._is_valid(key, seq):
+                continue
+            record = self._decide(key, ts, now_ts)
+            if record.action != "fired":
+                self.fire_log.append(record)
+            if record.should_fire:
+                due.append(record)
+
+            task = self._entries[key][0]
+            next_ts = task.next_fire_after(datetime.datetime.fromtimestamp(ts + 1))
+            if next_ts is None:
+                del self._entries[key]
+            else:
+                self._push(key, task, next_ts)
+        return due
+
+    def _decide(self, key, scheduled_ts, now_ts) -> FireRecord:
+        """根据迟到时长和补救策略生成触发记录"""
+        lateness = max(now_ts - scheduled_ts, 0)
+        if lateness <= self.tolerance:
+            return FireRecord(key, scheduled_ts, now_ts, lateness, "fired")
+
+        if self.catch_up_policy == CATCH_UP_SKIP or lateness > self.max_lateness:
+            logging.warning(f"任务 {key} 错过触发，迟到 {lateness:.1f} 秒")
+            return FireRecord(key, scheduled_ts, now_ts, lateness, "missed")
+
+        if self.catch_up_policy == CATCH_UP_SEEK:
+            logging.warning(f"任务 {key} 迟到 {lateness:.1f} 秒，补播并向前定位")
+            return FireRecord(key, scheduled_ts, now_ts, lateness, "seek", offset=lateness)
+
+        logging.warning(f"任务 {key} 迟到 {lateness:.1f} 秒，补播")
+        return FireRecord(key, scheduled_ts, now_ts, lateness, "late")
+
+    def _push(self, key, task, fire_ts):
+        seq = next(self._counter)
+        self._entries[key] = (task, fire_ts, seq)
+        heapq.heappush(self._heap, (fire_ts, seq, key))
+
+    def _is_valid(self, key, seq) -> bool:
+        entry = self._entries.get(key)
+        return entry is not None and entry[2] == seq
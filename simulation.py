@@ -0,0 +1,304 @@
+import argparse
+import datetime
+import json
+import logging
+import random
+import time
+from collections import Counter
+from dataclasses import dataclass, asdict
+from typing import Callable, Dict, List, Optional, Tuple
+from constants import DEFAULT_CHANNEL, DEFAULT_MIX_POLICY, DEFAULT_PRIORITY, DEFAULT_BUSY_POLICY, MIX_PREEMPT, \
+    MIX_CHANNEL_POOL, BUSY_POLICIES, SIMULATION_AUDIO_SECONDS, WEEKDAYS
+from clock import SimulatedClock
+from play_queue import PlayQueue
+from scheduler import TaskScheduler, FireRecord, CATCH_UP_FIRE
+from task_engine import TaskEngine
+from task_model import Task
+
+
+class SimulatedPlayer:
+    """空音频后端：不输出声音，按音频时长在虚拟时钟上结束播放，接口与 PlayerCore 一致
+
+    暂停、音量和淡入淡出不影响虚拟时间，不做模拟。
+    """
+
+    prefetcher = None
+
+    def __init__(self, clock: SimulatedClock, duration_of: Optional[Callable[[str], float]] = None):
+        self.clock = clock
+        self.duration_of = duration_of or (lambda path: SIMULATION_AUDIO_SECONDS)
+        self.on_complete: Optional[Callable] = None
+        self.on_channel_complete: Optional[Callable[[str, str], None]] = None
+        self.on_queue_start: Optional[Callable] = None
+        self.on_queue_expired: Optional[Callable] = None
+        self.last_outcome: Optional[str] = None  # 最近一次播放请求的结果，供仿真记录
+        self._current: Optional[Tuple[str, float, int]] = None  # 主通道 (文件, 结束时间, 优先级)
+        self._channels: Dict[str, Tuple[str, float]] = {}  # 逻辑通道 -> (文件, 结束时间)
+        self._queue = PlayQueue(clock.monotonic)
+        self._events: List[tuple] = []
+        self._channel_stats = {"pool": MIX_CHANNEL_POOL, "in_use": 0, "peak": 0, "plays": 0, "rejected": 0}
+
+    @property
+    def current_sound(self) -> Optional[str]:
+        return self._current[0] if self._current else None
+
+    def play(self, file_path: str, volume: int = 100, force_switch: bool = False, start: float = 0,
+             channel: str = DEFAULT_CHANNEL, mix_policy: str = DEFAULT_MIX_POLICY) -> tuple[bool, float]:
+        duration = self.duration_of(file_path)
+        if channel == DEFAULT_CHANNEL:
+            self._start(file_path, duration, DEFAULT_PRIORITY, start)
+            self.last_outcome = "played"
+            return True, duration
+
+        stats = self._channel_stats
+        if channel not in self._channels and len(self._channels) >= MIX_CHANNEL_POOL:
+            stats["rejected"] += 1
+            self.last_outcome = "rejected"
+            return False, 0
+        if mix_policy == MIX_PREEMPT:
+            self.stop()
+        self._channels[channel] = (file_path, self.clock.time() + duration)
+        stats["plays"] += 1
+        stats["in_use"] = len(self._channels)
+        stats["peak"] = max(stats["peak"], stats["in_use"])
+        self.last_outcome = "played"
+        return True, duration
+
+    def submit(self, file_path: str, volume: int = 100, priority: int = DEFAULT_PRIORITY,
+               policy: str = DEFAULT_BUSY_POLICY, tag: Optional[str] = None, start: float = 0) -> tuple[str, float]:
+        outcome = "played"
+        if self._current:
+            outcome = self._queue.decide(file_path, priority, policy, self._current[0], self._current[2])
+            if outcome == "queued":
+                self._queue.push(file_path, volume, priority, tag)
+        duration = 0
+        if outcome == "played":
+            duration = self.duration_of(file_path)
+            self._start(file_path, duration, priority, start)
+        self.last_outcome = outcome
+        return outcome, duration
+
+    def stop_channel(self, channel: str):
+        self._channels.pop(channel, None)
+        self._channel_stats["in_use"] = len(self._channels)
+
+    def pause(self):
+        pass
+
+    def resume(self):
+        pass
+
+    def set_volume(self, volume: int):
+        pass
+
+    def stop(self):
+        self._current = None
+        self._queue.clear()
+
+    def channel_stats(self) -> dict:
+        return dict(self._channel_stats)
+
+    def queue_stats(self) -> dict:
+        return self._queue.snapshot()
+
+    def get_remaining(self) -> Optional[float]:
+        return max(self._current[1] - self.clock.time(), 0) if self._current else None
+
+    def next_event_time(self) -> Optional[float]:
+        """下一次播放结束的虚拟时间戳，没有正在播放的声音时返回 None"""
+        ends = [end for _, end in self._channels.values()]
+        if self._current:
+            ends.append(self._current[1])
+        return min(ends) if ends else None
+
+    def update(self):
+        """生成到当前虚拟时间为止的播放结束事件，主通道结束后播放队列中的下一项"""
+        now = self.clock.time()
+        for channel, (file_path, end) in list(self._channels.items()):
+            if end <= now:
+                self.stop_channel(channel)
+                self._events.append(("channel_complete", channel, file_path))
+        if not self._current or self._current[1] > now:
+            return
+        self._events.append(("complete", DEFAULT_CHANNEL, self._current[0]))
+        self._current = None
+        entry = self._queue.pop()
+        self._events.extend(("queue_expired", DEFAULT_CHANNEL, expired) for expired in self._queue.take_expired())
+        if entry:
+            self._start(entry.file_path, self.duration_of(entry.file_path), entry.priority, 0)
+            self._events.append(("queue_start", DEFAULT_CHANNEL, entry))
+
+    def poll_events(self) -> bool:
+        finished = False
+        events, self._events = self._events, []
+        for kind, channel, payload in events:
+            if kind == "complete":
+                finished = True
+                if self.on_complete:
+                    self.on_complete()
+            elif kind == "channel_complete" and self.on_channel_complete:
+                self.on_channel_complete(channel, payload)
+            elif kind == "queue_start" and self.on_queue_start:
+                self.on_queue_start(payload, True)
+            elif kind == "queue_expired" and self.on_queue_expired:
+                self.on_queue_expired(payload)
+        return finished
+
+    def _start(self, file_path, duration, priority, start):
+        start = start if 0 < start < duration else 0
+        self._current = (file_path, self.clock.time() + duration - start, priority)
+
+
+@dataclass
+class SimulatedFire:
+    """仿真中一次任务触发的记录"""
+    at: float  # 触发时的虚拟时间戳
+    task_id: str
+    scheduled: float  # 计划触发时间戳
+    lateness: float
+    action: str  # 调度器的处理: fired / late / seek
+    outcome: str  # 播放结果: played / queued / merged / dropped / failed / rejected / skipped
+
+    def to_dict(self) -> dict:
+        data = asdict(self)
+        data["at"] = datetime.datetime.fromtimestamp(self.at).isoformat(timespec="seconds")
+        data["scheduled"] = datetime.datetime.fromtimestamp(self.scheduled).isoformat(timespec="seconds")
+        return data
+
+
+class Simulation:
+    """在虚拟时间中驱动任务引擎：直接跳到下一个触发或播放结束时刻，不做真实等待"""
+
+    def __init__(self, tasks: List[Task], start: Optional[datetime.datetime] = None,
+                 duration_of: Optional[Callable[[str], float]] = None, catch_up_policy: str = CATCH_UP_FIRE):
+        self.clock = SimulatedClock(start)
+        self.player = SimulatedPlayer(self.clock, duration_of)
+        self.engine = TaskEngine(player=self.player, scheduler=TaskScheduler(catch_up_policy, clock=self.clock))
+        self.engine.check_files = False
+        self.engine.on_fire = self._on_fire
+        self.fire_log: List[SimulatedFire] = []
+        self.simulated_seconds = 0.0
+        self.wall_seconds = 0.0
+        self.engine.sync_tasks(tasks)
+
+    def run(self, seconds: float) -> List[SimulatedFire]:
+        """仿真指定秒数的虚拟时间，返回本次运行新增的触发记录"""
+        started, count = time.perf_counter(), len(self.fire_log)
+        until = self.clock.time() + seconds
+        while True:
+            candidates = [ts for ts in (self.engine.scheduler.next_fire_time(), self.player.next_event_time())
+                          if ts is not None]
+            target = min(candidates + [until])
+            self.clock.advance_to(target)
+            self.player.update()
+            self.player.poll_events()
+            self.engine.tick()
+            if target >= until:
+                break
+        self.simulated_seconds += seconds
+        self.wall_seconds += time.perf_counter() - started
+        return self.fire_log[count:]
+
+    def summary(self) -> dict:
+        status = self.engine.status()
+        return {
+            "tasks": status["tasks"],
+            "simulated_seconds": self.simulated_seconds,
+            "wall_seconds": round(self.wall_seconds, 3),
+            "speedup": round(self.simulated_seconds / self.wall_seconds) if self.wall_seconds else None,
+            "fires": len(self.fire_log),
+            "outcomes": dict(Counter(fire.outcome for fire in self.fire_log)),
+            "late_or_missed": status["late_or_missed"],
+            "clock_jumps": status["clock_jumps"],
+            "queue": self.player.queue_stats(),
+            "channels": self.player.channel_stats(),
+            "latency": {stage: {key: value for key, value in histogram.items() if key != "buckets"}
+                        for stage, histogram in self.engine.metrics.snapshot()["stages"].items()},
+        }
+
+    def write_log(self, path: str):
+        """把触发记录按 JSON Lines 写入文件"""
+        with open(path, "w", encoding="utf-8") as f:
+            for fire in self.fire_log:
+                f.write(json.dumps(fire.to_dict(), ensure_ascii=False) + "\n")
+
+    def _on_fire(self, record: FireRecord):
+        self.player.last_outcome = None
+        self.engine.fire_task(record)
+        self.fire_log.append(SimulatedFire(record.fired_at, record.task_id, record.scheduled, record.lateness,
+                                           record.action, self.player.last_outcome or "skipped"))
+
+
+def generate_tasks(count: int, seed: int = 0, start: Optional[datetime.datetime] = None,
+                   days: int = 7) -> Tuple[List[Task], Dict[str, float]]:
+    """生成随机任务和各任务音频的时长：大部分按星期重复，其余为仿真期间的单次任务"""
+    rng = random.Random(seed)
+    start = start or datetime.datetime.now()
+    tasks, durations = [], {}
+    for i in range(count):
+        begin = rng.randrange(24 * 3600)
+        length = rng.randint(10, 600)
+        if rng.random() < 0.8:
+            schedule = ",".join(sorted(rng.sample(WEEKDAYS, rng.randint(1, 7)), key=WEEKDAYS.index))
+        else:
+            schedule = (start + datetime.timedelta(days=rng.randrange(days))).strftime("%Y-%m-%d")
+        path = f"simulated/{i}.mp3"
+        durations[path] = length
+        tasks.append(Task(
+            id=str(i + 1),
+            name=f"仿真任务{i + 1}",
+            start_time=_format_seconds(begin),
+            end_time=_format_seconds(min(begin + length, 24 * 3600 - 1)),
+            volume=rng.randint(10, 100),
+            schedule=schedule,
+            audio_path=path,
+            priority=rng.randint(-2, 2),
+            busy_policy=rng.choice(BUSY_POLICIES)))
+    return tasks, durations
+
+
+def task_span_durations(tasks: List[Task]) -> Dict[str, float]:
+    """真实任务的音频在仿真环境中未必存在，以任务的开始到结束时间作为时长"""
+    durations = {}
+    for task in tasks:
+        if task.start_seconds is not None and task.end_seconds is not None and task.end_seconds > task.start_seconds:
+            durations[task.audio_path] = task.end_seconds - task.start_seconds
+    return durations
+
+
+def _format_seconds(seconds: int) -> str:
+    return f"{seconds // 3600:02d}:{seconds // 60 % 60:02d}:{seconds % 60:02d}"
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="任务调度仿真：在虚拟时间中运行调度和播放，输出触发记录")
+    parser.add_argument("--tasks", type=int, default=10000, help="随机生成的任务数量")
+    parser.add_argument("--task-file", help="使用任务文件中的任务代替随机任务")
+    parser.add_argument("--days", type=float, default=7, help="仿真的天数")
+    parser.add_argument("--seed", type=int, default=0, help="随机任务的种子")
+    parser.add_argument("--start", help="仿真开始时间，格式 YYYY-MM-DD HH:MM:SS，默认为当前时间")
+    parser.add_argument("--log", help="触发记录输出文件(JSON Lines)")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    start = datetime.datetime.strptime(args.start, "%Y-%m-%d %H:%M:%S") if args.start else None
+    if args.task_file:
+        from task_storage import create_storage
+        storage = create_storage(args.task_file)
+        tasks = storage.load_all()
+        storage.close()
+        durations = task_span_durations(tasks)
+    else:
+        tasks, durations = generate_tasks(args.tasks, args.seed, start, int(args.days) + 1)
+    simulation = Simulation(tasks, start, lambda path: durations.get(path, SIMULATION_AUDIO_SECONDS))
+    simulation.run(args.days * 24 * 3600)
+    if args.log:
+        simulation.write_log(args.log)
+    print(json.dumps(simulation.summary(), ensure_ascii=False, indent=2))
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.WARNING, format='%(asctime)s - %(levelname)s - %(message)s')
+    main()
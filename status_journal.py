@@ -0,0 +1,123 @@
+import datetime
+import json
+import logging
+import os
+import threading
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+from constants import STATUS_FLUSH_THRESHOLD
+from file_utils import serialize_tasks, atomic_write_bytes, is_own_write
+
+
+class StatusJournal:
+    """任务状态日志：状态变化先保存在内存并追加到小日志文件，再批量合并到任务文件"""
+
+    def __init__(self, task_file_path: str, journal_path: Optional[str] = None,
+                 flush_threshold: int = STATUS_FLUSH_THRESHOLD):
+        self.task_file_path = task_file_path
+        self.journal_path = journal_path or f"{task_file_path}.journal"
+        self.flush_threshold = flush_threshold
+        self.pending: Dict[str, str] = {}  # 任务ID -> 尚未写入任务文件的状态
+        # 返回内存中全部任务(含最新状态)的函数，设置后合并时不再读回任务文件(任务文件被外部修改时除外)
+        self.snapshot: Optional[Callable[[], List[dict]]] = None
+        self._lock = threading.Lock()
+
+    @property
+    def dirty_count(self) -> int:
+        return len(self.pending)
+
+    def record(self, task_id, status: str) -> bool:
+        """记录一次状态变化，超过脏数据阈值时自动合并到任务文件"""
+        return self.record_many([(task_id, status)])
+
+    def record_many(self, changes: Iterable[Tuple[object, str]]) -> bool:
+        """记录一批状态变化(任务ID, 状态)，只追加写入日志并同步一次，超过脏数据阈值时自动合并到任务文件"""
+        changes = [(str(task_id), status) for task_id, status in changes]
+        if not changes:
+            return True
+        try:
+            with self._lock:
+                now = datetime.datetime.now().isoformat(timespec="seconds")
+                lines = "".join(json.dumps({"id": task_id, "status": status, "time": now}, ensure_ascii=False) + "\n"
+                                for task_id, status in changes)
+                with open(self.journal_path, "a", encoding="utf-8") as f:
+                    f.write(lines)
+                    f.flush()
+                    os.fsync(f.fileno())
+                self.pending.update(changes)
+                should_flush = len(self.pending) >= self.flush_threshold
+        except OSError as e:
+            logging.error(f"写入状态日志失败: {e}")
+            return False
+
+        if should_flush:
+            return self.flush()
+        return True
+
+    def get_status(self, task_id) -> Optional[str]:
+        """返回尚未合并的最新状态"""
+        return self.pending.get(str(task_id))
+
+    def flush(self, reread: bool = False) -> bool:
+        """将内存中的状态变化一次性合并到任务文件，并清空日志
+
+        reread 为 True 时忽略内存快照，读回任务文件合并(回放时内存中的任务尚未加载)。
+        """
+        with self._lock:
+            if not self.pending:
+                return True
+            try:
+                tasks = []
+                # 任务文件在本进程上次写入后被外部修改时读回文件合并，避免用内存快照覆盖外部修改
+                if self.snapshot is not None and not reread and is_own_write(self.task_file_path):
+                    tasks = self.snapshot()
+                elif os.path.exists(self.task_file_path):
+                    with open(self.task_file_path, "r", encoding="utf-8") as f:
+                        loaded_tasks = json.load(f)
+                        tasks = loaded_tasks if isinstance(loaded_tasks, list) else []
+
+                for task in tasks:
+                    if isinstance(task, dict) and str(task.get("id")) in self.pending:
+                        task["status"] = self.pending[str(task["id"])]
+
+                atomic_write_bytes(self.task_file_path, serialize_tasks(tasks))
+                self._truncate()
+                self.pending.clear()
+                return True
+            except (IOError, json.JSONDecodeError) as e:
+                logging.error(f"合并任务状态失败: {e}")
+                return False
+
+    def discard(self):
+        """任务文件刚以完整快照写入时调用：快照已包含所有状态，日志不再需要"""
+        with self._lock:
+            self.pending.clear()
+            self._truncate()
+
+    def replay(self) -> int:
+        """崩溃恢复：读取上次未合并的日志并写入任务文件，返回恢复的条目数"""
+        if not os.path.exists(self.journal_path):
+            return 0
+        count = 0
+        with self._lock:
+            try:
+                with open(self.journal_path, "r", encoding="utf-8") as f:
+                    for line in f:
+                        try:
+                            entry = json.loads(line)
+                            self.pending[str(entry["id"])] = entry["status"]
+                            count += 1
+                        except (json.JSONDecodeError, KeyError, TypeError):
+                            # 崩溃时最后一行可能只写了一半
+                            logging.warning(f"跳过损坏的状态日志行: {line.strip()}")
+            except IOError as e:
+                logging.error(f"读取状态日志失败: {e}")
+                return 0
+        if count:
+            logging.info(f"从状态日志恢复 {count} 条状态变化")
+        self.flush(reread=True)
+        return count
+
+    def _truncate(self):
+        if os.path.exists(self.journal_path):
+            with open(self.journal_path, "w", encoding="utf-8"):
+                pass
@@ -0,0 +1,559 @@
+import datetime
+import logging
+import os
+import signal
+import threading
+import time
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+from constants import SCHEDULER_MAX_SLEEP_MS, CATCH_UP_POLICY, CATCH_UP_MAX_LATENESS, STATUS_FLUSH_INTERVAL_MS, PREFETCH_LOOKAHEAD_SECONDS, \
+    PLAYER_EVENT_POLL_MS, DEFAULT_CHANNEL, MIX_PREEMPT, METRICS_EXPORT_INTERVAL_MS, FIRE_BUSY_TIMEOUT, TASK_FILE_POLL_MS
+from config_manager import get_config_value
+from clock import Clock
+from metrics import FireMetrics, FireTiming
+from scheduler import TaskScheduler, FireRecord
+from status_journal import StatusJournal
+from task_model import Task, seconds_of_day
+from task_file_watcher import TaskFileWatcher
+from task_repository import TaskRepository, TaskChange
+from task_service import TaskService, create_task_service
+
+
+class TaskEngine:
+    """任务引擎：组合任务存储、调度器和播放核心，不依赖 Tk，可单独以无界面模式运行"""
+
+    def __init__(self, service: Optional[TaskService] = None, player=None,
+                 scheduler: Optional[TaskScheduler] = None, journal: Optional[StatusJournal] = None,
+                 clock: Optional[Clock] = None):
+        self.service = service
+        self.player = player
+        self.journal = journal  # 设置后状态变化写入日志，批量合并到任务文件
+        # 调度器定义了 __len__，空调度器为假值，需显式判断 None
+        self.scheduler = scheduler if scheduler is not None else TaskScheduler(
+            catch_up_policy=get_config_value("catch_up_policy", CATCH_UP_POLICY),
+            max_lateness=get_config_value("catch_up_max_lateness", CATCH_UP_MAX_LATENESS), clock=clock)
+        self.clock = self.scheduler.clock
+        # 到期任务的处理回调，仿真时包装 fire_task 以记录结果
+        self.on_fire: Callable[[FireRecord], None] = self.fire_task
+        self.check_files = True  # 触发前检查音频文件是否存在，仿真时关闭
+        self.tasks: Dict[str, Task] = {}
+        self.current_task: Optional[Task] = None  # 主通道正在播放(或已暂停)的任务
+        self.paused = False  # 主通道任务是否已暂停
+        self.channel_tasks: Dict[str, Task] = {}  # 其他通道正在播放的任务
+        self.queued_tasks: Dict[str, Task] = {}  # 在主通道播放队列中等待的任务
+        self._pending_submits: Dict[str, Tuple[Task, FireRecord]] = {}  # 音频线程尚未返回结果的到期任务
+        self.fired_count = 0
+        self.last_date = None
+        self.metrics = FireMetrics()
+        self._pending_timing: Optional[Tuple[FireTiming, float]] = None  # 等待确认出声的主通道触发 (时间, 返回时的单调时钟)
+        self._lock = threading.RLock()
+        self.repository: Optional[TaskRepository] = None
+        self.file_watcher: Optional[TaskFileWatcher] = None  # 设置后运行循环定期检查任务文件的外部修改
+        if service:
+            self.attach_repository(service.repository)
+        if player:
+            self._bind_player()
+
+    def _bind_player(self):
+        """播放核心的事件都由引擎处理并修改任务状态，界面只根据任务仓库的状态变化重绘"""
+        self.player.on_complete = self._on_playback_complete
+        self.player.on_channel_complete = self._on_channel_complete
+        self.player.on_queue_start = self._on_queue_start
+        self.player.on_queue_expired = self._on_queue_expired
+        self.player.on_late_result = self._on_late_result
+
+    def attach_repository(self, repository: TaskRepository):
+        """订阅任务仓库，按变化增量更新调度器；任务状态也通过仓库修改"""
+        if self.repository is not None:
+            self.repository.unsubscribe(self._on_repository_change)
+        self.repository = repository
+        repository.subscribe(self._on_repository_change)
+        self.sync_tasks(repository.tasks())
+
+    def _on_repository_change(self, change: TaskChange):
+        if change.reset:
+            self.sync_tasks(self.repository.tasks())
+            return
+        if change.status_only:
+            # 状态只影响触发时的判断，无需重新调度
+            return
+        with self._lock:
+            for task_id in change.removed:
+                self.tasks.pop(task_id, None)
+                self.scheduler.remove_task(task_id)
+            for task_id in change.added | change.updated | change.status:
+                task = self.repository.get(task_id)
+                if task:
+                    self.tasks[task_id] = task
+                    self.scheduler.set_task(task)
+        self.prefetch_upcoming()
+
+    def load_tasks(self) -> int:
+        """从任务存储加载任务并编译调度"""
+        if not self.service:
+            return 0
+        with self._lock:
+            if self.journal:
+                self.journal.replay()
+            # 仓库整体替换后通过变化通知同步调度器
+            self.service.load_tasks()
+            return len(self.service.tasks)
+
+    def watch_task_file(self, path: str):
+        """监视 JSON 任务文件，被其他程序修改后增量重新加载"""
+        self.file_watcher = TaskFileWatcher(path)
+
+    def check_task_file(self) -> Optional[TaskChange]:
+        """任务文件被外部修改时只把新增、删除和修改的任务应用到任务仓库，返回应用的变化
+
+        已有任务保留内存中的状态(包括正在播放的任务)，文件中的状态只用于新任务；重新加载的内容不写回任务文件。
+        """
+        if not self.file_watcher or self.repository is None:
+            return None
+        data = self.file_watcher.check()
+        if data is None:
+            return None
+        tasks = []
+        for item in data:
+            try:
+                task = Task.from_dict(item)
+            except (KeyError, TypeError, ValueError) as e:
+                logging.warning(f"跳过无效任务: {item} ({e})")
+                continue
+            current = self.repository.get(task.id)
+            if current:
+                task.status = current.status
+            tasks.append(task)
+        with self._lock:
+            change = self.repository.sync(tasks, persist=False)
+        logging.info(f"任务文件重新加载：新增 {len(change.added)} 个，修改 {len(change.updated)} 个，删除 {len(change.removed)} 个")
+        return change
+
+    def sync_tasks(self, tasks: Iterable[Task]):
+        """同步任务到调度器，仅重建有变化的条目"""
+        with self._lock:
+            self.tasks = {str(task.id): task for task in tasks}
+            self.scheduler.sync(self.tasks.values())
+        self.prefetch_upcoming()
+
+    def get_task(self, task_id) -> Optional[Task]:
+        return self.tasks.get(str(task_id))
+
+    def tick(self, now: Optional[datetime.datetime] = None) -> List[FireRecord]:
+        """处理所有已到期的任务，返回需要触发的记录"""
+        now = now or self.clock.now()
+        with self._lock:
+            self._check_new_day(now)
+            due = self.scheduler.pop_due(now)
+        for record in due:
+            try:
+                self.on_fire(record)
+                self.fired_count += 1
+            except Exception as e:
+                logging.error(f"任务 {record.task_id} 触发失败: {e}")
+        self.prefetch_upcoming(now)
+        return due
+
+    def prefetch_upcoming(self, now: Optional[datetime.datetime] = None):
+        """把即将到期任务的音频交给播放核心的预加载器在后台读入内存"""
+        prefetcher = getattr(self.player, "prefetcher", None)
+        if not prefetcher:
+            return
+        until = (now.timestamp() if now else self.clock.time()) + PREFETCH_LOOKAHEAD_SECONDS
+        with self._lock:
+            upcoming = self.scheduler.upcoming(until)
+        prefetcher.request(task.audio_path for _, task in upcoming
+                           if not task.is_paused and not task.is_paused_today)
+
+    def next_delay(self) -> float:
+        """按单调时钟计算距离下一个到期任务的秒数，上限为调度器最长休眠时间"""
+        max_sleep = SCHEDULER_MAX_SLEEP_MS / 1000
+        delay = self.scheduler.seconds_until_next()
+        if delay is None:
+            return max_sleep
+        return min(max(delay, 0), max_sleep)
+
+    def check_clock(self) -> float:
+        """检查系统时间是否跳变，返回跳变秒数；调用方据此重新设置定时器"""
+        return self.clock.check()
+
+    def fire_task(self, record: FireRecord):
+        """到期任务的触发逻辑：界面和无界面模式都由它交给播放核心播放"""
+        task = self.get_task(record.task_id)
+        if not task or task.is_paused or task.is_paused_today:
+            return
+        if self.check_files and not os.path.exists(task.audio_path):
+            logging.warning(f"任务 '{task.name}' 音频文件不存在: {task.audio_path}")
+            self._set_status(task, "文件丢失")
+            return
+        if not self.player:
+            return
+        if task.channel != DEFAULT_CHANNEL:
+            self._fire_on_channel(task, record)
+            return
+
+        outcome, duration = self.submit_task(task, record)
+        self._apply_submit(task, record, outcome, duration)
+
+    def _apply_submit(self, task: Task, record: FireRecord, outcome: str, duration: float):
+        """按主通道的处理结果更新任务状态"""
+        if outcome == "pending":
+            logging.info(f"任务 '{task.name}' 已提交，等待音频线程返回播放结果")
+        elif outcome == "failed":
+            self._set_status(task, "播放失败")
+        elif outcome == "queued":
+            self.queued_tasks[str(task.id)] = task
+            self._set_status(task, "排队中")
+            logging.info(f"任务 '{task.name}' 已加入播放队列 (优先级 {task.priority})")
+        elif outcome == "played":
+            if self.current_task and self.current_task is not task:
+                self._set_status(self.current_task, "等待播放")
+            self.current_task = task
+            self.paused = False
+            self._set_status(task, "正在播放")
+            logging.info(f"开始播放任务 '{task.name}' (时长 {duration:.0f} 秒, 迟到 {record.lateness:.1f} 秒)")
+        else:
+            logging.info(f"任务 '{task.name}' 到期时主通道正在播放，按策略 {task.busy_policy} 未播放 ({outcome})")
+
+    def submit_task(self, task: Task, record: FireRecord) -> Tuple[str, float]:
+        """把到期任务交给主通道，并记录触发延迟
+
+        结果为 pending 时音频线程稍后以 late_result 事件返回结果，由 late_submit_result 取回任务。
+        """
+        outcome, duration = self.player.submit(task.audio_path, task.volume, priority=task.priority,
+                                               policy=task.busy_policy, tag=str(task.id), start=record.offset)
+        if outcome == "played":
+            self._begin_timing(task, record)
+        elif outcome == "pending":
+            self._pending_submits[str(task.id)] = (task, record)
+        return outcome, duration
+
+    def late_submit_result(self, tag, outcome: str) -> Optional[Tuple[Task, FireRecord]]:
+        """取回等待结果的到期任务，播放成功时开始记录触发延迟"""
+        pending = self._pending_submits.pop(str(tag), None)
+        if pending and outcome == "played":
+            self._begin_timing(*pending)
+        return pending
+
+    def play_on_channel(self, task: Task, record: FireRecord) -> Tuple[bool, float]:
+        """在任务的混音通道播放到期任务并记录触发延迟，混音通道无法得知出声时间，只记录到播放调用返回"""
+        success, duration = self.player.play(task.audio_path, task.volume, channel=task.channel,
+                                             mix_policy=task.mix_policy)
+        if success:
+            self.metrics.record(FireTiming(str(task.id), record.scheduled, record.fired_at, self.clock.time()))
+        return success, duration
+
+    def poll_metrics(self) -> bool:
+        """音频线程确认主通道开始出声后补全触发记录，返回是否记录了新的触发
+
+        曲目已被替换或等待超时则不计出声时间。
+        """
+        pending = self._pending_timing
+        if not pending:
+            return False
+        timing, returned_at = pending
+        state = getattr(self.player, "state", None)
+        playing = state is not None and state.tag == timing.task_id
+        busy_at = state.busy_at if playing else None
+        if playing and busy_at is None and time.monotonic() - returned_at < FIRE_BUSY_TIMEOUT:
+            return False
+        if busy_at is not None:
+            # 出声时间是音频线程的单调时钟，按与返回时刻的差值换算到调度时钟
+            timing.busy = timing.returned + busy_at - returned_at
+        self._pending_timing = None
+        self.metrics.record(timing)
+        return True
+
+    def export_metrics(self) -> bool:
+        self.poll_metrics()
+        return self.metrics.export()
+
+    def _begin_timing(self, task: Task, record: FireRecord):
+        if self._pending_timing:
+            # 上一个触发尚未确认出声就被新任务替换
+            self.metrics.record(self._pending_timing[0])
+        returned = self.clock.time()
+        self._pending_timing = (FireTiming(str(task.id), record.scheduled, record.fired_at, returned), time.monotonic())
+        self.poll_metrics()
+
+    def _fire_on_channel(self, task: Task, record: FireRecord):
+        """在非主通道播放任务，按任务的混音策略决定是否停止主通道"""
+        if task.mix_policy == MIX_PREEMPT and self.current_task:
+            self.stop_main()
+        previous = self.channel_tasks.get(task.channel)
+        if previous and previous is not task:
+            self._set_status(previous, "等待播放")
+
+        success, duration = self.play_on_channel(task, record)
+        if success is False:
+            self._set_status(task, "播放失败")
+            return
+        # success 为 None 时音频线程尚未返回，按已开始播放处理，失败时由 late_result 事件更正
+        self.channel_tasks[task.channel] = task
+        self._set_status(task, "正在播放")
+        logging.info(f"在通道 {task.channel} 播放任务 '{task.name}' (策略 {task.mix_policy}, 时长 {duration:.0f} 秒)")
+
+    def play_task(self, task: Task, force_switch: bool = False, start: float = 0) -> Tuple[Optional[bool], float]:
+        """手动在主通道播放任务(界面中的播放按钮)，返回 (是否成功, 时长)
+
+        音频线程未及时返回时结果为 (None, 0)，按已开始播放处理，失败时由 late_result 事件更正。
+        """
+        with self._lock:
+            if self.check_files and not os.path.exists(task.audio_path):
+                self._set_status(task, "文件丢失")
+                return False, 0
+            success, duration = self.player.play(task.audio_path, task.volume, force_switch=force_switch, start=start)
+            if success is False:
+                self._set_status(task, "播放失败")
+                return False, 0
+            if self.current_task and self.current_task is not task:
+                self._set_status(self.current_task, "等待播放")
+            self.current_task = task
+            self.paused = False
+            self._set_status(task, "正在播放")
+            return success, duration
+
+    def pause(self):
+        """暂停主通道正在播放的任务"""
+        with self._lock:
+            if self.current_task and not self.paused:
+                self.player.pause()
+                self.paused = True
+                self._set_status(self.current_task, "已暂停")
+
+    def resume(self):
+        """恢复主通道已暂停的任务"""
+        with self._lock:
+            if self.current_task and self.paused:
+                self.player.resume()
+                self.paused = False
+                self._set_status(self.current_task, "正在播放")
+
+    def stop_main(self):
+        """停止主通道并清空播放队列：播放中的任务在结束时间之前停止时恢复等待，之后视为已播放"""
+        with self._lock:
+            if self.player:
+                self.player.stop()
+            task, self.current_task, self.paused = self.current_task, None, False
+            if task:
+                ended = task.end_seconds is not None and seconds_of_day(self.clock.now()) >= task.end_seconds
+                self._set_status(task, "已播放" if ended else "等待播放")
+            self._reset_queued()
+
+    def stop(self):
+        """停止当前播放"""
+        self.stop_main()
+        for channel, task in list(self.channel_tasks.items()):
+            if self.player:
+                self.player.stop_channel(channel)
+            self._set_status(task, "等待播放")
+        self.channel_tasks.clear()
+        if self.journal:
+            self.journal.flush()
+
+    def status(self) -> dict:
+        """引擎状态快照，用于控制台或日志输出"""
+        next_ts = self.scheduler.next_fire_time()
+        channels = self.player.channel_stats() if self.player else {}
+        queue_stats = self.player.queue_stats() if self.player else {}
+        return {
+            "tasks": len(self.tasks),
+            "scheduled": len(self.scheduler),
+            "next_fire": datetime.datetime.fromtimestamp(next_ts).strftime("%Y-%m-%d %H:%M:%S") if next_ts else None,
+            "playing": self.current_task.name if self.current_task else None,
+            "fired": self.fired_count,
+            "late_or_missed": len(self.scheduler.fire_log),
+            "clock_jumps": len(self.clock.jumps),
+            "channels_in_use": channels.get("in_use", 0),
+            "channel_pool": channels.get("pool", 0),
+            "channels_peak": channels.get("peak", 0),
+            "queue_depth": queue_stats.get("depth", 0),
+            "queue_wait_avg": queue_stats.get("wait_avg", 0),
+            "queue_wait_max": queue_stats.get("wait_max", 0),
+            "latency": self.metrics.format_summary(),
+        }
+
+    def format_status(self) -> str:
+        status = self.status()
+        return (f"任务 {status['tasks']} 个, 已调度 {status['scheduled']} 个, "
+                f"下次触发 {status['next_fire'] or '无'}, 正在播放 {status['playing'] or '无'}, "
+                f"已触发 {status['fired']} 次, 迟到/错过 {status['late_or_missed']} 次, 时间跳变 {status['clock_jumps']} 次, "
+                f"混音通道 {status['channels_in_use']}/{status['channel_pool']} (峰值 {status['channels_peak']}), "
+                f"播放队列 {status['queue_depth']} 个 (平均等待 {status['queue_wait_avg']:.1f} 秒, "
+                f"最长 {status['queue_wait_max']:.1f} 秒), {status['latency']}")
+
+    def run(self, stop_event: threading.Event, status_interval: float = 60):
+        """在当前线程运行调度循环，直到 stop_event 被设置"""
+        logging.info(self.format_status())
+        next_status = time.monotonic() + status_interval
+        flush_interval = STATUS_FLUSH_INTERVAL_MS / 1000
+        next_flush = time.monotonic() + flush_interval
+        export_interval = METRICS_EXPORT_INTERVAL_MS / 1000
+        next_export = time.monotonic() + export_interval
+        watch_interval = TASK_FILE_POLL_MS / 1000
+        next_watch = time.monotonic() + watch_interval
+        while not stop_event.is_set():
+            if self.player:
+                self.player.poll_events()
+                self.poll_metrics()
+            self.tick()
+            if status_interval and time.monotonic() >= next_status:
+                logging.info(self.format_status())
+                next_status = time.monotonic() + status_interval
+            if self.journal and time.monotonic() >= next_flush:
+                self.journal.flush()
+                next_flush = time.monotonic() + flush_interval
+            if time.monotonic() >= next_export:
+                self.export_metrics()
+                next_export = time.monotonic() + export_interval
+            if self.file_watcher and time.monotonic() >= next_watch:
+                self.check_task_file()
+                next_watch = time.monotonic() + watch_interval
+            timeout = min(self.next_delay(), max(next_flush - time.monotonic(), 0), max(next_export - time.monotonic(), 0))
+            if self.file_watcher:
+                timeout = min(timeout, max(next_watch - time.monotonic(), 0))
+            if self._pending_timing:
+                timeout = min(timeout, PLAYER_EVENT_POLL_MS / 1000)
+            if status_interval:
+                timeout = min(timeout, max(next_status - time.monotonic(), 0))
+            poll_interval = PLAYER_EVENT_POLL_MS / 1000
+            if self.player and self.current_task:
+                # 播放中按剩余时长唤醒处理结束事件，时长未知时定期检查
+                remaining = self.player.get_remaining()
+                timeout = min(timeout, poll_interval if remaining is None else max(remaining, poll_interval))
+            if self.channel_tasks:
+                timeout = min(timeout, poll_interval)
+            stop_event.wait(timeout)
+
+    def _check_new_day(self, now: datetime.datetime):
+        """进入新的一天时重置 'Pause today' 状态，系统时间回拨到前一天时不重置"""
+        current_date = now.date()
+        if self.last_date is not None and current_date <= self.last_date:
+            return
+        self.last_date = current_date
+        self._set_statuses([task for task in self.tasks.values() if task.is_paused_today], "等待播放")
+
+    def _on_playback_complete(self):
+        with self._lock:
+            self.paused = False
+            if self.current_task:
+                self._set_status(self.current_task, "已播放")
+                self.current_task = None
+
+    def _reset_queued(self):
+        """停止主通道会清空播放队列，排队中的任务恢复等待状态"""
+        for task in self.queued_tasks.values():
+            self._set_status(task, "等待播放")
+        self.queued_tasks.clear()
+
+    def _on_queue_start(self, entry, success: bool):
+        """播放队列中的任务轮到播放"""
+        with self._lock:
+            task = self.queued_tasks.pop(str(entry.tag), None)
+            if not task:
+                return
+            if success:
+                self.current_task = task
+                self.paused = False
+                self._set_status(task, "正在播放")
+            else:
+                self._set_status(task, "播放失败")
+
+    def _on_late_result(self, command: str, channel: str, key, outcome: str, duration: float):
+        """超时后才完成的播放命令"""
+        with self._lock:
+            if command == "submit":
+                pending = self.late_submit_result(key, outcome)
+                if pending:
+                    self._apply_submit(pending[0], pending[1], outcome, duration)
+            elif command == "play_channel" and outcome == "failed":
+                task = self.channel_tasks.pop(channel, None)
+                if task:
+                    self._set_status(task, "播放失败")
+            elif command == "play" and outcome == "failed" and self.current_task \
+                    and self.current_task.audio_path == key:
+                # 手动播放的结果超时后才返回
+                self._set_status(self.current_task, "播放失败")
+                self.current_task = None
+                self.paused = False
+
+    def _on_queue_expired(self, entry):
+        """排队等待过久被丢弃的任务恢复等待状态"""
+        with self._lock:
+            task = self.queued_tasks.pop(str(entry.tag), None)
+            if task:
+                logging.warning(f"任务 '{task.name}' 排队等待过久，已放弃本次播放")
+                self._set_status(task, "等待播放")
+
+    def _on_channel_complete(self, channel: str, file_path: str):
+        with self._lock:
+            task = self.channel_tasks.pop(channel, None)
+            if task:
+                self._set_status(task, "已播放")
+
+    def _set_status(self, task: Task, status: str):
+        with self._lock:
+            if self.repository is not None and str(task.id) in self.repository:
+                # 由仓库通知界面和持久化订阅者
+                self.repository.set_status(task.id, status)
+                task.status = status
+                return
+            task.status = status
+            if self.journal:
+                self.journal.record(task.id, status)
+            elif self.service:
+                self.service.update_status(task.id, status)
+
+    def _set_statuses(self, tasks: List[Task], status: str):
+        """批量修改状态：仓库中的修改合并为一次通知，状态日志只追加写入并同步一次"""
+        if not tasks:
+            return
+        with self._lock:
+            if self.repository is not None:
+                with self.repository.batch():
+                    for task in tasks:
+                        self._set_status(task, status)
+                return
+            for task in tasks:
+                task.status = status
+            if self.journal:
+                self.journal.record_many((task.id, status) for task in tasks)
+            elif self.service:
+                for task in tasks:
+                    self.service.update_status(task.id, status)
+
+
+def run_headless(task_file_path: Optional[str] = None, status_interval: float = 60, audio_backend: Optional[str] = None):
+    """无界面模式入口：加载任务，运行调度循环，收到退出信号后停止播放
+
+    audio_backend 为 null 时不访问声音设备，可在无声卡的服务器上压测和分析性能。
+    """
+    from audio_backend import create_backend
+    from player_core import PlayerCore
+
+    # SQLite 后端直接更新单行，JSON 后端通过任务服务的状态日志批量写入
+    service = create_task_service(task_file_path)
+    player = PlayerCore(create_backend(audio_backend))
+    engine = TaskEngine(service=service, player=player, journal=service.journal)
+    count = engine.load_tasks()
+    if not service.storage.row_updates:
+        # 其他程序修改 JSON 任务文件后增量重新加载
+        engine.watch_task_file(service.task_file_path)
+    logging.info(f"无界面模式已启动，任务存储: {service.task_file_path}，音频后端: {player.backend.name}，已加载 {count} 个任务")
+
+    stop_event = threading.Event()
+
+    def handle_signal(signum, frame):
+        logging.info(f"收到退出信号 {signum}，正在停止")
+        stop_event.set()
+
+    signal.signal(signal.SIGINT, handle_signal)
+    signal.signal(signal.SIGTERM, handle_signal)
+    try:
+        engine.run(stop_event, status_interval)
+    finally:
+        engine.stop()
+        engine.export_metrics()
+        # 状态中包含播放核心的队列和通道统计，需在音频线程停止前读取
+        logging.info(engine.format_status())
+        player.shutdown()
+        service.storage.close()
@@ -0,0 +1,78 @@
+import json
+import logging
+import os
+from typing import List, Optional, Tuple
+from file_utils import content_digest, is_own_write, saved_digest
+
+
+class TaskFileWatcher:
+    """轮询任务文件是否被其他程序修改
+
+    每次检查只读取文件状态(大小和修改时间)，状态变化后才读取内容并比较摘要。
+    本进程自己写入的文件(file_utils 记录的写入状态)和只改了修改时间的文件不视为变化。
+
+    只使用轮询，不接入 inotify 等系统文件通知：程序主要运行在 Windows 上，inotify 只在 Linux 可用；
+    任务文件以原子替换方式写入，通知需监视整个目录并处理重命名；而两次检查之间只有一次 stat，
+    开销可以忽略，检查间隔(TASK_FILE_POLL_MS)也足以满足手工编辑任务文件的场景。
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._signature: Optional[Tuple[int, int]] = None  # 最近一次看到的 (大小, 修改时间)
+        self._digest: Optional[str] = None  # 最近一次读取的内容摘要
+        self.mark()
+
+    def watch(self, path: str):
+        """改为监视另一个任务文件(如导入后切换了当前任务文件)"""
+        self.path = path
+        self.mark()
+
+    def mark(self):
+        """把文件的当前内容记为已加载，刚读取或写入任务文件后调用"""
+        self._signature = self._stat()
+        data = self._read()
+        self._digest = content_digest(data) if data is not None else None
+
+    def check(self) -> Optional[List[dict]]:
+        """文件内容被外部修改时返回解析后的任务字典列表，否则返回 None"""
+        signature = self._stat()
+        if signature is None or signature == self._signature:
+            return None
+        self._signature = signature
+        if is_own_write(self.path):
+            self._digest = saved_digest(self.path)
+            return None
+
+        data = self._read()
+        if data is None:
+            return None
+        digest = content_digest(data)
+        if digest == self._digest:
+            return None
+        try:
+            tasks = json.loads(data.decode("utf-8"))
+        except (UnicodeDecodeError, json.JSONDecodeError) as e:
+            # 其他程序可能正在写入，等文件再次变化后重试
+            logging.warning(f"任务文件 {self.path} 格式错误，暂不重新加载: {e}")
+            return None
+        if not isinstance(tasks, list):
+            logging.warning(f"任务文件 {self.path} 格式错误：期望JSON数组")
+            return None
+        self._digest = digest
+        logging.info(f"检测到任务文件 {self.path} 被外部修改")
+        return tasks
+
+    def _stat(self) -> Optional[Tuple[int, int]]:
+        try:
+            stat = os.stat(self.path)
+        except OSError:
+            return None
+        return stat.st_size, stat.st_mtime_ns
+
+    def _read(self) -> Optional[bytes]:
+        try:
+            with open(self.path, "rb") as f:
+                return f.read()
+        except OSError as e:
+            logging.debug(f"读取任务文件失败: {e}")
+            return None
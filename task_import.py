@@ -0,0 +1,196 @@
+import codecs
+import json
+import logging
+import os
+import queue
+import threading
+from typing import Any, Callable, Iterable, Iterator, List, Optional
+from constants import IMPORT_READ_SIZE, IMPORT_CHUNK_SIZE, IMPORT_QUEUE_CHUNKS
+from task_model import Task
+from utils import is_valid_task_data
+
+_WHITESPACE = " \t\n\r"
+_NUMBER_CHARS = "0123456789.eE+-"
+
+
+def iter_json_array(chunks: Iterable[str]) -> Iterator[Any]:
+    """逐个解析顶层 JSON 数组的元素，chunks 为依次读取的文本块，内存中只保留尚未解析的部分
+
+    顶层不是数组时抛出 ValueError，内容格式错误时抛出 json.JSONDecodeError。
+    """
+    decoder = json.JSONDecoder()
+    chunks = iter(chunks)
+    buffer, pos, eof = "", 0, False
+
+    def read_more() -> bool:
+        nonlocal buffer, pos, eof
+        chunk = "" if eof else next(chunks, "")
+        if not chunk:
+            eof = True
+            return False
+        buffer = buffer[pos:] + chunk
+        pos = 0
+        return True
+
+    state = "["  # 期望的下一项: "[" 数组开始, "first" 首个元素或 "]", "value" 元素, "," 分隔符或 "]", "end" 数组已结束
+    while True:
+        while pos < len(buffer) and buffer[pos] in _WHITESPACE:
+            pos += 1
+        if pos == len(buffer):
+            if read_more():
+                continue
+            if state == "end":
+                return
+            if state == "[":
+                raise ValueError("文件格式错误：期望JSON数组")
+            raise json.JSONDecodeError("JSON数组不完整", buffer, pos)
+
+        char = buffer[pos]
+        if state == "[":
+            if char != "[":
+                raise ValueError("文件格式错误：期望JSON数组")
+            pos += 1
+            state = "first"
+        elif state == "end":
+            raise json.JSONDecodeError("Extra data", buffer, pos)
+        elif state == "," or (state == "first" and char == "]"):
+            if char == "]":
+                pos += 1
+                state = "end"
+            elif char == ",":
+                pos += 1
+                state = "value"
+            else:
+                raise json.JSONDecodeError("Expecting ',' delimiter", buffer, pos)
+        else:
+            try:
+                value, end = decoder.raw_decode(buffer, pos)
+            except json.JSONDecodeError:
+                # 元素被读取块截断，读取更多后重新解析
+                if read_more():
+                    continue
+                raise
+            # 元素之后还看不到分隔符，或数字在块末尾被截断(如 "1." 只解析出 1)时，读取更多后重新解析
+            following = end
+            while following < len(buffer) and buffer[following] in _WHITESPACE:
+                following += 1
+            truncated = following == len(buffer) or (
+                isinstance(value, (int, float)) and not isinstance(value, bool) and buffer[end] in _NUMBER_CHARS)
+            if truncated and read_more():
+                continue
+            pos = end
+            state = ","
+            yield value
+
+
+class TaskImporter:
+    """流式导入任务文件：后台线程逐个解析、验证并转换任务，按块放入有界队列，由界面线程定时取出应用
+
+    内存中只保留一个读取块和少量已解析的任务块，与文件大小无关；导入期间界面保持响应，可随时取消。
+    convert 在后台线程中把任务数据转换为任务，返回 None 的数据被跳过。
+    """
+
+    def __init__(self, path: str, convert: Callable[[Any], Optional[Task]] = Task.from_dict,
+                 chunk_size: int = IMPORT_CHUNK_SIZE):
+        self.path = path
+        self.convert = convert
+        self.chunk_size = chunk_size
+        self.total_bytes = 0
+        self.read_bytes = 0
+        self.count = 0  # 已解析的有效任务数
+        self.skipped = 0  # 跳过的无效任务数
+        self.error: Optional[Exception] = None
+        self._chunks: "queue.Queue[List[Task]]" = queue.Queue(maxsize=IMPORT_QUEUE_CHUNKS)
+        self._cancelled = threading.Event()
+        self._done = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="task-import", daemon=True)
+
+    def start(self) -> "TaskImporter":
+        self._thread.start()
+        return self
+
+    def cancel(self):
+        """取消导入，后台线程在处理下一个任务前退出"""
+        self._cancelled.set()
+        while self.take():
+            pass
+
+    @property
+    def cancelled(self) -> bool:
+        return self._cancelled.is_set()
+
+    @property
+    def finished(self) -> bool:
+        """后台线程已结束且所有任务块都已取出"""
+        return self._done.is_set() and self._chunks.empty()
+
+    @property
+    def progress(self) -> float:
+        """已读取文件的百分比"""
+        return 100.0 * self.read_bytes / self.total_bytes if self.total_bytes else 0.0
+
+    def take(self) -> List[Task]:
+        """取出一块已解析的任务，没有时返回空列表，不阻塞"""
+        try:
+            return self._chunks.get_nowait()
+        except queue.Empty:
+            return []
+
+    def chunks(self) -> Iterator[List[Task]]:
+        """阻塞地依次取出全部任务块，直到后台线程结束(用于测量等非界面场景，不能与 cancel 一起使用)"""
+        while True:
+            chunk = self._chunks.get()
+            if not chunk:
+                return
+            yield chunk
+
+    def _read_chunks(self, f) -> Iterator[str]:
+        decoder = codecs.getincrementaldecoder("utf-8")()
+        while True:
+            data = f.read(IMPORT_READ_SIZE)
+            self.read_bytes += len(data)
+            text = decoder.decode(data, final=not data)
+            if text:
+                yield text
+            if not data:
+                return
+
+    def _put(self, chunk: List[Task]) -> bool:
+        """放入任务块，队列已满时等待界面线程取出，取消后返回 False"""
+        while not self._cancelled.is_set():
+            try:
+                self._chunks.put(chunk, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _run(self):
+        try:
+            self.total_bytes = os.path.getsize(self.path)
+            with open(self.path, "rb") as f:
+                chunk = []
+                for data in iter_json_array(self._read_chunks(f)):
+                    if self._cancelled.is_set():
+                        return
+                    task = self.convert(data) if is_valid_task_data(data) else None
+                    if task is None:
+                        self.skipped += 1
+                        continue
+                    chunk.append(task)
+                    self.count += 1
+                    if len(chunk) >= self.chunk_size:
+                        if not self._put(chunk):
+                            return
+                        chunk = []
+                if chunk and not self._put(chunk):
+                    return
+            if not self.count:
+                raise ValueError("文件中没有有效的任务数据")
+            logging.info(f"已从 {self.path} 解析 {self.count} 个任务，跳过 {self.skipped} 个无效任务")
+        except Exception as e:
+            logging.error(f"导入任务失败: {e}")
+            self.error = e
+        finally:
+            self._put([])  # 结束标记，take() 取出时视为没有任务块
+            self._done.set()
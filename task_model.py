@@ -1,44 +1,190 @@
-from dataclasses import dataclass
-from datetime import datetime
-from typing import Optional
+import logging
+import uuid
+from dataclasses import dataclass, field
+from datetime import date, datetime, time
+from functools import lru_cache
+from typing import Optional, Tuple
+from config import TaskConfig
+from constants import DEFAULT_CHANNEL, DEFAULT_MIX_POLICY, DEFAULT_PRIORITY, DEFAULT_BUSY_POLICY
+
+WEEKDAY_BITS = {day: 1 << i for i, day in enumerate(TaskConfig.WEEKDAYS)}
+PLAY_OPTION_KEYS = ("channel", "mixPolicy", "priority", "busyPolicy")  # 不显示在任务列表中的可选字段
+
+
+@lru_cache(maxsize=None)
+def parse_schedule(schedule: str) -> Tuple[int, Optional[int]]:
+    """将计划字符串解析为 (星期位掩码, 日期序数)，无法解析时返回 (0, None)"""
+    parts = [part.strip() for part in str(schedule).split(",") if part.strip()]
+    if parts and all(part in WEEKDAY_BITS for part in parts):
+        mask = 0
+        for part in parts:
+            mask |= WEEKDAY_BITS[part]
+        return mask, None
+    try:
+        return 0, datetime.strptime(str(schedule).strip(), "%Y-%m-%d").date().toordinal()
+    except ValueError:
+        return 0, None
+
+
+@lru_cache(maxsize=4096)
+def parse_time_of_day(value: str) -> Optional[int]:
+    """将 HH:MM:SS 解析为当天的秒数，格式无效时返回 None"""
+    try:
+        parsed = datetime.strptime(str(value).strip(), "%H:%M:%S").time()
+    except ValueError:
+        return None
+    return parsed.hour * 3600 + parsed.minute * 60 + parsed.second
+
+
+def new_task_id() -> str:
+    """生成新任务的ID，任务ID创建后不再改变，显示顺序由任务列表中的序号列表示"""
+    return uuid.uuid4().hex
+
+
+def seconds_of_day(moment) -> int:
+    """返回 datetime/time 对应的当天秒数"""
+    return moment.hour * 3600 + moment.minute * 60 + moment.second
+
 
 @dataclass
 class Task:
     """任务数据模型"""
     id: str
-    name: str  
+    name: str
     start_time: str
     end_time: str
     volume: int
     schedule: str
     audio_path: str
     status: str = "waiting"
-    
+    channel: str = DEFAULT_CHANNEL  # 播放通道，非主通道的任务可与主通道同时播放
+    mix_policy: str = DEFAULT_MIX_POLICY  # 非主通道任务开始时对主通道的处理: preempt / overlay / duck
+    priority: int = DEFAULT_PRIORITY  # 播放队列中的优先级，数值越大越先播放
+    busy_policy: str = DEFAULT_BUSY_POLICY  # 到期时主通道正在播放其他任务的处理: preempt / queue / drop / merge
+    # 预编译字段：计划和时间只解析一次，调度判断只做整数比较
+    weekday_mask: int = field(default=0, init=False, repr=False, compare=False)
+    date_ordinal: Optional[int] = field(default=None, init=False, repr=False, compare=False)
+    start_seconds: Optional[int] = field(default=None, init=False, repr=False, compare=False)
+    end_seconds: Optional[int] = field(default=None, init=False, repr=False, compare=False)
+
+    def __post_init__(self):
+        self.compile()
+
+    def compile(self):
+        """重新解析计划与时间字段，修改 schedule/start_time/end_time 后需调用"""
+        self.weekday_mask, self.date_ordinal = parse_schedule(self.schedule)
+        self.start_seconds = parse_time_of_day(self.start_time)
+        self.end_seconds = parse_time_of_day(self.end_time)
+
     @property
     def is_playing(self) -> bool:
         return self.status == "正在播放"
-        
-    @property  
+
+    @property
     def is_paused(self) -> bool:
         return self.status == "已暂停"
-        
+
     @property
     def is_paused_today(self) -> bool:
         return self.status == "Pause today"
-        
+
+    @property
+    def is_weekly(self) -> bool:
+        return self.weekday_mask != 0
+
+    @property
+    def schedule_key(self) -> Tuple[Optional[int], int, Optional[int]]:
+        """调度相关字段，用于判断任务是否需要重新调度"""
+        return self.start_seconds, self.weekday_mask, self.date_ordinal
+
+    def is_scheduled_on(self, day: date) -> bool:
+        """判断任务是否计划在指定日期执行"""
+        if self.weekday_mask:
+            return bool(self.weekday_mask >> day.weekday() & 1)
+        return self.date_ordinal == day.toordinal()
+
+    def next_fire_after(self, after: datetime) -> Optional[float]:
+        """计算不早于 after 的下一次触发时间戳，无法再触发时返回 None"""
+        if self.start_seconds is None:
+            return None
+        today = after.toordinal()
+        after_seconds = seconds_of_day(after) + after.microsecond / 1e6
+        if self.weekday_mask:
+            days = [today + offset for offset in range(8)
+                    if self.weekday_mask >> ((today + offset + 6) % 7) & 1]
+        elif self.date_ordinal is not None:
+            days = [self.date_ordinal]
+        else:
+            return None
+
+        for day in days:
+            if day < today or (day == today and self.start_seconds < after_seconds):
+                continue
+            hours, remainder = divmod(self.start_seconds, 3600)
+            start = time(hours, *divmod(remainder, 60))
+            return datetime.combine(date.fromordinal(day), start).timestamp()
+        return None
+
     @classmethod
     def from_dict(cls, data: dict) -> "Task":
         return cls(
             id=str(data["id"]),
             name=data["name"],
             start_time=data["startTime"],
-            end_time=data["endTime"], 
+            end_time=data["endTime"],
             volume=int(data["volume"]),
             schedule=data["schedule"],
             audio_path=data["audioPath"],
-            status=data.get("status", "waiting")
+            status=data.get("status", "waiting"),
+            channel=data.get("channel") or DEFAULT_CHANNEL,
+            mix_policy=data.get("mixPolicy") or DEFAULT_MIX_POLICY,
+            priority=int(data.get("priority") or DEFAULT_PRIORITY),
+            busy_policy=data.get("busyPolicy") or DEFAULT_BUSY_POLICY
+        )
+
+    @classmethod
+    def from_values(cls, values) -> "Task":
+        """从 Treeview 行数据构造任务"""
+        values = list(values) + [""] * (8 - len(values))
+        volume = str(values[4]).strip()
+        return cls(
+            id=str(values[0]).replace("▶ ", "").strip(),
+            name=str(values[1]),
+            start_time=str(values[2]),
+            end_time=str(values[3]),
+            volume=int(volume) if volume.isdigit() else TaskConfig.DEFAULT_VOLUME,
+            schedule=str(values[5]),
+            audio_path=str(values[6]),
+            status=str(values[7]) or "waiting"
         )
-        
+
+    @classmethod
+    def from_data(cls, data) -> Optional["Task"]:
+        """从任务文件中的字典或旧格式的行数据构造任务，数据不完整时返回 None"""
+        try:
+            if isinstance(data, dict):
+                return cls.from_dict(data)
+            if isinstance(data, (list, tuple)) and len(data) >= 7:
+                return cls.from_values(data)
+        except (KeyError, TypeError, ValueError):
+            pass
+        logging.warning(f"任务数据不完整: {data}")
+        return None
+
+    @property
+    def play_options(self) -> dict:
+        """非默认的通道、混音和排队设置，默认值不写入任务文件以保持旧格式"""
+        options = {}
+        if self.channel != DEFAULT_CHANNEL:
+            options["channel"] = self.channel
+        if self.mix_policy != DEFAULT_MIX_POLICY:
+            options["mixPolicy"] = self.mix_policy
+        if self.priority != DEFAULT_PRIORITY:
+            options["priority"] = self.priority
+        if self.busy_policy != DEFAULT_BUSY_POLICY:
+            options["busyPolicy"] = self.busy_policy
+        return options
+
     def to_dict(self) -> dict:
         return {
             "id": self.id,
@@ -48,5 +194,6 @@ class Task:
             "volume": self.volume,
             "schedule": self.schedule,
             "audioPath": self.audio_path,
-            "status": self.status
-        }
\ No newline at end of file
+            "status": self.status,
+            **self.play_options
+        }
@@ -0,0 +1,307 @@
+import logging
+import threading
+from contextlib import contextmanager
+from dataclasses import dataclass, field, replace
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Set
+from task_model import Task, new_task_id
+
+
+@dataclass
+class TaskChange:
+    """一次(或一批合并后的)仓库变化，集合中为任务ID"""
+    version: int = 0
+    added: Set[str] = field(default_factory=set)
+    updated: Set[str] = field(default_factory=set)  # 任务内容被替换
+    removed: Set[str] = field(default_factory=set)
+    status: Set[str] = field(default_factory=set)  # 只有状态变化的任务
+    reordered: bool = False
+    reset: bool = False  # 整体替换了全部任务
+    persist: bool = True  # 为 False 时持久化订阅者不写入(如刚从存储加载)
+
+    @property
+    def structural(self) -> bool:
+        """任务的增删、顺序或整体替换，列表视图需要重新比对全部行"""
+        return bool(self.reset or self.reordered or self.added or self.removed)
+
+    @property
+    def status_only(self) -> bool:
+        return bool(self.status) and not (self.structural or self.updated)
+
+    @property
+    def empty(self) -> bool:
+        return not (self.structural or self.updated or self.status)
+
+    def merge(self, other: "TaskChange"):
+        """把后发生的变化合并到本次变化中"""
+        self.version = other.version
+        self.persist = self.persist and other.persist
+        self.reset = self.reset or other.reset
+        self.reordered = self.reordered or other.reordered
+        for task_id in other.removed:
+            if task_id in self.added:
+                self.added.discard(task_id)
+            else:
+                self.removed.add(task_id)
+            self.updated.discard(task_id)
+            self.status.discard(task_id)
+        for task_id in other.added:
+            if task_id in self.removed:
+                # 删除后重新加入的任务位置可能已改变
+                self.removed.discard(task_id)
+                self.updated.add(task_id)
+                self.reordered = True
+            else:
+                self.added.add(task_id)
+        for task_id in other.updated:
+            if task_id not in self.added:
+                self.updated.add(task_id)
+            self.status.discard(task_id)
+        for task_id in other.status:
+            if task_id not in self.added and task_id not in self.updated:
+                self.status.add(task_id)
+
+
+class TaskRepository:
+    """任务仓库：内存中唯一的任务数据源，按任务ID索引并保持显示顺序
+
+    每次修改递增 version 并通知订阅者(任务列表视图、调度引擎、持久化)，订阅者不再从界面控件或任务文件读回任务。
+    仓库中的 Task 对象除状态外视为不可变：修改任务时替换为新对象，调度器据此判断是否需要重新调度。
+    任务ID在仓库中唯一且不再改变，缺少ID或ID重复(旧任务文件)的任务放入仓库时分配新ID。
+    在 batch() 中的多次修改合并为一次通知。
+    """
+
+    def __init__(self, tasks: Iterable[Task] = ()):
+        self._tasks: Dict[str, Task] = {}
+        self._order: List[str] = []
+        self._positions: Optional[Dict[str, int]] = None  # 任务ID -> 下标，顺序变化后按需重建
+        self._listeners: List[Callable[[TaskChange], None]] = []
+        self._pending: Optional[TaskChange] = None  # batch 中累积的变化
+        self._batch_depth = 0
+        self._lock = threading.RLock()
+        self.version = 0
+        for task in tasks:
+            self._insert(task, None)
+
+    # ---- 订阅 ----
+
+    def subscribe(self, listener: Callable[[TaskChange], None]) -> Callable[[TaskChange], None]:
+        """订阅变化通知，按订阅顺序在修改所在的线程中调用"""
+        self._listeners.append(listener)
+        return listener
+
+    def unsubscribe(self, listener: Callable[[TaskChange], None]):
+        if listener in self._listeners:
+            self._listeners.remove(listener)
+
+    # ---- 查询 ----
+
+    def __len__(self) -> int:
+        return len(self._order)
+
+    def __iter__(self) -> Iterator[Task]:
+        return iter(self.tasks())
+
+    def __contains__(self, task_id) -> bool:
+        return str(task_id) in self._tasks
+
+    def get(self, task_id) -> Optional[Task]:
+        if task_id is None:
+            return None
+        return self._tasks.get(str(task_id))
+
+    def ids(self) -> List[str]:
+        return list(self._order)
+
+    def tasks(self) -> List[Task]:
+        """按显示顺序返回全部任务"""
+        with self._lock:
+            return [self._tasks[task_id] for task_id in self._order]
+
+    def index(self, task_id) -> int:
+        """任务在显示顺序中的下标，不存在时返回 -1"""
+        with self._lock:
+            if self._positions is None:
+                self._positions = {task_id: i for i, task_id in enumerate(self._order)}
+            return self._positions.get(str(task_id), -1)
+
+    def to_dicts(self) -> List[dict]:
+        """按显示顺序返回写入任务文件的字典列表"""
+        return [task.to_dict() for task in self.tasks()]
+
+    # ---- 修改 ----
+
+    def reset(self, tasks: Iterable[Task], persist: bool = True):
+        """整体替换全部任务"""
+        with self._lock:
+            self._tasks.clear()
+            self._order.clear()
+            self._positions = None
+            for task in tasks:
+                self._insert(task, None)
+            self._notify(TaskChange(reset=True, persist=persist))
+
+    def add(self, task: Task, index: Optional[int] = None):
+        """新增任务，index 为 None 时追加到末尾；ID 已存在时替换原任务，没有ID时分配新ID"""
+        with self._lock:
+            if not task.id:
+                task.id = new_task_id()
+            task_id = str(task.id)
+            if task_id in self._tasks:
+                self.update(task)
+                return
+            # 插入到中间时其后任务的位置都改变，按顺序保存的存储需要整体保存
+            reordered = index is not None and index < len(self._order)
+            self._insert(task, index)
+            self._notify(TaskChange(added={task.id}, reordered=reordered))
+
+    def extend(self, tasks: Iterable[Task], persist: bool = True) -> List[str]:
+        """在末尾追加多个任务并只通知一次，返回追加的任务ID(缺少或重复的ID已分配新ID)"""
+        with self._lock:
+            added = []
+            for task in tasks:
+                self._insert(task, None)
+                added.append(task.id)
+            if added:
+                self._notify(TaskChange(added=set(added), persist=persist))
+            return added
+
+    def update(self, task: Task) -> bool:
+        """用新的任务对象替换同ID的任务，保持其位置"""
+        with self._lock:
+            task_id = str(task.id)
+            if task_id not in self._tasks:
+                logging.warning(f"更新的任务 {task_id} 不存在")
+                return False
+            self._tasks[task_id] = task
+            self._notify(TaskChange(updated={task_id}))
+            return True
+
+    def set_status(self, task_id, status: str) -> bool:
+        """修改任务状态，状态未变化时不通知"""
+        with self._lock:
+            task = self._tasks.get(str(task_id))
+            if not task or task.status == status:
+                return False
+            task.status = status
+            self._notify(TaskChange(status={str(task_id)}))
+            return True
+
+    def remove(self, task_ids: Iterable) -> int:
+        """删除任务，返回实际删除的数量"""
+        with self._lock:
+            removed = {str(task_id) for task_id in task_ids if str(task_id) in self._tasks}
+            if not removed:
+                return 0
+            for task_id in removed:
+                del self._tasks[task_id]
+            self._order = [task_id for task_id in self._order if task_id not in removed]
+            self._positions = None
+            self._notify(TaskChange(removed=removed))
+            return len(removed)
+
+    def reorder(self, task_ids: Iterable):
+        """按给定顺序排列任务，未列出的任务保持原相对顺序排在最后"""
+        with self._lock:
+            order = [str(task_id) for task_id in task_ids if str(task_id) in self._tasks]
+            listed = set(order)
+            order += [task_id for task_id in self._order if task_id not in listed]
+            if order == self._order:
+                return
+            self._order = order
+            self._positions = None
+            self._notify(TaskChange(reordered=True))
+
+    def sync(self, tasks: Iterable[Task], persist: bool = True) -> TaskChange:
+        """按任务ID与给定的完整任务列表比对，只替换新增、删除、内容或状态有变化的任务并保持给定顺序
+
+        用于任务文件被外部修改后的增量重新加载；ID 为空或重复的任务被跳过。返回合并后的变化。
+        """
+        with self._lock:
+            incoming: Dict[str, Task] = {}
+            for task in tasks:
+                task_id = str(task.id)
+                if not task_id or task_id in incoming:
+                    logging.warning(f"跳过ID为空或重复的任务: {task.name} ({task_id})")
+                    continue
+                task.id = task_id
+                incoming[task_id] = task
+
+            change = TaskChange(persist=persist)
+            change.removed = {task_id for task_id in self._order if task_id not in incoming}
+            for task_id, task in incoming.items():
+                current = self._tasks.get(task_id)
+                if current is None:
+                    change.added.add(task_id)
+                elif current != task:
+                    if replace(current, status=task.status) == task:
+                        change.status.add(task_id)
+                    else:
+                        change.updated.add(task_id)
+            # 保留的任务相对顺序不变、新任务都在末尾时不算调整顺序
+            expected = [task_id for task_id in self._order if task_id in incoming] + \
+                       [task_id for task_id in incoming if task_id in change.added]
+            order = list(incoming)
+            change.reordered = order != expected
+            if change.empty:
+                return change
+
+            for task_id in change.removed:
+                del self._tasks[task_id]
+            for task_id in change.added | change.updated:
+                self._tasks[task_id] = incoming[task_id]
+            for task_id in change.status:
+                self._tasks[task_id].status = incoming[task_id].status
+            self._order = order
+            self._positions = None
+            self._notify(change)
+            return change
+
+    @contextmanager
+    def batch(self):
+        """在块内的多次修改合并为一次通知"""
+        with self._lock:
+            self._batch_depth += 1
+        try:
+            yield self
+        finally:
+            with self._lock:
+                self._batch_depth -= 1
+                change = self._pending if self._batch_depth == 0 else None
+                if change is not None:
+                    self._pending = None
+            if change is not None and not change.empty:
+                self._dispatch(change)
+
+    # ---- 内部 ----
+
+    def _insert(self, task: Task, index: Optional[int]):
+        if not task.id or str(task.id) in self._tasks:
+            old_id, task.id = task.id, new_task_id()
+            logging.warning(f"任务 '{task.name}' 的ID '{old_id}' 为空或重复，已分配新ID {task.id}")
+        task_id = task.id = str(task.id)
+        self._tasks[task_id] = task
+        if index is None or index >= len(self._order):
+            self._order.append(task_id)
+            if self._positions is not None:
+                self._positions[task_id] = len(self._order) - 1
+        else:
+            self._order.insert(index, task_id)
+            self._positions = None
+
+    def _notify(self, change: TaskChange):
+        self.version += 1
+        change.version = self.version
+        if self._batch_depth:
+            if self._pending is None:
+                self._pending = change
+            else:
+                self._pending.merge(change)
+            return
+        self._dispatch(change)
+
+    def _dispatch(self, change: TaskChange):
+        for listener in list(self._listeners):
+            try:
+                listener(change)
+            except Exception as e:
+                logging.error(f"处理任务变化通知失败: {e}")
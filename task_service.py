@@ -1,67 +1,169 @@
 from typing import List, Optional
 from task_model import Task
+from task_repository import TaskRepository, TaskChange
+from status_journal import StatusJournal
+from task_storage import TaskStorage, JsonTaskStorage, SqliteTaskStorage, create_storage, is_sqlite_path
 from config import PathConfig
+from config_manager import get_config_value
+from file_utils import serialize_tasks, atomic_write_bytes
 import json
 import logging
 import os
 
 class TaskService:
-    """任务服务层,处理任务的CRUD操作"""
-    
-    def __init__(self):
-        self.tasks: List[Task] = []
+    """任务服务层,处理任务的CRUD操作
+
+    任务保存在任务仓库中，服务作为持久化订阅者把仓库的变化写入存储：
+    状态变化和单个任务的增删改按存储能力单条写入，整体替换或调整顺序时整体保存。
+    """
+
+    def __init__(self, task_file_path: Optional[str] = None, storage: Optional[TaskStorage] = None,
+                 repository: Optional[TaskRepository] = None):
+        self.storage = storage or JsonTaskStorage(task_file_path or PathConfig.TASK_FILE_PATH)
+        self.task_file_path = self.storage.path
+        self.repository = repository if repository is not None else TaskRepository()
+        self.saved = True  # 最近一次写入存储是否成功
+        self.journal: Optional[StatusJournal] = None  # 设置后状态变化写入状态日志，不再整体保存
+        self.repository.subscribe(self._on_change)
         self.load_tasks()
-        
+
+    def use_journal(self, journal: StatusJournal):
+        """状态变化改为写入状态日志，日志合并时使用仓库中的任务"""
+        self.journal = journal
+        journal.snapshot = self.repository.to_dicts
+
+    def flush_status(self) -> bool:
+        """立即将状态日志中未合并的状态变化写入任务文件"""
+        return self.journal.flush() if self.journal else True
+
+    def set_task_file(self, path: str):
+        """改用另一个 JSON 任务文件(界面导入任务文件后)，未合并的状态先写入原文件"""
+        if self.journal:
+            self.journal.flush()
+            self.use_journal(StatusJournal(path))
+        self.storage.path = path
+        self.task_file_path = path
+
+    @property
+    def tasks(self) -> List[Task]:
+        return self.repository.tasks()
+
     def load_tasks(self) -> bool:
         try:
-            if os.path.exists(PathConfig.TASK_FILE_PATH):
-                with open(PathConfig.TASK_FILE_PATH, "r", encoding="utf-8") as f:
-                    data = json.load(f)
-                    self.tasks = [Task.from_dict(t) for t in data]
+            self.repository.reset(self.storage.load_all(), persist=False)
             return True
         except Exception as e:
             logging.error(f"加载任务失败: {e}")
             return False
-            
+
     def save_tasks(self) -> bool:
         try:
-            data = [t.to_dict() for t in self.tasks]
-            with open(PathConfig.TASK_FILE_PATH, "w", encoding="utf-8") as f:
-                json.dump(data, f, ensure_ascii=False, indent=4)
-            return True
+            self.storage.save_all(self.tasks)
+            if self.journal:
+                # 完整快照已包含所有状态
+                self.journal.discard()
+            self.saved = True
         except Exception as e:
-            logging.error(f"保存任务失败: {e}") 
-            return False
-            
+            logging.error(f"保存任务失败: {e}")
+            self.saved = False
+        return self.saved
+
+    def replace_tasks(self, tasks: List[Task]) -> bool:
+        """整体替换任务列表"""
+        self.repository.reset(tasks)
+        return self.saved
+
     def add_task(self, task: Task) -> bool:
-        try:
-            self.tasks.append(task)
-            return self.save_tasks()
-        except Exception as e:
-            logging.error(f"添加任务失败: {e}")
-            return False
-            
+        self.repository.add(task)
+        return self.saved
+
     def update_task(self, task_id: str, task: Task) -> bool:
-        try:
-            for i, t in enumerate(self.tasks):
-                if t.id == task_id:
-                    self.tasks[i] = task
-                    return self.save_tasks()
+        if task_id not in self.repository:
             return False
-        except Exception as e:
-            logging.error(f"更新任务失败: {e}")
+        self.repository.update(task)
+        return self.saved
+
+    def update_status(self, task_id: str, status: str) -> bool:
+        """更新单个任务的状态，SQLite 后端只更新一行"""
+        if task_id not in self.repository:
             return False
-            
+        self.repository.set_status(task_id, status)
+        return self.saved
+
     def delete_task(self, task_id: str) -> bool:
+        self.repository.remove([task_id])
+        return self.saved
+
+    def get_task(self, task_id: str) -> Optional[Task]:
+        return self.repository.get(task_id)
+
+    def _on_change(self, change: TaskChange):
+        """把仓库的变化写入存储"""
+        if not change.persist:
+            return
+        if change.reset or change.reordered:
+            self.save_tasks()
+            return
         try:
-            self.tasks = [t for t in self.tasks if t.id != task_id]
-            return self.save_tasks()
+            tasks = self.tasks
+            for task_id in change.removed:
+                self.storage.delete_task(task_id, tasks)
+            for task_id in change.added | change.updated:
+                self.storage.save_task(self.repository.get(task_id), tasks)
+            if self.journal:
+                # 一批状态变化只追加写入并同步一次日志
+                self.journal.record_many((task_id, self.repository.get(task_id).status) for task_id in change.status)
+            else:
+                for task_id in change.status:
+                    self.storage.update_status(self.repository.get(task_id), tasks)
+            self.saved = True
         except Exception as e:
-            logging.error(f"删除任务失败: {e}")
-            return False
-            
-    def get_task(self, task_id: str) -> Optional[Task]:
-        for task in self.tasks:
-            if task.id == task_id:
-                return task
-        return None
\ No newline at end of file
+            logging.error(f"保存任务失败: {e}")
+            self.saved = False
+
+    def import_tasks(self, file_path: str) -> int:
+        """从 JSON 文件导入任务并替换当前任务，返回导入数量"""
+        with open(file_path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        if not isinstance(data, list):
+            raise ValueError("文件格式错误：期望JSON数组")
+        tasks = [Task.from_dict(t) for t in data]
+        if not self.replace_tasks(tasks):
+            raise IOError("保存导入的任务失败")
+        return len(tasks)
+
+    def export_tasks(self, file_path: str) -> int:
+        """将当前任务导出为 JSON 文件，返回导出数量"""
+        atomic_write_bytes(file_path, serialize_tasks([t.to_dict() for t in self.tasks]))
+        return len(self.tasks)
+
+
+def create_task_service(task_file_path: Optional[str] = None, mirror_path: Optional[str] = None) -> TaskService:
+    """按 config.json 中的 storage_backend 创建任务服务
+
+    JSON 后端的状态变化写入状态日志并批量合并，创建时回放上次崩溃前未合并的日志；
+    mirror_path 为整体保存时同步写入的另一个 JSON 文件。
+    使用 SQLite 后端时直接更新单行，数据库为空时从 JSON 任务文件迁移已有任务。
+    """
+    task_file_path = task_file_path or PathConfig.TASK_FILE_PATH
+    if get_config_value("storage_backend", "json") != "sqlite":
+        storage = create_storage(task_file_path)
+        if isinstance(storage, JsonTaskStorage):
+            storage.mirror_path = mirror_path
+        service = TaskService(storage=storage)
+        if not storage.row_updates:
+            journal = StatusJournal(service.task_file_path)
+            service.use_journal(journal)
+            if journal.replay():
+                service.load_tasks()
+        return service
+
+    db_path = get_config_value("sqlite_path", PathConfig.SQLITE_DB_PATH)
+    service = TaskService(storage=SqliteTaskStorage(db_path))
+    if not service.tasks and os.path.exists(task_file_path) and not is_sqlite_path(task_file_path):
+        try:
+            count = service.import_tasks(task_file_path)
+            logging.info(f"已从 {task_file_path} 迁移 {count} 个任务到 {db_path}")
+        except Exception as e:
+            logging.error(f"迁移任务到数据库失败: {e}")
+    return service
@@ -0,0 +1,166 @@
+import json
+import logging
+import os
+import sqlite3
+import threading
+from typing import List, Optional
+from task_model import Task
+from constants import DEFAULT_CHANNEL, DEFAULT_MIX_POLICY, DEFAULT_PRIORITY, DEFAULT_BUSY_POLICY
+from file_utils import serialize_tasks, write_if_changed, read_file_bytes
+
+
+class TaskStorage:
+    """任务存储后端基类，单条操作默认退化为整体保存"""
+
+    # 是否支持单条记录更新，支持时状态变化无需状态日志
+    row_updates = False
+
+    def __init__(self, path: str):
+        self.path = path
+
+    def load_all(self) -> List[Task]:
+        raise NotImplementedError
+
+    def save_all(self, tasks: List[Task]):
+        raise NotImplementedError
+
+    def save_task(self, task: Task, tasks: List[Task]):
+        self.save_all(tasks)
+
+    def delete_task(self, task_id: str, tasks: List[Task]):
+        self.save_all(tasks)
+
+    def update_status(self, task: Task, tasks: List[Task]):
+        self.save_all(tasks)
+
+    def close(self):
+        pass
+
+
+class JsonTaskStorage(TaskStorage):
+    """JSON 文件存储，每次保存写入完整文件
+
+    设置 mirror_path 时整体保存同时写入该文件(界面导入其他任务文件后仍保持默认任务文件一致)。
+    """
+
+    def __init__(self, path: str, mirror_path: Optional[str] = None):
+        super().__init__(path)
+        self.mirror_path = mirror_path
+
+    def load_all(self) -> List[Task]:
+        if not os.path.exists(self.path):
+            return []
+        # 记录读取的内容，加载后保存相同的任务时不会重写文件
+        data = json.loads(read_file_bytes(self.path).decode("utf-8"))
+        if not isinstance(data, list):
+            raise ValueError("任务文件格式错误：期望JSON数组")
+        return [task for task in map(Task.from_data, data) if task]
+
+    def save_all(self, tasks: List[Task]):
+        # 只序列化一次，内容与上次保存相同的文件跳过写入
+        data = serialize_tasks([t.to_dict() for t in tasks])
+        write_if_changed(self.path, data)
+        if self.mirror_path and os.path.abspath(self.mirror_path) != os.path.abspath(self.path):
+            write_if_changed(self.mirror_path, data)
+
+
+class SqliteTaskStorage(TaskStorage):
+    """SQLite 存储(WAL 模式)，新增、修改和状态变化只更新单行"""
+
+    row_updates = True
+
+    COLUMNS = ("id", "position", "name", "start_time", "end_time", "volume", "schedule", "audio_path", "status",
+               "channel", "mix_policy", "priority", "busy_policy")
+    # 后续版本新增的列及其定义，打开旧数据库时自动补齐
+    ADDED_COLUMNS = {
+        "channel": f"TEXT NOT NULL DEFAULT '{DEFAULT_CHANNEL}'",
+        "mix_policy": f"TEXT NOT NULL DEFAULT '{DEFAULT_MIX_POLICY}'",
+        "priority": f"INTEGER NOT NULL DEFAULT {DEFAULT_PRIORITY}",
+        "busy_policy": f"TEXT NOT NULL DEFAULT '{DEFAULT_BUSY_POLICY}'",
+    }
+
+    def __init__(self, path: str):
+        super().__init__(path)
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._create_schema()
+
+    def _create_schema(self):
+        with self._lock, self._conn:
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS tasks (
+                    id TEXT PRIMARY KEY,
+                    position INTEGER NOT NULL,
+                    name TEXT NOT NULL,
+                    start_time TEXT NOT NULL,
+                    end_time TEXT NOT NULL,
+                    volume INTEGER NOT NULL,
+                    schedule TEXT NOT NULL,
+                    audio_path TEXT NOT NULL,
+                    status TEXT NOT NULL
+                )""")
+            existing = {row[1] for row in self._conn.execute("PRAGMA table_info(tasks)")}
+            for column, definition in self.ADDED_COLUMNS.items():
+                if column not in existing:
+                    self._conn.execute(f"ALTER TABLE tasks ADD COLUMN {column} {definition}")
+            self._conn.execute("CREATE INDEX IF NOT EXISTS idx_tasks_start_time ON tasks(start_time)")
+            self._conn.execute("CREATE INDEX IF NOT EXISTS idx_tasks_schedule ON tasks(schedule)")
+            self._conn.execute("CREATE INDEX IF NOT EXISTS idx_tasks_status ON tasks(status)")
+
+    @staticmethod
+    def _row(task: Task, position: int) -> tuple:
+        return (task.id, position, task.name, task.start_time, task.end_time, task.volume,
+                task.schedule, task.audio_path, task.status, task.channel, task.mix_policy,
+                task.priority, task.busy_policy)
+
+    def load_all(self) -> List[Task]:
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT id, name, start_time, end_time, volume, schedule, audio_path, status, channel, mix_policy, "
+                "priority, busy_policy "
+                "FROM tasks ORDER BY position").fetchall()
+        return [Task(*row) for row in rows]
+
+    def save_all(self, tasks: List[Task]):
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM tasks")
+            self._conn.executemany(
+                f"INSERT INTO tasks ({', '.join(self.COLUMNS)}) VALUES ({', '.join('?' * len(self.COLUMNS))})",
+                [self._row(task, i) for i, task in enumerate(tasks)])
+
+    def save_task(self, task: Task, tasks: List[Task]):
+        position = next((i for i, t in enumerate(tasks) if t.id == task.id), len(tasks))
+        with self._lock, self._conn:
+            self._conn.execute(
+                f"INSERT OR REPLACE INTO tasks ({', '.join(self.COLUMNS)}) VALUES ({', '.join('?' * len(self.COLUMNS))})",
+                self._row(task, position))
+
+    def delete_task(self, task_id: str, tasks: List[Task]):
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM tasks WHERE id = ?", (task_id,))
+
+    def update_status(self, task: Task, tasks: List[Task]):
+        with self._lock, self._conn:
+            self._conn.execute("UPDATE tasks SET status = ? WHERE id = ?", (task.status, task.id))
+
+    def close(self):
+        try:
+            with self._lock:
+                self._conn.close()
+        except sqlite3.Error as e:
+            logging.warning(f"关闭任务数据库失败: {e}")
+
+
+def is_sqlite_path(path: str) -> bool:
+    return path.lower().endswith((".db", ".sqlite", ".sqlite3"))
+
+
+def create_storage(path: str, backend: str = "json") -> TaskStorage:
+    """按后端名称或文件扩展名创建存储"""
+    if backend == "sqlite" or is_sqlite_path(path):
+        return SqliteTaskStorage(path)
+    return JsonTaskStorage(path)
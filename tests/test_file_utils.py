@@ -0,0 +1,101 @@
+import os
+import stat
+
+import pytest
+
+import file_utils
+from file_utils import atomic_write_bytes, is_own_write, read_file_bytes, write_if_changed
+
+posix_only = pytest.mark.skipif(os.name == "nt", reason="Windows 不使用 POSIX 文件权限")
+
+
+def mode_of(path):
+    return stat.S_IMODE(os.stat(path).st_mode)
+
+
+def test_atomic_write_replaces_content_without_temp_files(tmp_path):
+    path = tmp_path / "task.json"
+    atomic_write_bytes(str(path), b"old")
+    atomic_write_bytes(str(path), b"new")
+    assert path.read_bytes() == b"new"
+    assert os.listdir(tmp_path) == ["task.json"]
+
+
+def test_atomic_write_creates_missing_directory(tmp_path):
+    path = tmp_path / "sub" / "task.json"
+    atomic_write_bytes(str(path), b"[]")
+    assert path.read_bytes() == b"[]"
+
+
+def test_failed_write_keeps_original_and_removes_temp_file(tmp_path, monkeypatch):
+    path = tmp_path / "task.json"
+    atomic_write_bytes(str(path), b"original")
+
+    def fail(src, dst):
+        raise OSError("磁盘已满")
+    monkeypatch.setattr(file_utils.os, "replace", fail)
+    with pytest.raises(OSError):
+        atomic_write_bytes(str(path), b"broken")
+    assert path.read_bytes() == b"original"
+    assert os.listdir(tmp_path) == ["task.json"]
+
+
+@posix_only
+@pytest.mark.parametrize("mode", [0o644, 0o640, 0o600, 0o664])
+def test_atomic_write_keeps_existing_mode(tmp_path, mode):
+    path = tmp_path / "task.json"
+    path.write_bytes(b"[]")
+    os.chmod(path, mode)
+    atomic_write_bytes(str(path), b"[1]")
+    assert mode_of(path) == mode
+
+
+@posix_only
+def test_atomic_write_new_file_follows_umask(tmp_path, monkeypatch):
+    monkeypatch.setattr(file_utils, "_umask", 0o027)
+    path = tmp_path / "task.json"
+    atomic_write_bytes(str(path), b"[]")
+    # mkstemp 的 0600 不能沿用到新文件
+    assert mode_of(path) == 0o640
+
+
+def test_write_if_changed_skips_identical_content(tmp_path):
+    path = tmp_path / "task.json"
+    assert write_if_changed(str(path), b"[1]")
+    mtime = os.stat(path).st_mtime_ns
+    assert not write_if_changed(str(path), b"[1]")
+    assert os.stat(path).st_mtime_ns == mtime
+    assert write_if_changed(str(path), b"[2]")
+    assert path.read_bytes() == b"[2]"
+
+
+def test_read_seeds_state_so_saving_loaded_content_is_skipped(tmp_path, monkeypatch):
+    path = tmp_path / "task.json"
+    path.write_bytes(b"[1, 2]")
+    data = read_file_bytes(str(path))
+    assert is_own_write(str(path))
+
+    writes = []
+    monkeypatch.setattr(file_utils, "atomic_write_bytes", lambda *args: writes.append(args))
+    assert not write_if_changed(str(path), data)
+    assert writes == []
+
+
+def test_unrecorded_file_is_compared_on_disk(tmp_path):
+    # 从未由本进程读取或写入的文件(如默认任务文件)，内容相同时也跳过写入
+    path = tmp_path / "task.json"
+    path.write_bytes(b"[1]")
+    mtime = os.stat(path).st_mtime_ns
+    assert not write_if_changed(str(path), b"[1]")
+    assert os.stat(path).st_mtime_ns == mtime
+    assert write_if_changed(str(path), b"[3]")
+
+
+def test_external_modification_is_not_treated_as_own_write(tmp_path):
+    path = tmp_path / "task.json"
+    atomic_write_bytes(str(path), b"[1]")
+    path.write_bytes(b"[1, 2]")
+    assert not is_own_write(str(path))
+    # 写回本进程上次保存的内容时必须真正写入，覆盖外部修改
+    assert write_if_changed(str(path), b"[1]")
+    assert path.read_bytes() == b"[1]"
@@ -0,0 +1,128 @@
+from constants import BUSY_PREEMPT, BUSY_QUEUE, BUSY_DROP, BUSY_MERGE
+from play_queue import PlayQueue
+
+
+class FakeMonotonic:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def make_queue(max_wait=None):
+    clock = FakeMonotonic()
+    return PlayQueue(monotonic=clock, max_wait=max_wait), clock
+
+
+def drain(queue):
+    paths = []
+    while (entry := queue.pop()) is not None:
+        paths.append(entry.file_path)
+    return paths
+
+
+def test_pops_by_priority_then_insertion_order():
+    queue, _ = make_queue()
+    queue.push("a.mp3", 50, 1)
+    queue.push("b.mp3", 50, 5)
+    queue.push("c.mp3", 50, 1)
+    queue.push("d.mp3", 50, 5)
+    assert len(queue) == 4
+    assert drain(queue) == ["b.mp3", "d.mp3", "a.mp3", "c.mp3"]
+    assert len(queue) == 0
+    assert queue.pop() is None
+
+
+def test_same_tag_replaces_queued_entry():
+    queue, _ = make_queue()
+    queue.push("old.mp3", 50, 1, tag="task-1")
+    queue.push("other.mp3", 50, 1, tag="task-2")
+    newest = queue.push("new.mp3", 80, 1, tag="task-1")
+
+    assert len(queue) == 2
+    assert queue.stats["replaced"] == 1
+    assert not queue.contains("old.mp3")
+    # 替换后的条目按新的加入顺序排在后面
+    assert queue.pop().file_path == "other.mp3"
+    assert queue.pop() is newest
+
+
+def test_contains_tracks_queued_paths():
+    queue, _ = make_queue()
+    queue.push("a.mp3", 50, 1)
+    queue.push("a.mp3", 50, 1)
+    assert queue.contains("a.mp3")
+    queue.pop()
+    assert queue.contains("a.mp3")
+    queue.pop()
+    assert not queue.contains("a.mp3")
+
+
+def test_pop_expires_entries_waiting_too_long():
+    queue, clock = make_queue(max_wait=10)
+    queue.push("low.mp3", 50, 1, tag="low")
+    clock.now = 5
+    queue.push("high.mp3", 50, 9)
+    clock.now = 12
+
+    # 低优先级的条目排在堆顶之后，同样按等待时间过期
+    assert queue.pop().file_path == "high.mp3"
+    assert [entry.tag for entry in queue.take_expired()] == ["low"]
+    assert queue.take_expired() == []
+    assert queue.stats["expired"] == 1
+    assert len(queue) == 0
+    assert not queue.contains("low.mp3")
+
+
+def test_wait_statistics():
+    queue, clock = make_queue()
+    queue.push("a.mp3", 50, 1)
+    queue.push("b.mp3", 50, 1)
+    clock.now = 4
+    queue.pop()
+    clock.now = 10
+    snapshot = queue.snapshot()
+    assert snapshot["depth"] == 1
+    assert snapshot["oldest_wait"] == 10
+    queue.pop()
+    snapshot = queue.snapshot()
+    assert (snapshot["dequeued"], snapshot["wait_max"], snapshot["wait_avg"]) == (2, 10, 7)
+    assert snapshot["peak"] == 2
+
+
+def test_clear_empties_queue():
+    queue, _ = make_queue()
+    queue.push("a.mp3", 50, 1, tag="1")
+    queue.push("b.mp3", 50, 2, tag="2")
+    queue.clear()
+    assert len(queue) == 0
+    assert queue.pop() is None
+    assert not queue.contains("a.mp3")
+    # 清空后同一标记可以再次加入，不计为替换
+    queue.push("a.mp3", 50, 1, tag="1")
+    assert queue.stats["replaced"] == 0
+    assert drain(queue) == ["a.mp3"]
+
+
+def test_repeated_replacement_keeps_storage_bounded():
+    queue, _ = make_queue()
+    for i in range(1000):
+        queue.push(f"{i}.mp3", 50, i % 3, tag="same")
+    assert len(queue) == 1
+    assert len(queue._heap) <= 2 * len(queue) + 16
+    assert len(queue._order) <= 2 * len(queue) + 16
+    assert drain(queue) == ["999.mp3"]
+
+
+def test_decide_applies_busy_policies():
+    queue, _ = make_queue()
+    assert queue.decide("a.mp3", 5, BUSY_PREEMPT, "cur.mp3", 5) == "played"
+    assert queue.decide("a.mp3", 1, BUSY_PREEMPT, "cur.mp3", 5) == "queued"
+    assert queue.decide("a.mp3", 5, BUSY_QUEUE, "cur.mp3", 1) == "queued"
+    assert queue.decide("a.mp3", 5, BUSY_DROP, "cur.mp3", 1) == "dropped"
+    assert queue.decide("cur.mp3", 5, BUSY_MERGE, "cur.mp3", 1) == "merged"
+    assert queue.decide("a.mp3", 5, BUSY_MERGE, "cur.mp3", 1) == "queued"
+    queue.push("a.mp3", 50, 5)
+    assert queue.decide("a.mp3", 5, BUSY_MERGE, "cur.mp3", 1) == "merged"
+    assert (queue.stats["preempted"], queue.stats["dropped"], queue.stats["merged"]) == (1, 1, 2)
@@ -0,0 +1,129 @@
+import datetime
+
+from clock import SimulatedClock
+from scheduler import TaskScheduler, CATCH_UP_FIRE, CATCH_UP_SKIP, CATCH_UP_SEEK
+from task_model import Task
+
+EVERY_DAY = "一, 二, 三, 四, 五, 六, 日"
+START = datetime.datetime(2026, 1, 5, 7, 0, 0)  # 星期一
+
+
+def make_task(task_id, start_time, schedule=EVERY_DAY):
+    return Task(str(task_id), f"任务{task_id}", start_time, "23:59:59", 50, schedule, "/audio.mp3")
+
+
+def at(hour, minute=0, second=0, day=START):
+    return day.replace(hour=hour, minute=minute, second=second).timestamp()
+
+
+def make_scheduler(policy=CATCH_UP_FIRE, max_lateness=60):
+    clock = SimulatedClock(START)
+    return TaskScheduler(catch_up_policy=policy, max_lateness=max_lateness, clock=clock), clock
+
+
+def test_next_fire_time_is_earliest_task():
+    scheduler, _ = make_scheduler()
+    scheduler.sync([make_task(1, "09:00:00"), make_task(2, "08:00:00"), make_task(3, "10:00:00")])
+    assert len(scheduler) == 3
+    assert scheduler.next_fire_time() == at(8)
+    assert [task.id for _, task in scheduler.upcoming(at(9, 30))] == ["2", "1"]
+
+
+def test_pop_due_fires_and_reschedules_next_day():
+    scheduler, clock = make_scheduler()
+    scheduler.set_task(make_task(1, "08:00:00"))
+    clock.advance_to(at(7, 59, 59))
+    assert scheduler.pop_due() == []
+
+    clock.advance_to(at(8))
+    [record] = scheduler.pop_due()
+    assert (record.task_id, record.action, record.lateness) == ("1", "fired", 0)
+    assert scheduler.next_fire_time() == at(8, day=START + datetime.timedelta(days=1))
+
+
+def test_weekday_schedule_skips_other_days():
+    scheduler, _ = make_scheduler()
+    # 星期一 07:00 之后，只在星期三播放的任务
+    scheduler.set_task(make_task(1, "06:00:00", "三"))
+    assert scheduler.next_fire_time() == at(6, day=START + datetime.timedelta(days=2))
+
+
+def test_date_schedule_fires_once():
+    scheduler, clock = make_scheduler()
+    scheduler.set_task(make_task(1, "08:00:00", START.strftime("%Y-%m-%d")))
+    clock.advance_to(at(8))
+    assert [record.task_id for record in scheduler.pop_due()] == ["1"]
+    assert len(scheduler) == 0
+    assert scheduler.next_fire_time() is None
+
+
+def test_removed_and_rescheduled_tasks_drop_stale_entries():
+    scheduler, clock = make_scheduler()
+    scheduler.sync([make_task(1, "08:00:00"), make_task(2, "08:30:00")])
+    scheduler.remove_task(1)
+    scheduler.set_task(make_task(2, "09:00:00"))
+    assert 1 not in scheduler
+    assert scheduler.next_fire_time() == at(9)
+
+    clock.advance_to(at(9))
+    assert [record.task_id for record in scheduler.pop_due()] == ["2"]
+
+
+def test_unchanged_schedule_keeps_entry():
+    scheduler, _ = make_scheduler()
+    fire_ts = scheduler.set_task(make_task(1, "08:00:00"))
+    renamed = make_task(1, "08:00:00")
+    renamed.name = "改名"
+    assert scheduler.set_task(renamed) == fire_ts
+    assert scheduler.get_task(1) is renamed
+    assert len(scheduler._heap) == 1
+
+
+def test_invalid_start_time_is_not_scheduled():
+    scheduler, _ = make_scheduler()
+    assert scheduler.set_task(make_task(1, "25:00")) is None
+    assert len(scheduler) == 0
+
+
+def test_late_task_fires_within_max_lateness():
+    scheduler, clock = make_scheduler(CATCH_UP_FIRE, max_lateness=60)
+    scheduler.set_task(make_task(1, "08:00:00"))
+    clock.advance_to(at(8, 0, 30))
+    [record] = scheduler.pop_due()
+    assert (record.action, record.lateness) == ("late", 30)
+    assert list(scheduler.fire_log) == [record]
+
+
+def test_task_later_than_max_lateness_is_missed():
+    scheduler, clock = make_scheduler(CATCH_UP_FIRE, max_lateness=60)
+    scheduler.set_task(make_task(1, "08:00:00"))
+    clock.advance_to(at(8, 5))
+    assert scheduler.pop_due() == []
+    assert scheduler.fire_log[-1].action == "missed"
+    # 错过后仍按计划安排下一次
+    assert scheduler.next_fire_time() == at(8, day=START + datetime.timedelta(days=1))
+
+
+def test_skip_policy_misses_any_late_task():
+    scheduler, clock = make_scheduler(CATCH_UP_SKIP)
+    scheduler.set_task(make_task(1, "08:00:00"))
+    clock.advance_to(at(8, 0, 5))
+    assert scheduler.pop_due() == []
+    assert scheduler.fire_log[-1].action == "missed"
+
+
+def test_seek_policy_offsets_by_lateness():
+    scheduler, clock = make_scheduler(CATCH_UP_SEEK)
+    scheduler.set_task(make_task(1, "08:00:00"))
+    clock.advance_to(at(8, 0, 20))
+    [record] = scheduler.pop_due()
+    assert (record.action, record.offset) == ("seek", 20)
+
+
+def test_forward_clock_jump_handles_skipped_tasks_by_policy():
+    scheduler, clock = make_scheduler(CATCH_UP_FIRE, max_lateness=60)
+    scheduler.sync([make_task(1, "07:10:00"), make_task(2, "07:59:30")])
+    clock.jump(at(8) - clock.time())
+    records = scheduler.pop_due()
+    assert [record.task_id for record in records] == ["2"]
+    assert [record.action for record in scheduler.fire_log] == ["missed", "late"]
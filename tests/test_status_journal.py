@@ -0,0 +1,141 @@
+import json
+import os
+
+import status_journal
+from file_utils import atomic_write_bytes, serialize_tasks
+from status_journal import StatusJournal
+
+
+def write_tasks(path, statuses):
+    tasks = [{"id": task_id, "name": f"任务{task_id}", "status": status} for task_id, status in statuses.items()]
+    atomic_write_bytes(str(path), serialize_tasks(tasks))
+    return tasks
+
+
+def read_statuses(path):
+    with open(path, "r", encoding="utf-8") as f:
+        return {task["id"]: task["status"] for task in json.load(f)}
+
+
+def journal_lines(journal):
+    with open(journal.journal_path, "r", encoding="utf-8") as f:
+        return [json.loads(line) for line in f]
+
+
+def test_record_appends_without_touching_task_file(tmp_path):
+    path = tmp_path / "task.json"
+    write_tasks(path, {"1": "等待播放"})
+    before = path.read_bytes()
+    journal = StatusJournal(str(path))
+
+    assert journal.record("1", "已播放")
+    assert journal.get_status("1") == "已播放"
+    assert journal.dirty_count == 1
+    assert [(entry["id"], entry["status"]) for entry in journal_lines(journal)] == [("1", "已播放")]
+    assert path.read_bytes() == before
+
+
+def test_record_many_syncs_once_per_batch(tmp_path, monkeypatch):
+    path = tmp_path / "task.json"
+    write_tasks(path, {"1": "等待播放", "2": "等待播放", "3": "等待播放"})
+    journal = StatusJournal(str(path))
+    fsyncs = []
+    real_fsync = os.fsync
+    monkeypatch.setattr(status_journal.os, "fsync", lambda fd: (fsyncs.append(fd), real_fsync(fd)))
+
+    assert journal.record_many([("1", "已播放"), ("2", "已播放"), (3, "Pause today")])
+    assert len(fsyncs) == 1
+    assert len(journal_lines(journal)) == 3
+    assert journal.pending == {"1": "已播放", "2": "已播放", "3": "Pause today"}
+
+
+def test_record_many_ignores_empty_batch(tmp_path):
+    journal = StatusJournal(str(tmp_path / "task.json"))
+    assert journal.record_many([])
+    assert not os.path.exists(journal.journal_path)
+
+
+def test_flush_merges_into_task_file_and_truncates(tmp_path):
+    path = tmp_path / "task.json"
+    write_tasks(path, {"1": "等待播放", "2": "等待播放"})
+    journal = StatusJournal(str(path))
+    journal.record("2", "已播放")
+
+    assert journal.flush()
+    assert read_statuses(path) == {"1": "等待播放", "2": "已播放"}
+    assert journal.dirty_count == 0
+    assert os.path.getsize(journal.journal_path) == 0
+
+
+def test_threshold_triggers_flush(tmp_path):
+    path = tmp_path / "task.json"
+    write_tasks(path, {"1": "等待播放", "2": "等待播放"})
+    journal = StatusJournal(str(path), flush_threshold=2)
+
+    journal.record("1", "已播放")
+    assert read_statuses(path)["1"] == "等待播放"
+    journal.record("2", "已播放")
+    assert read_statuses(path) == {"1": "已播放", "2": "已播放"}
+    assert journal.dirty_count == 0
+
+
+def test_flush_uses_snapshot_for_own_writes(tmp_path):
+    path = tmp_path / "task.json"
+    tasks = write_tasks(path, {"1": "等待播放"})
+    journal = StatusJournal(str(path))
+    # 内存中的任务已有未保存的修改，合并时使用快照而不读回文件
+    journal.snapshot = lambda: [dict(tasks[0], name="内存中的名称")]
+    journal.record("1", "已播放")
+    journal.flush()
+
+    with open(path, "r", encoding="utf-8") as f:
+        [task] = json.load(f)
+    assert (task["name"], task["status"]) == ("内存中的名称", "已播放")
+
+
+def test_flush_rereads_externally_modified_file(tmp_path):
+    path = tmp_path / "task.json"
+    write_tasks(path, {"1": "等待播放"})
+    journal = StatusJournal(str(path))
+    journal.snapshot = lambda: [{"id": "1", "name": "旧快照", "status": "等待播放"}]
+    journal.record("1", "已播放")
+    # 其他程序修改了任务文件，不能用快照覆盖
+    path.write_text(json.dumps([{"id": "1", "name": "外部修改", "status": "等待播放"},
+                                {"id": "2", "name": "新任务", "status": "等待播放"}]), encoding="utf-8")
+    journal.flush()
+
+    with open(path, "r", encoding="utf-8") as f:
+        tasks = json.load(f)
+    assert [(task["name"], task["status"]) for task in tasks] == [("外部修改", "已播放"), ("新任务", "等待播放")]
+
+
+def test_replay_recovers_pending_changes_and_skips_torn_line(tmp_path):
+    path = tmp_path / "task.json"
+    write_tasks(path, {"1": "等待播放", "2": "等待播放"})
+    journal_path = f"{path}.journal"
+    with open(journal_path, "w", encoding="utf-8") as f:
+        f.write(json.dumps({"id": "1", "status": "正在播放"}) + "\n")
+        f.write(json.dumps({"id": "1", "status": "已播放"}) + "\n")
+        f.write('{"id": "2", "sta')  # 崩溃时只写了一半的行
+
+    journal = StatusJournal(str(path))
+    assert journal.replay() == 2
+    assert read_statuses(path) == {"1": "已播放", "2": "等待播放"}
+    assert os.path.getsize(journal_path) == 0
+
+
+def test_replay_without_journal_is_noop(tmp_path):
+    assert StatusJournal(str(tmp_path / "task.json")).replay() == 0
+
+
+def test_discard_drops_pending_changes(tmp_path):
+    path = tmp_path / "task.json"
+    write_tasks(path, {"1": "等待播放"})
+    journal = StatusJournal(str(path))
+    journal.record("1", "已播放")
+    journal.discard()
+
+    assert journal.dirty_count == 0
+    assert os.path.getsize(journal.journal_path) == 0
+    assert journal.flush()
+    assert read_statuses(path) == {"1": "等待播放"}
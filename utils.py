@@ -1,21 +1,33 @@
 import os
 import json
-import pygame
+import logging
 from tkinter import messagebox
-from constants import TASK_FILE_PATH
+from constants import TASK_FILE_PATH, MIX_CHANNEL_POOL
+from file_utils import serialize_tasks, atomic_write_bytes, write_if_changed, read_file_bytes
+from audio_backend import create_backend
 
-def safe_play_audio(file_path, volume=100):
+_audio_backend = None
+
+def get_audio_backend():
+    """返回共享的音频后端，首次使用时按配置创建并初始化"""
+    global _audio_backend
+    if _audio_backend is None:
+        _audio_backend = create_backend()
+        _audio_backend.init(MIX_CHANNEL_POOL)
+    return _audio_backend
+
+def safe_play_audio(file_path, volume=100, backend=None):
     try:
         if not os.path.exists(file_path):
             raise FileNotFoundError("音频文件不存在")
 
-        pygame.mixer.music.load(file_path)
-        pygame.mixer.music.set_volume(volume / 100)
-        pygame.mixer.music.play()
+        backend = backend or get_audio_backend()
+        backend.load(file_path)
+        backend.set_volume(volume / 100)
+        backend.play()
 
-        # 获取音频时长
-        sound = pygame.mixer.Sound(file_path)
-        duration = sound.get_length()
+        # 读取文件头获取音频时长，不解码整个文件
+        duration = backend.duration(file_path)
         return True, duration
 
     except Exception as e:
@@ -43,8 +55,7 @@ def update_task_in_json(task_data):
         if not updated:
             tasks.append(task_data)
 
-        with open(TASK_FILE_PATH, "w", encoding="utf-8") as f:
-            json.dump(tasks, f, ensure_ascii=False, indent=4)
+        atomic_write_bytes(TASK_FILE_PATH, serialize_tasks(tasks))
         return True
     except (IOError, json.JSONDecodeError) as e:
         messagebox.showerror("保存错误", f"保存任务数据失败: {str(e)}")
@@ -55,74 +66,63 @@ def load_tasks(task_file_path=TASK_FILE_PATH):
         return []
 
     try:
-        with open(task_file_path, "r", encoding="utf-8") as f:
-            tasks = json.load(f)
-            return tasks
+        # 记录读取的内容，加载后保存相同的任务时不会重写文件
+        return json.loads(read_file_bytes(task_file_path).decode("utf-8"))
     except json.JSONDecodeError:
         return []
     except (IOError, json.JSONDecodeError) as e:
         messagebox.showerror("错误", f"加载任务失败: {str(e)}")
         return []
 
-def set_task_status(task_id, status):
-    try:
-        tasks = []
-        if os.path.exists(TASK_FILE_PATH):
-            with open(TASK_FILE_PATH, "r", encoding="utf-8") as f:
-                try:
-                    loaded_tasks = json.load(f)
-                    tasks = loaded_tasks if isinstance(loaded_tasks, list) else []
-                except json.JSONDecodeError:
-                    pass
-
-        # 更新 tasks 列表
-        updated = False
-        for i, task in enumerate(tasks):
-            if task["id"] == task_id:
-                task["status"] = status
-                tasks[i] = task
-                updated = True
-                break
-        
-        if not updated:
+def is_valid_task_data(task):
+    """检查导入文件中的单个任务数据是否完整(字典或旧格式的行数据)"""
+    if not isinstance(task, (list, dict)) or len(task) < 7:
+        logging.warning(f"跳过无效任务: {task}")
+        return False
+    if isinstance(task, dict):
+        required_keys = ["id", "name", "startTime", "endTime", "volume", "schedule", "audioPath"]
+        if not all(key in task for key in required_keys):
+            logging.warning(f"跳过缺少必要字段的任务: {task}")
             return False
+    return True
 
-        with open(TASK_FILE_PATH, "w", encoding="utf-8") as f:
-            json.dump(tasks, f, ensure_ascii=False, indent=4)
-        return True
-    except (IOError, json.JSONDecodeError) as e:
-        messagebox.showerror("保存错误", f"保存任务数据失败: {str(e)}")
-        return False
+def validate_imported_tasks(tasks):
+    """检查导入文件中的任务数据，返回有效的任务，格式错误或没有有效任务时抛出 ValueError"""
+    if not isinstance(tasks, list):
+        raise ValueError("文件格式错误：期望JSON数组")
+
+    valid_tasks = [task for task in tasks if is_valid_task_data(task)]
+
+    if not valid_tasks:
+        raise ValueError("文件中没有有效的任务数据")
+    return valid_tasks
 
-def save_all_tasks_to_file(tasks, file_path):
-    """保存任务到指定文件，确保目录存在"""
+def save_all_tasks_to_file(tasks, file_path, data=None):
+    """原子保存任务到指定文件，内容与上次保存相同时跳过写入"""
     try:
         if file_path:
-            # 确保目录存在
-            directory = os.path.dirname(file_path)
-            if directory and not os.path.exists(directory):
-                os.makedirs(directory)
-                
-            with open(file_path, "w", encoding="utf-8") as f:
-                json.dump(tasks, f, ensure_ascii=False, indent=4)
+            if data is None:
+                data = serialize_tasks(tasks)
+            write_if_changed(file_path, data)
             return True
     except Exception as e:
         logging.error(f"保存任务到文件失败: {e}")
         return False
 
 def save_all_tasks(tasks, imported_file_path=None):
-    """同时保存到导入文件和默认文件"""
+    """同时保存到导入文件和默认文件，只序列化一次"""
     try:
-        # 先保存到导入的文件（如果存在）
-        if imported_file_path:
-            if not save_all_tasks_to_file(tasks, imported_file_path):
+        data = serialize_tasks(tasks)
+
+        # 先保存到导入的文件（如果存在且不是默认文件）
+        if imported_file_path and os.path.abspath(imported_file_path) != os.path.abspath(TASK_FILE_PATH):
+            if not save_all_tasks_to_file(tasks, imported_file_path, data):
                 return False
-                
+
         # 再保存到默认文件
-        if not save_all_tasks_to_file(tasks, TASK_FILE_PATH):
+        if not save_all_tasks_to_file(tasks, TASK_FILE_PATH, data):
             return False
-            
         return True
     except Exception as e:
         logging.error(f"保存任务失败: {e}")
-        return False
\ No newline at end of file
+        return False
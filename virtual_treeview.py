@@ -0,0 +1,330 @@
+import itertools
+import tkinter as tk
+from tkinter import ttk
+from typing import Dict, List
+from constants import VIRTUAL_BUFFER_ROWS
+
+
+class VirtualTreeview(ttk.Treeview):
+    """虚拟化的 Treeview：全部行数据保存在 Python 模型中，只为可见区域(加缓冲行)创建真实的行
+
+    对外保持 ttk.Treeview 的常用接口(insert/delete/move/item/set/index/selection/yview 等)，
+    这些接口操作模型，界面开销只与窗口高度有关，与任务数量无关。
+    """
+
+    def __init__(self, master=None, buffer_rows: int = VIRTUAL_BUFFER_ROWS, **kw):
+        self._yscrollcommand = kw.pop("yscrollcommand", None)
+        super().__init__(master, **kw)
+        self.buffer_rows = buffer_rows
+        self._order: List[str] = []  # 全部行的顺序
+        self._rows: Dict[str, dict] = {}  # 行ID -> {"values": [...], "tags": [...]}
+        self._positions: Dict[str, int] = {}  # 行ID -> 下标缓存
+        self._positions_valid = 0  # _order 中前多少项的下标缓存有效
+        self._selection: Dict[str, None] = {}  # 模型中的选中行(有序集合)
+        self._materialized: List[str] = []  # 当前真实创建在控件中的行
+        self._first = 0  # 首个可见行在模型中的下标
+        self._counter = itertools.count(1)
+        self._render_job = None
+        self._replace_selection = False
+
+        # 使用独立的绑定标签，避免被外部对同一事件的 bind 覆盖
+        self._bindtag = f"VirtualTreeview{id(self)}"
+        self.bindtags((self._bindtag,) + self.bindtags())
+        self.bind_class(self._bindtag, "<Configure>", lambda e: self._schedule_render())
+        self.bind_class(self._bindtag, "<MouseWheel>", self._on_mousewheel)
+        self.bind_class(self._bindtag, "<Button-4>", lambda e: self._scroll_rows(-3))
+        self.bind_class(self._bindtag, "<Button-5>", lambda e: self._scroll_rows(3))
+        self.bind_class(self._bindtag, "<Prior>", lambda e: self.yview("scroll", -1, "pages"))
+        self.bind_class(self._bindtag, "<Next>", lambda e: self.yview("scroll", 1, "pages"))
+        self.bind_class(self._bindtag, "<ButtonPress-1>", self._on_button_press)
+        self.bind_class(self._bindtag, "<<TreeviewSelect>>", self._on_widget_select)
+
+    # ---- 配置 ----
+
+    def configure(self, cnf=None, **kw):
+        if "yscrollcommand" in kw:
+            self._yscrollcommand = kw.pop("yscrollcommand")
+            self._update_scrollbar()
+        if cnf is None and not kw:
+            return super().configure()
+        return super().configure(cnf, **kw)
+
+    config = configure
+
+    # ---- 模型接口 ----
+
+    def get_children(self, item=None):
+        if item:
+            return ()
+        return tuple(self._order)
+
+    def exists(self, item):
+        return item in self._rows
+
+    def __len__(self):
+        return len(self._order)
+
+    def index(self, item):
+        position = self._positions.get(item)
+        if position is not None and position < self._positions_valid:
+            return position
+        if item not in self._rows:
+            raise tk.TclError(f'Item {item} not found')
+        for i in range(self._positions_valid, len(self._order)):
+            self._positions[self._order[i]] = i
+        self._positions_valid = len(self._order)
+        return self._positions[item]
+
+    def insert(self, parent, index, iid=None, **kw):
+        if iid is None:
+            iid = f"V{next(self._counter)}"
+            while iid in self._rows:
+                iid = f"V{next(self._counter)}"
+        elif iid in self._rows:
+            raise tk.TclError(f'Item {iid} already exists')
+
+        position = len(self._order) if index == "end" else max(0, min(int(index), len(self._order)))
+        self._rows[iid] = {"values": list(kw.get("values", ())), "tags": self._as_list(kw.get("tags", ()))}
+        self._order.insert(position, iid)
+        self._invalidate(position)
+        self._schedule_render()
+        return iid
+
+    def delete(self, *items):
+        items = [item for item in items if item in self._rows]
+        if not items:
+            return
+        removed = set(items)
+        first_position = min(self.index(item) for item in items)
+        self._order = [item for item in self._order if item not in removed]
+        for item in items:
+            del self._rows[item]
+            self._positions.pop(item, None)
+            self._selection.pop(item, None)
+        self._invalidate(first_position)
+
+        shown = [item for item in items if item in self._materialized]
+        if shown:
+            super().delete(*shown)
+            self._materialized = [item for item in self._materialized if item not in removed]
+        self._schedule_render()
+
+    detach = delete
+
+    def move(self, item, parent, index):
+        """与 Tk 语义一致：移动到原下标 index-1 处的行之后"""
+        sibling_position = min(int(index), len(self._order)) - 1
+        old_position = self.index(item)
+        if sibling_position == old_position:
+            return
+        self._order.pop(old_position)
+        if sibling_position < 0:
+            new_position = 0
+        elif sibling_position > old_position:
+            new_position = sibling_position
+        else:
+            new_position = sibling_position + 1
+        self._order.insert(new_position, item)
+        self._invalidate(min(old_position, new_position))
+        self._schedule_render()
+
+    def item(self, item, option=None, **kw):
+        row = self._rows.get(item)
+        if row is None:
+            raise tk.TclError(f'Item {item} not found')
+        if not kw:
+            info = {"text": "", "image": "", "values": list(row["values"]), "open": 0, "tags": list(row["tags"])}
+            return info[option] if option else info
+
+        if "values" in kw:
+            row["values"] = list(kw["values"])
+        if "tags" in kw:
+            row["tags"] = self._as_list(kw["tags"])
+        if item in self._materialized:
+            super().item(item, **kw)
+
+    def set(self, item, column=None, value=None):
+        row = self._rows.get(item)
+        if row is None:
+            raise tk.TclError(f'Item {item} not found')
+        columns = list(self["columns"])
+        if column is None:
+            return {col: row["values"][i] if i < len(row["values"]) else "" for i, col in enumerate(columns)}
+        col_index = columns.index(column) if column in columns else int(str(column).lstrip("#"))
+        if value is None:
+            return row["values"][col_index] if col_index < len(row["values"]) else ""
+        values = row["values"] + [""] * (len(columns) - len(row["values"]))
+        values[col_index] = value
+        row["values"] = values
+        if item in self._materialized:
+            super().set(item, column, value)
+
+    def tag_has(self, tagname, item=None):
+        if item is None:
+            return tuple(i for i in self._order if tagname in self._rows[i]["tags"])
+        return tagname in self._rows[item]["tags"]
+
+    # ---- 选中 ----
+
+    def selection(self):
+        return tuple(sorted(self._selection, key=self.index))
+
+    def selection_set(self, *items):
+        self._selection = dict.fromkeys(i for i in self._flatten(items) if i in self._rows)
+        self._apply_selection()
+
+    def selection_add(self, *items):
+        self._selection.update(dict.fromkeys(i for i in self._flatten(items) if i in self._rows))
+        self._apply_selection()
+
+    def selection_remove(self, *items):
+        for item in self._flatten(items):
+            self._selection.pop(item, None)
+        self._apply_selection()
+
+    def selection_toggle(self, *items):
+        for item in self._flatten(items):
+            if item in self._selection:
+                self._selection.pop(item)
+            elif item in self._rows:
+                self._selection[item] = None
+        self._apply_selection()
+
+    def focus(self, item=None):
+        if item is None:
+            return super().focus()
+        if item in self._materialized:
+            return super().focus(item)
+
+    def see(self, item):
+        position = self.index(item)
+        visible = self._visible_rows()
+        if position < self._first or position >= self._first + visible:
+            self._set_first(position - visible // 2)
+
+    # ---- 滚动 ----
+
+    def yview(self, *args):
+        total = len(self._order)
+        if not args:
+            if not total:
+                return 0.0, 1.0
+            return self._first / total, min(self._first + self._visible_rows(), total) / total
+        if args[0] == "moveto":
+            self._set_first(int(float(args[1]) * total))
+        elif args[0] == "scroll":
+            amount = int(args[1])
+            if args[2] == "pages":
+                amount *= max(self._visible_rows() - 1, 1)
+            self._scroll_rows(amount)
+
+    def yview_moveto(self, fraction):
+        self.yview("moveto", fraction)
+
+    def yview_scroll(self, number, what):
+        self.yview("scroll", number, what)
+
+    def _scroll_rows(self, amount):
+        self._set_first(self._first + amount)
+        return "break"
+
+    def _on_mousewheel(self, event):
+        return self._scroll_rows(-3 if event.delta > 0 else 3)
+
+    def _set_first(self, first):
+        first = max(0, min(first, len(self._order) - self._visible_rows()))
+        if first != self._first:
+            self._first = first
+            self._render()
+
+    # ---- 渲染 ----
+
+    def _visible_rows(self) -> int:
+        style = self.cget("style") or "Treeview"
+        try:
+            row_height = int(ttk.Style(self).lookup(style, "rowheight") or 20)
+        except (ValueError, tk.TclError):
+            row_height = 20
+        height = self.winfo_height()
+        if height <= 1:
+            return int(self.cget("height"))
+        return max(height // row_height - 1, 1)
+
+    def _schedule_render(self):
+        if self._render_job is None:
+            self._render_job = self.after_idle(self._render)
+
+    def _render(self):
+        """只创建可见窗口内的行，并删除滚出窗口的行"""
+        if self._render_job is not None:
+            self.after_cancel(self._render_job)
+            self._render_job = None
+
+        visible = self._visible_rows()
+        self._first = max(0, min(self._first, len(self._order) - visible))
+        window = self._order[self._first:self._first + visible + self.buffer_rows]
+        wanted = set(window)
+
+        stale = [item for item in self._materialized if item not in wanted]
+        if stale:
+            super().delete(*stale)
+        kept = [item for item in self._materialized if item in wanted]
+        if kept != [item for item in window if item in set(kept)]:
+            # 窗口内的行顺序发生变化(移动或排序)，整体重建更简单
+            super().delete(*kept)
+            kept = []
+
+        kept_set = set(kept)
+        for position, item in enumerate(window):
+            if item not in kept_set:
+                row = self._rows[item]
+                super().insert("", position, iid=item, values=row["values"], tags=row["tags"])
+        self._materialized = window
+
+        # 让控件内部始终从第一行开始显示
+        super().yview_moveto(0)
+        self._apply_selection()
+        self._update_scrollbar()
+
+    def _apply_selection(self):
+        wanted = tuple(item for item in self._materialized if item in self._selection)
+        if set(wanted) != set(super().selection()):
+            super().selection_set(wanted)
+
+    def _update_scrollbar(self):
+        if self._yscrollcommand:
+            first, last = self.yview()
+            self._yscrollcommand(first, last)
+
+    def _on_button_press(self, event):
+        # 不带 Ctrl/Shift 的单击会替换整个选中集，包括未显示的行
+        self._replace_selection = not (event.state & 0x0005)
+
+    def _on_widget_select(self, event):
+        """把控件中可见行的选中状态同步回模型"""
+        widget_selection = [item for item in super().selection() if item in self._rows]
+        if self._replace_selection:
+            self._selection = dict.fromkeys(widget_selection)
+            self._replace_selection = False
+            return
+        shown = set(self._materialized)
+        selection = {item: None for item in self._selection if item not in shown}
+        selection.update(dict.fromkeys(widget_selection))
+        self._selection = selection
+
+    # ---- 工具 ----
+
+    def _invalidate(self, position):
+        self._positions_valid = min(self._positions_valid, position)
+
+    @staticmethod
+    def _as_list(value):
+        if isinstance(value, str):
+            return value.split() if value else []
+        return list(value)
+
+    @staticmethod
+    def _flatten(items):
+        if len(items) == 1 and isinstance(items[0], (list, tuple)):
+            return list(items[0])
+        return list(items)